@@ -1,11 +1,18 @@
 # -*- mode: python ; coding: utf-8 -*-
+import sys
+
+sys.path.insert(0, SPECPATH)
+import assets
+
+# Renders the tray icon bitmaps at build time, so the exe never decodes icon.ico (see assets.py)
+assets.save_icon_cache(assets.ICON_CACHE_PATH, assets.render_icons('icon.ico'))
 
 
 a = Analysis(
-    ['deadman-switch-test.py'],
+    ['deadman-switch.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=[(assets.ICON_CACHE_PATH, '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,212 @@
+"""
+Escalation ladder for Deadman's switch: what happens when a notification goes
+unanswered.
+
+The ladder is a list of stages from config.json, each an action ("lock",
+"sleep", "hibernate" or "shutdown") and a delay in seconds to wait before it:
+
+    "escalation": [{"action": "lock", "delay": 0},
+                   {"action": "sleep", "delay": 60},
+                   {"action": "shutdown", "delay": 15}]
+
+A click during any of the delays (e.g. the user noticed the lock screen)
+cancels the rest of the ladder. The ladder also ends once a stage has taken the
+machine down (sleep, hibernate or shutdown), so later stages only run if an
+earlier one failed: in the example, the shutdown is the fallback for a sleep
+that did not work. Each action's command comes from the power
+backend (see backends.py) and is run directly, without a shell, with a timeout;
+its exit status and output are captured and reported for logging. A dry run
+reports the commands without running them.
+"""
+import subprocess
+import time
+
+
+ACTIONS = ("lock", "sleep", "hibernate", "shutdown")
+# Actions after which the machine is off, so monitoring ends
+POWER_OFF_ACTIONS = ("shutdown",)
+# Actions that suspend the machine; monitoring resumes at the next start time
+SUSPEND_ACTIONS = ("sleep", "hibernate")
+# The previous behaviour: shut down after a 15-second grace period
+DEFAULT_LADDER = [{"action": "shutdown", "delay": 15}]
+ACTION_TIMEOUT = 30 # Seconds a command may take before it is killed
+
+
+def validate_ladder(ladder):
+    """
+    Raises:
+        ValueError: If `ladder` is not a non-empty list of {"action", "delay"} stages.
+    """
+    if not isinstance(ladder, list) or not ladder:
+        raise ValueError("escalation must be a non-empty list of stages")
+    for stage in ladder:
+        if not isinstance(stage, dict) or stage.get("action") not in ACTIONS:
+            raise ValueError(f"each escalation stage needs an action, one of {ACTIONS}")
+        delay = stage.get("delay", 0)
+        if not isinstance(delay, (int, float)) or delay < 0:
+            raise ValueError("escalation stage delays must be non-negative numbers")
+
+
+def run_command(action, command, timeout=ACTION_TIMEOUT):
+    """
+    Runs `command` (an argument list, no shell) and waits for it.
+
+    Returns:
+        tuple: (exit status, combined stdout and stderr text).
+
+    Raises:
+        OSError: If the command cannot be started.
+        subprocess.TimeoutExpired: If it runs longer than `timeout` (it is killed).
+    """
+    creationflags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+    result = subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, timeout=timeout, creationflags=creationflags)
+    return result.returncode, result.stdout.decode(errors="replace").strip()
+
+
+class StageResult:
+    """
+    Outcome of one escalation stage.
+
+    Attributes:
+        action (str): The stage's action.
+        command (list): The command run (or that would have run), None if the
+            action is not available on this platform.
+        returncode (int): Exit status, None if the command did not run to completion.
+        output (str): What the command printed.
+        error (str): Why the stage failed to run, if it did.
+        dry_run (bool): The command was only reported.
+        duration (float): Seconds the command took.
+    """
+
+    def __init__(self, action, command, returncode=None, output="", error=None, dry_run=False, duration=0.0):
+        self.action = action
+        self.command = command
+        self.returncode = returncode
+        self.output = output
+        self.error = error
+        self.dry_run = dry_run
+        self.duration = duration
+
+    @property
+    def ok(self):
+        # A dry run counts as a success so the ladder stops where it would have;
+        # Escalation.powered_off and suspended leave it out.
+        return self.dry_run or (self.error is None and self.returncode == 0)
+
+    def describe(self):
+        """
+        Returns a one-line summary for the log.
+        """
+        command = " ".join(self.command) if self.command else "-"
+        if self.dry_run:
+            outcome = "dry run, not executed"
+        elif self.error:
+            outcome = f"failed: {self.error}"
+        else:
+            outcome = f"exit status {self.returncode}"
+            if self.output:
+                outcome += f" ({self.output.splitlines()[0]})"
+        return f"Escalation stage '{self.action}' ({command}): {outcome}"
+
+
+class Escalation:
+    """
+    Outcome of a whole ladder.
+
+    Attributes:
+        results (list): StageResult of each stage that ran.
+        cancelled (bool): A click (or Exit) stopped the ladder before its end.
+    """
+
+    def __init__(self):
+        self.results = []
+        self.cancelled = False
+
+    @property
+    def powered_off(self):
+        """
+        True if a stage that turns the machine off ran successfully. A dry run
+        does not count: the machine is still on, so monitoring goes on.
+        """
+        return any(result.ok and not result.dry_run and result.action in POWER_OFF_ACTIONS
+                   for result in self.results)
+
+    @property
+    def suspended(self):
+        """
+        True if a sleep or hibernate stage ran successfully (not as a dry run).
+        """
+        return any(result.ok and not result.dry_run and result.action in SUSPEND_ACTIONS
+                   for result in self.results)
+
+
+class ActionExecutor:
+    """
+    Runs escalation ladders with the power backend's commands.
+
+    Args:
+        power: Power backend; power.command(action) returns the argument list
+            for an action, or None if it is not available.
+        runner (callable, optional): Runs a command: runner(action, command, timeout)
+            -> (exit status, output). Defaults to run_command (simulator.py
+            passes its own).
+        timeout (float): Seconds each command may take.
+    """
+
+    def __init__(self, power, runner=run_command, timeout=ACTION_TIMEOUT):
+        self.power = power
+        self.runner = runner
+        self.timeout = timeout
+
+    def run_stage(self, action, dry_run=False):
+        """
+        Runs one action now.
+
+        Returns:
+            StageResult
+        """
+        command = self.power.command(action)
+        if command is None:
+            return StageResult(action, None, error="not available on this platform")
+        if dry_run or self.power.dry_run:
+            return StageResult(action, command, dry_run=True)
+        began = time.monotonic()
+        try:
+            returncode, output = self.runner(action, command, self.timeout)
+        except subprocess.TimeoutExpired:
+            return StageResult(action, command, error=f"timed out after {self.timeout} seconds",
+                               duration=time.monotonic() - began)
+        except OSError as e:
+            return StageResult(action, command, error=str(e), duration=time.monotonic() - began)
+        return StageResult(action, command, returncode, output, duration=time.monotonic() - began)
+
+    def escalate(self, ladder, cancel_event, clock, dry_run=False, on_stage=None):
+        """
+        Runs the stages of `ladder` in order, waiting each stage's delay first,
+        until one takes the machine down (sleep, hibernate or shutdown). A failed
+        stage is reported and the ladder moves on to the next one.
+
+        Args:
+            ladder (list): Stages, as described in the module docstring.
+            cancel_event (threading.Event): Set by a click (or Exit); stops the
+                ladder during a delay.
+            clock: Time source whose wait(event, timeout) does the delays (see clock.py).
+            dry_run (bool): Report the commands without running them.
+            on_stage (callable, optional): Called with each StageResult.
+
+        Returns:
+            Escalation
+        """
+        escalation = Escalation()
+        for stage in ladder:
+            if clock.wait(cancel_event, stage.get("delay", 0)):
+                escalation.cancelled = True
+                break
+            result = self.run_stage(stage["action"], dry_run)
+            escalation.results.append(result)
+            if on_stage:
+                on_stage(result)
+            if result.ok and result.action in POWER_OFF_ACTIONS + SUSPEND_ACTIONS:
+                break
+        return escalation
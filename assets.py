@@ -0,0 +1,183 @@
+"""
+Precomputed assets for Deadman's switch.
+
+The tray icon is decoded and converted once, into raw RGBA bitmaps at each size
+the tray needs, and stored in icon_cache.bin next to icon.ico (or built into the
+frozen executable, see DeadManSwitch.spec). Later starts turn the cached bytes
+straight into an image without decoding icon.ico, so PIL's file-format plugins
+are never loaded; the decoded source images are closed as soon as the bitmaps
+exist. HTTP responses are encoded once, with their Content-Length, and written
+as-is for every request.
+
+Build the icon cache ahead of time with:
+    python assets.py build icon.ico icon_cache.bin
+"""
+import os
+import struct
+import sys
+
+from logger import LOG
+
+
+ICON_CACHE_PATH = "icon_cache.bin"
+ICON_SIZES = (16, 32) # Small (tray at 100% scaling) and large (tray at 200%) icon sizes
+TRAY_ICON_SIZE = 32
+
+CACHE_MAGIC = b"DMSICON1"
+CACHE_HEADER = struct.Struct("<8sI")  # Magic, number of bitmaps
+CACHE_ENTRY = struct.Struct("<III")   # Width, height, byte length
+
+# size -> (width, height, RGBA bytes), filled by load_icons()
+_ICONS = {}
+_IMAGES = {}
+
+
+def resource_path(name):
+    """
+    Returns the path of a bundled file: inside the PyInstaller bundle if it is
+    there, otherwise `name` itself (relative to the working directory).
+    """
+    bundle = getattr(sys, "_MEIPASS", None)
+    if bundle and os.path.exists(os.path.join(bundle, name)):
+        return os.path.join(bundle, name)
+    return name
+
+
+# ------------------- Icon Bitmaps ------------------- #
+def render_icons(ico_path, sizes=ICON_SIZES):
+    """
+    Decodes `ico_path` (or draws the default icon if it cannot be read) and
+    renders RGBA bitmaps at each of `sizes`. All PIL images are closed before
+    returning; only the raw bytes are kept.
+
+    Returns:
+        dict: size -> (width, height, RGBA bytes).
+    """
+    from PIL import Image, ImageDraw
+
+    try:
+        source = Image.open(ico_path)
+        source.load()
+    except Exception as e:
+        LOG.warning("Could not load %s (%s). Using default generated icon.", ico_path, e)
+        source = Image.new("RGB", (64, 64), "blue")
+        ImageDraw.Draw(source).ellipse((16, 16, 48, 48), fill="white")
+
+    icons = {}
+    with source:
+        rgba = source.convert("RGBA")
+        with rgba:
+            for size in sizes:
+                if rgba.size == (size, size):
+                    icons[size] = (size, size, rgba.tobytes())
+                else:
+                    with rgba.resize((size, size), Image.LANCZOS) as resized:
+                        icons[size] = (size, size, resized.tobytes())
+    return icons
+
+
+def save_icon_cache(path, icons):
+    with open(path, "wb") as f:
+        f.write(CACHE_HEADER.pack(CACHE_MAGIC, len(icons)))
+        for width, height, data in icons.values():
+            f.write(CACHE_ENTRY.pack(width, height, len(data)))
+            f.write(data)
+
+
+def read_icon_cache(path):
+    """
+    Returns:
+        dict: size -> (width, height, RGBA bytes).
+
+    Raises:
+        OSError, ValueError: If the file is missing or malformed.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, count = CACHE_HEADER.unpack_from(data, 0)
+    if magic != CACHE_MAGIC:
+        raise ValueError(f"{path} is not an icon cache")
+    icons, offset = {}, CACHE_HEADER.size
+    for _ in range(count):
+        width, height, length = CACHE_ENTRY.unpack_from(data, offset)
+        offset += CACHE_ENTRY.size
+        if length != width * height * 4 or offset + length > len(data):
+            raise ValueError(f"{path} is truncated")
+        icons[width] = (width, height, data[offset:offset + length])
+        offset += length
+    return icons
+
+
+def load_icons(ico_path, cache_path=ICON_CACHE_PATH):
+    """
+    Fills the icon bitmaps from the cache, rebuilding it (and trying to save it)
+    when it is missing or older than `ico_path`. Does nothing if already loaded.
+    """
+    if _ICONS:
+        return
+    cache_path = resource_path(cache_path)
+    try:
+        if os.path.exists(ico_path) and os.path.getmtime(ico_path) > os.path.getmtime(cache_path):
+            raise ValueError("icon cache is older than the icon")
+        icons = read_icon_cache(cache_path)
+        if not set(ICON_SIZES) <= set(icons):
+            raise ValueError("icon cache lacks a size")
+    except (OSError, ValueError):
+        icons = render_icons(ico_path)
+        try:
+            save_icon_cache(cache_path, icons)
+        except OSError:
+            pass # Read-only location: rebuilt in memory on each start
+    _ICONS.update(icons)
+
+
+def icon_image(size=TRAY_ICON_SIZE):
+    """
+    Returns the icon as an RGBA PIL image of `size` pixels, sharing the cached
+    bytes (no decoding). load_icons() must have been called.
+    """
+    if size not in _IMAGES:
+        from PIL import Image
+        width, height, data = _ICONS[size]
+        _IMAGES[size] = Image.frombuffer("RGBA", (width, height), data, "raw", "RGBA", 0, 1)
+    return _IMAGES[size]
+
+
+# ------------------- HTTP Responses ------------------- #
+def http_response(status, reason, content_type=None, body=b""):
+    """
+    Encodes a complete HTTP/1.1 response (status line, headers and body) once,
+    for a server that closes the connection after each request.
+
+    Args:
+        status (int): Status code, e.g. 200.
+        reason (str): Reason phrase, e.g. "OK".
+        content_type (str, optional): Content-Type header.
+        body (bytes or str): The body; strings are encoded as UTF-8.
+
+    Returns:
+        bytes: The response, ready to be written to the socket.
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    headers = [f"HTTP/1.1 {status} {reason}"]
+    if content_type:
+        headers.append(f"Content-Type: {content_type}")
+    if status != 204:
+        headers.append(f"Content-Length: {len(body)}")
+    headers.append("Connection: close")
+    return ("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body
+
+
+def main(argv):
+    if len(argv) != 4 or argv[1] != "build":
+        print(__doc__.split("\n\n")[-1].strip())
+        return 2
+    icons = render_icons(argv[2])
+    save_icon_cache(argv[3], icons)
+    print(f"Wrote {len(icons)} bitmaps ({', '.join(f'{size}px' for size in icons)}) to {argv[3]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
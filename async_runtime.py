@@ -0,0 +1,424 @@
+"""
+Optional asyncio core for Deadman's switch.
+
+One event loop, running on a single background thread, owns the scheduler, the
+click listener, the notifier and the click logger as tasks. The tray (pystray)
+and Settings (Tkinter) keep their own threads and talk to the loop only through
+the thread-safe `click()`, `reschedule()` and `request_stop()` methods, so a
+click or an Exit is seen by the loop within milliseconds and stopping cancels
+every pending wait.
+
+Enabled with `"runtime": "asyncio"` in config.json.
+"""
+import asyncio
+import math
+import threading
+from datetime import datetime
+
+import assets
+import channels
+import metrics
+import scheduler
+from clock import RealClock
+from logger import LOG
+from tracing import TRACER
+
+
+NO_CONTENT_RESPONSE = assets.http_response(204, "No Content")
+
+
+class AsyncRuntime:
+    """
+    Runs the monitoring cycle as asyncio tasks on a dedicated thread.
+
+    Blocking work (showing the toast, appending to the log, running the escalation
+    ladder) is handed to the loop's default executor so it never stalls the loop.
+
+    Args:
+        load_config (callable): Returns the configuration dictionary.
+        notify (callable): Shows the "Are you awake?" prompt.
+        log_click (callable): Called with (source, cycle_id, latency) to record a click.
+        escalate (callable): Runs the escalation ladder: escalate(config, cancel_event)
+            -> actions.Escalation. Blocks; `cancel_event` (a threading.Event) is
+            set by a click or a stop request.
+        click_response (bytes): Complete HTTP response (headers and body) for '/click'.
+        host (str): Interface for the click listener.
+        port (int): Port for the click listener.
+        read_timeout (float): Seconds a connection may take to send its request.
+        display_timeout (float): Longest wait for `notify` to confirm the
+            notification is on screen; the response window starts after that.
+        wait_for_idle (callable, optional): Holds each notification back while the
+            user is active: wait_for_idle(config, cancel_event) -> bool. Blocks;
+            `cancel_event` is set by a stop request or a reschedule.
+        before_start (callable, optional): Called (on the executor) before each wait
+            for the start time, e.g. to adapt the schedule.
+        acknowledge (callable, optional): Decides whether a '/click' counts:
+            acknowledge(channel, token) -> channels.ACCEPTED, DUPLICATE or STALE
+            (see channels.FanOut). Every click counts without it.
+        expired_response (bytes): Response for a '/click' from an earlier prompt.
+        routes (dict, optional): Extra GET paths, each mapped to a callable that
+            returns the complete response (run on the executor), e.g. '/history'.
+        quiet_period (callable, optional): Called (on the executor) with the config
+            before each notification; returns the quiet period in effect (with
+            an `end` Unix time), or None. No notification goes out during one.
+        log_missed (callable, optional): Called (on the executor) with (cycle_id,
+            time the notification was shown) when it goes unanswered.
+        clock (optional): Time source (see clock.py) for every deadline,
+            latency and drift reading; the waits themselves stay on the event
+            loop. Defaults to the system clocks.
+    """
+
+    def __init__(self, load_config, notify, log_click, escalate, click_response=b"",
+                 host="localhost", port=8888, read_timeout=5, display_timeout=30,
+                 wait_for_idle=None, before_start=None, acknowledge=None, expired_response=b"",
+                 routes=None, quiet_period=None, log_missed=None, clock=None):
+        self._load_config = load_config
+        self._notify = notify
+        self._log_click = log_click
+        self._escalate = escalate
+        self._escalation_cancel = threading.Event()
+        self._wait_for_idle = wait_for_idle
+        self._idle_cancel = threading.Event()
+        self._before_start = before_start
+        self._stopping = False
+        self._acknowledge = acknowledge
+        self._click_response = click_response
+        self._expired_response = expired_response
+        self._routes = routes or {}
+        self._quiet_period = quiet_period
+        self._log_missed = log_missed
+        self._clock = clock or RealClock()
+        self._host = host
+        self._port = port
+        self._read_timeout = read_timeout
+        self._display_timeout = display_timeout
+
+        self._thread = None
+        self._loop = None
+        self._ready = threading.Event()
+        self._click_event = None
+        self._stop_event = None
+        self._reschedule_event = None
+        self._log_queue = None
+        self._cycle_id = 0
+        self._notified_at = None
+
+    # ---- Thread-safe API (called from the tray / UI threads) ---- #
+    def start(self):
+        """
+        Starts the event loop thread and waits until the listener is set up.
+        """
+        self._thread = threading.Thread(target=asyncio.run, args=(self._main(),),
+                                        name="AsyncRuntime", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def click(self, source):
+        """
+        Registers an "I'm Awake" confirmation from any thread.
+
+        Args:
+            source (str): How the click was registered (e.g., "tray menu").
+        """
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._on_click, source)
+
+    def reschedule(self):
+        """
+        Interrupts the pending start-time or interval wait so it is recomputed
+        from the current configuration. Call after the configuration changed.
+        """
+        self._idle_cancel.set()
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._reschedule_event.set)
+
+    def request_stop(self):
+        """
+        Asks the loop to cancel all tasks and exit. Does not block.
+        """
+        self._stopping = True
+        self._escalation_cancel.set()
+        self._idle_cancel.set()
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+
+    def join(self, timeout=None):
+        """
+        Waits for the loop thread to finish.
+        """
+        if self._thread:
+            self._thread.join(timeout)
+
+    # ---- Loop side ---- #
+    def _on_click(self, source):
+        self._click_event.set()
+        self._escalation_cancel.set()
+        latency = self._clock.time() - self._notified_at if self._notified_at else math.nan
+        self._log_queue.put_nowait((source, self._cycle_id, latency))
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._click_event = asyncio.Event()
+        self._stop_event = asyncio.Event()
+        self._reschedule_event = asyncio.Event()
+        self._log_queue = asyncio.Queue()
+
+        server = None
+        try:
+            server = await asyncio.start_server(self._handle_connection, self._host, self._port)
+            LOG.info("Async click listener started on http://%s:%s.", self._host, self._port)
+        except OSError as e:
+            metrics.SERVER_ERRORS.inc(kind="bind")
+            LOG.error("HTTP server error: %s. Port %s might be in use. Only the tray menu can confirm.", e, self._port)
+
+        tasks = [
+            asyncio.create_task(self._monitor(), name="monitor"),
+            asyncio.create_task(self._logger(), name="logger"),
+        ]
+        self._ready.set()
+
+        await self._stop_event.wait()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if server:
+            server.close()
+            await server.wait_closed()
+        if metrics.STATE.current() != "shutting_down":
+            metrics.STATE.set_state("stopped")
+        LOG.info("Async runtime stopped.")
+
+    async def _handle_connection(self, reader, writer):
+        """
+        Minimal HTTP/1.x handler. Reads the request head under a deadline, so an
+        idle preconnect socket is dropped without affecting any other connection.
+        """
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self._read_timeout)
+            request_line = head.split(b"\r\n", 1)[0].decode("latin-1")
+            parts = request_line.split()
+            path, _, query = (parts[1] if len(parts) >= 2 else "").partition("?")
+
+            if parts and parts[0] == "GET" and path == "/click":
+                channel, token = channels.parse_click_query(query)
+                with TRACER.span("click", source=channels.click_source(channel), cycle=self._cycle_id) as span:
+                    verdict = self._acknowledge(channel, token) if self._acknowledge else channels.ACCEPTED
+                    if verdict == channels.ACCEPTED:
+                        self._on_click(channels.click_source(channel))
+                    span.set(verdict=verdict)
+                writer.write(self._expired_response if verdict == channels.STALE else self._click_response)
+            elif parts and parts[0] == "GET" and path == "/metrics":
+                body = metrics.REGISTRY.render().encode("utf-8")
+                writer.write(b"HTTP/1.1 200 OK\r\n"
+                             b"Content-Type: " + metrics.CONTENT_TYPE.encode() + b"\r\n"
+                             b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                             b"Connection: close\r\n\r\n" + body)
+            elif parts and parts[0] == "GET" and path in self._routes:
+                writer.write(await self._loop.run_in_executor(None, self._routes[path]))
+            else:
+                writer.write(NO_CONTENT_RESPONSE)
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            metrics.SERVER_ERRORS.inc(kind="request")
+        finally:
+            writer.close()
+
+    async def _logger(self):
+        while True:
+            source, cycle_id, latency = await self._log_queue.get()
+            await self._loop.run_in_executor(None, self._log_click, source, cycle_id, latency)
+
+    async def _sleep(self, seconds):
+        """
+        Sleeps for `seconds` unless reschedule() is called first.
+
+        Returns:
+            bool: True if the full time elapsed, False if rescheduled.
+        """
+        try:
+            await asyncio.wait_for(self._reschedule_event.wait(), seconds)
+            return False
+        except asyncio.TimeoutError:
+            return True
+
+    async def _wait_until_start(self, config):
+        """
+        Async counterpart of wait_until_time(): one deadline, looked up in the
+        compiled schedule and slept on directly, with the same clock-jump
+        detection and catch-up policy.
+
+        Returns:
+            scheduler.Window: The window that started, or None if rescheduled.
+        """
+        schedule = scheduler.config_schedule(config)
+        window = schedule.next_window(self._clock.now())
+        LOG.info("Waiting until %s to start monitoring...", f"{window.start:%Y-%m-%d %H:%M}")
+        metrics.STATE.set_state("waiting_for_start")
+        while True:
+            metrics.NEXT_DEADLINE.set(window.start.timestamp())
+            remaining = window.start.timestamp() - self._clock.time()
+            if remaining > 0:
+                wall_start, mono_start = self._clock.time(), self._clock.monotonic()
+                if not await self._sleep(min(remaining, scheduler.MAX_SLEEP_SECONDS)):
+                    return None
+                drift = (self._clock.time() - wall_start) - (self._clock.monotonic() - mono_start)
+                if abs(drift) > scheduler.CLOCK_JUMP_TOLERANCE:
+                    LOG.warning("Clock jump of %+.0fs detected (suspend/resume or time change). Rechecking start time.", drift)
+                continue
+
+            next_window = scheduler.resolve_late_start(window, schedule, config["catch_up_policy"],
+                                                       config["catch_up_minutes"] * 60, now=self._clock.now())
+            if next_window is None:
+                metrics.WAKEUP_JITTER.observe(self._clock.time() - window.start.timestamp(), wait="start")
+                return window
+            metrics.MISSED_STARTS.inc()
+            LOG.warning("Start time %s was missed; skipping to the next window.", f"{window.start:%Y-%m-%d %H:%M}")
+            window = next_window
+
+    async def _sleep_interval(self, until=None):
+        """
+        Sleeps for notification_interval, or until `until` (the end of the
+        schedule window) if sooner; a reschedule recomputes the remaining time
+        from the new value.
+        """
+        sleep_started = self._clock.monotonic()
+        while True:
+            self._reschedule_event.clear()
+            interval = self._load_config()["notification_interval"]
+            remaining = sleep_started + interval - self._clock.monotonic()
+            if until is not None:
+                remaining = min(remaining, until.timestamp() - self._clock.time())
+            if remaining <= 0:
+                return
+            metrics.STATE.set_state("sleeping")
+            metrics.NEXT_DEADLINE.set(self._clock.time() + remaining)
+            if await self._sleep(remaining):
+                metrics.WAKEUP_JITTER.observe(max(self._clock.monotonic() - sleep_started - interval, 0.0), wait="interval")
+                return
+
+    async def _show_notification(self):
+        """
+        Runs `notify` on the executor and waits (at most display_timeout) for it
+        to confirm the display, recording the dispatch latency.
+
+        Returns:
+            bool: True if the notification was confirmed on screen.
+        """
+        submitted = self._clock.time()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._loop.run_in_executor(None, self._notify)),
+                                   self._display_timeout)
+            latency = self._clock.time() - submitted
+            metrics.NOTIFICATION_DISPATCH.observe(latency)
+            LOG.info("Notification displayed %.0f ms after it was queued.", latency * 1000)
+            return True
+        except asyncio.TimeoutError:
+            LOG.warning("Notification not confirmed within %ss.", self._display_timeout)
+        except Exception as e:
+            metrics.NOTIFICATION_ERRORS.inc()
+            LOG.error("Notification failed: %s", e)
+        return False
+
+    async def _monitor(self):
+        # Each schedule window runs the notification cycles until it ends; then the next one is waited for
+        while True:
+            window = await self._next_window()
+            if not await self._cycles(window.end):
+                return
+
+    async def _next_window(self):
+        # A configuration change interrupts the wait; the start time is then recomputed.
+        while True:
+            if self._before_start:
+                await self._loop.run_in_executor(None, self._before_start)
+            self._reschedule_event.clear()
+            window = await self._wait_until_start(self._load_config())
+            if window is not None:
+                return window
+
+    async def _cycles(self, until):
+        """
+        Runs notification cycles until the window ends at `until` (None: never).
+
+        Returns:
+            bool: True once the window ended, False if the machine was powered
+                off or the runtime is stopping.
+        """
+        quieted_by = None # The quiet period last reported
+        while True:
+            if until is not None and self._clock.now() >= until:
+                LOG.info("Schedule window ended at %s. Waiting for the next one.", f"{until:%H:%M}")
+                return True
+            if self._wait_for_idle:
+                self._idle_cancel.clear()
+                if self._stopping:
+                    return False
+                config = self._load_config()
+                if not await self._loop.run_in_executor(None, self._wait_for_idle, config, self._idle_cancel):
+                    continue # Rescheduled: starts over with the new values (a stop cancels this task)
+                if until is not None and self._clock.now() >= until:
+                    continue # The input stayed active past the end of the window
+            config = self._load_config()
+            if self._quiet_period:
+                quiet = await self._loop.run_in_executor(None, self._quiet_period, config)
+                if quiet is not None:
+                    if quiet != quieted_by:
+                        quieted_by = quiet
+                        metrics.QUIET_PERIODS.inc()
+                        LOG.info("Quiet period '%s' until %s; no notification.", quiet.summary, f"{datetime.fromtimestamp(quiet.end):%Y-%m-%d %H:%M}")
+                    metrics.STATE.set_state("quiet")
+                    resume = quiet.end if until is None else min(quiet.end, until.timestamp())
+                    metrics.NEXT_DEADLINE.set(resume)
+                    self._reschedule_event.clear()
+                    await self._sleep(min(max(resume - self._clock.time(), 0), scheduler.MAX_SLEEP_SECONDS))
+                    continue
+            # Arms the click event before the notification goes out
+            self._click_event.clear()
+            self._escalation_cancel.clear()
+            self._notified_at = self._clock.time()
+            self._cycle_id = int(self._notified_at)
+            metrics.STATE.set_state("awaiting_click")
+            cycle_id = self._cycle_id
+            with TRACER.span("notify", cycle=cycle_id) as span:
+                displayed = await self._show_notification()
+                span.set(displayed=displayed)
+            if not displayed and not self._click_event.is_set():
+                # Nobody was asked, so an unanswered window must not escalate
+                self._cycle_id, self._notified_at = 0, None
+                metrics.PROMPTS_NOT_SHOWN.inc()
+                LOG.error("The notification did not show. Not escalating; trying again in %s seconds.",
+                          config["notification_interval"], cycle=cycle_id)
+                with TRACER.span("sleep", cycle=cycle_id):
+                    await self._sleep_interval(until)
+                continue
+            # The response window starts once the notification is on screen
+            self._notified_at = self._clock.time()
+            metrics.NEXT_DEADLINE.set(self._notified_at + config["notification_duration"])
+
+            with TRACER.span("listen", cycle=cycle_id) as span:
+                try:
+                    await asyncio.wait_for(self._click_event.wait(), config["notification_duration"])
+                    user_responded = True
+                except asyncio.TimeoutError:
+                    user_responded = False
+                span.set(clicked=user_responded)
+            notified_at = self._notified_at
+            self._cycle_id, self._notified_at = 0, None
+
+            if not user_responded:
+                LOG.warning("No response within duration. Escalating.", cycle=cycle_id)
+                if self._log_missed:
+                    await self._loop.run_in_executor(None, self._log_missed, cycle_id, notified_at)
+                with TRACER.span("escalate", cycle=cycle_id):
+                    escalation = await self._loop.run_in_executor(None, self._escalate, config,
+                                                                  self._escalation_cancel)
+                if escalation.powered_off or self._stop_event.is_set():
+                    return False
+                if escalation.suspended:
+                    LOG.info("Resumed after the escalation. Waiting for the next start time.")
+                    return True
+
+            outcome = "User confirmed" if user_responded else "Escalation ended without a shutdown"
+            LOG.info("%s. Sleeping for %s seconds before next check.", outcome, config["notification_interval"])
+            with TRACER.span("sleep", cycle=cycle_id):
+                await self._sleep_interval(until)
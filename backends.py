@@ -0,0 +1,294 @@
+"""
+Platform backends for Deadman's switch: the notifier, the tray icon, the
+power actions, the startup-shortcut installer and the input-idle source.
+
+The Windows and desktop implementations import their dependencies (winotify,
+pystray, PIL, win32com) the first time they are used, not when the application
+is imported, so the core starts quickly and also runs where those packages are
+missing. Linux gets notify-send, systemd power actions and an XDG autostart
+entry; the no-op set (see noop_backends()) does nothing (its power actions are
+a dry run) and suits headless runs.
+
+Every backend has the same small interface:
+    notifier.start() / notifier.stop()   (prepare ahead of the first toast / release)
+    notifier.show(title, message, button_label, button_url)
+    tray(name, image_factory, items) -> object with run() and stop()
+    power.command(action) -> argument list, or None ("lock", "sleep", "hibernate", "shutdown")
+    power.dry_run          (True: commands are reported, never run)
+    shortcut.install(target, icon_path) -> str (where the shortcut was created), or None
+    presence.idle_seconds() -> seconds since the last input, or None (see presence.py)
+"""
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+import threading
+
+import notifier_worker
+import presence
+from logger import LOG
+
+
+class Backends:
+    """
+    The set of backends the application uses.
+
+    Args:
+        notifier: Shows the "Are you awake?" prompt.
+        tray (callable): Builds the tray icon: tray(name, image_factory, items),
+            where `items` is a list of (label, callback(icon, item)).
+        power: Commands that lock, suspend or power off the machine (run by actions.py).
+        shortcut: Installs a start-on-login shortcut.
+        presence: Reads how long the input has been idle.
+    """
+
+    def __init__(self, notifier, tray, power, shortcut, presence):
+        self.notifier = notifier
+        self.tray = tray
+        self.power = power
+        self.shortcut = shortcut
+        self.presence = presence
+
+
+# ------------------- Notifiers ------------------- #
+class WinotifyNotifier:
+    """
+    Windows toast notifications through winotify. The toast is built once and
+    shown again every cycle; it is only rebuilt if its text changes.
+    """
+
+    def __init__(self, app_id, script_path):
+        self.app_id = app_id
+        self.script_path = script_path
+        self._registry = None
+        self._template = None
+        self._template_key = None
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def show(self, title, message, button_label, button_url):
+        key = (title, message, button_label, button_url)
+        if key != self._template_key:
+            from winotify import Notification, Registry, audio
+            if self._registry is None:
+                # Registers the app id, once, so the toast shows the application's name
+                self._registry = Registry(app_id=self.app_id, script_path=self.script_path)
+            toast = Notification(app_id=self.app_id, title=title, msg=message, duration="long")
+            toast.set_audio(audio.Default, loop=False)
+            toast.add_actions(label=button_label, launch=button_url)
+            self._template, self._template_key = toast, key
+        self._template.show()
+
+
+class NotifySendNotifier:
+    """
+    Desktop notifications through notify-send (libnotify). The button becomes a
+    link in the message body. Falls back to printing when notify-send is missing.
+    """
+
+    def __init__(self, app_id):
+        self.app_id = app_id
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def show(self, title, message, button_label, button_url):
+        if shutil.which("notify-send") is None:
+            LOG.info("%s %s %s: %s", title, message, button_label, button_url)
+            return
+        subprocess.Popen(["notify-send", "--urgency=critical", f"--app-name={self.app_id}",
+                          title, f"{message}\n{button_label}: {button_url}"],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class NoopNotifier:
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def show(self, title, message, button_label, button_url):
+        pass
+
+
+# ------------------- Tray ------------------- #
+class PystrayTray:
+    """
+    System tray icon through pystray.
+    """
+
+    def __init__(self, name, image_factory, items):
+        from pystray import Icon, Menu, MenuItem
+        self._icon = Icon(name)
+        self._icon.icon = image_factory()
+        self._icon.menu = Menu(*(MenuItem(label, callback) for label, callback in items))
+
+    def run(self):
+        self._icon.run()
+
+    def stop(self):
+        self._icon.stop()
+
+
+def pystray_or_headless(name, image_factory, items):
+    """
+    Builds a PystrayTray, or a HeadlessTray if pystray cannot start (e.g. no
+    display on Linux).
+    """
+    try:
+        return PystrayTray(name, image_factory, items)
+    except Exception as e:
+        LOG.warning("Tray icon unavailable (%s). Running without one; press Ctrl+C to exit.", e)
+        return HeadlessTray(name, image_factory, items)
+
+
+class HeadlessTray:
+    """
+    Stands in for the tray where there is none: run() blocks until stop() is
+    called or the process is interrupted (Ctrl+C).
+    """
+
+    def __init__(self, name, image_factory, items):
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.wait(1): # Short waits keep Ctrl+C responsive on Windows
+                pass
+        except KeyboardInterrupt:
+            pass
+
+    def stop(self):
+        self._stopped.set()
+
+
+# ------------------- Power Actions ------------------- #
+class WindowsPower:
+    """
+    Lock, sleep, hibernate and shutdown with the Windows system tools. The
+    grace period before a shutdown is a stage delay (see actions.py), so the
+    shutdown itself is immediate.
+    """
+    dry_run = False
+    COMMANDS = {
+        "lock": ["rundll32.exe", "user32.dll,LockWorkStation"],
+        # rundll32 powrprof.dll,SetSuspendState hibernates instead when hibernation is enabled
+        "sleep": ["powershell", "-NoProfile", "-NonInteractive", "-Command",
+                  "Add-Type -AssemblyName System.Windows.Forms; "
+                  "[System.Windows.Forms.Application]::SetSuspendState('Suspend', $false, $false)"],
+        "hibernate": ["shutdown", "/h"],
+        "shutdown": ["shutdown", "/s", "/t", "0"],
+    }
+
+    def command(self, action):
+        return self.COMMANDS.get(action)
+
+
+class LinuxPower:
+    """
+    Lock, sleep, hibernate and shutdown through systemd (logind).
+    """
+    dry_run = False
+    COMMANDS = {
+        "lock": ["loginctl", "lock-session"],
+        "sleep": ["systemctl", "suspend"],
+        "hibernate": ["systemctl", "hibernate"],
+        "shutdown": ["systemctl", "poweroff"],
+    }
+
+    def command(self, action):
+        return self.COMMANDS.get(action)
+
+
+class DryRunPower(LinuxPower):
+    """
+    Reports the systemd commands without running them.
+    """
+    dry_run = True
+
+
+# ------------------- Startup Shortcut ------------------- #
+class WindowsStartupShortcut:
+    """
+    Creates a .lnk file in the current user's Startup folder through win32com.
+    """
+
+    def install(self, target, icon_path):
+        import win32com.client
+
+        # Gets the path to the current user's Startup folder
+        startup_folder = os.path.join(os.environ['APPDATA'], 'Microsoft', 'Windows', 'Start Menu', 'Programs', 'Startup')
+        shortcut_path = os.path.join(startup_folder, "Deadman's Switch.lnk")
+
+        shell = win32com.client.Dispatch("WScript.Shell")
+        shortcut = shell.CreateShortCut(shortcut_path)
+        shortcut.TargetPath = target
+        shortcut.Description = "Runs Deadman's Switch on Windows startup."
+        shortcut.IconLocation = icon_path
+        shortcut.Save()
+        return shortcut_path
+
+
+class XdgAutostart:
+    """
+    Writes an XDG autostart entry (~/.config/autostart) for desktop sessions.
+    """
+
+    def install(self, target, icon_path):
+        config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+        entry_path = os.path.join(config_home, "autostart", "deadmans-switch.desktop")
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        with open(entry_path, "w") as f:
+            f.write("[Desktop Entry]\n"
+                    "Type=Application\n"
+                    "Name=Deadman's Switch\n"
+                    f"Exec={target}\n"
+                    f"Icon={icon_path}\n")
+        return entry_path
+
+
+class NoopShortcut:
+    """
+    Installs nothing, where there is no startup mechanism to use.
+    """
+
+    def install(self, target, icon_path):
+        return None
+
+
+# ------------------- Selection ------------------- #
+def noop_backends():
+    """
+    Backends that notify, shut down and install nothing (tests, benchmarks, servers).
+    """
+    return Backends(NoopNotifier(), HeadlessTray, DryRunPower(), NoopShortcut(), presence.NoIdleSource())
+
+
+def default_backends(app_id, script_path):
+    """
+    Picks the backends for the current platform. Nothing is imported here;
+    only module availability is checked.
+
+    Args:
+        app_id (str): Application name shown on notifications.
+        script_path (str): Path of the main script (used to register the toast app id).
+    """
+    has_pystray = importlib.util.find_spec("pystray") is not None
+    tray = pystray_or_headless if has_pystray else HeadlessTray
+    if sys.platform == "win32":
+        # One PowerShell process for all toasts, instead of one per toast through winotify
+        worker = notifier_worker.powershell_command(app_id)
+        notifier = notifier_worker.WorkerNotifier(worker) if worker else WinotifyNotifier(app_id, script_path)
+        return Backends(notifier, tray, WindowsPower(), WindowsStartupShortcut(), presence.default_source())
+    if sys.platform.startswith("linux"):
+        return Backends(NotifySendNotifier(app_id), tray, LinuxPower(), XdgAutostart(), presence.default_source())
+    return Backends(NoopNotifier(), tray, DryRunPower(), NoopShortcut(), presence.NoIdleSource())
@@ -0,0 +1,90 @@
+"""
+Range-query benchmark for the binary wake store (wake_store.py).
+
+Builds a store with --records synthetic events spread over ten years in a
+temporary directory, then times `WakeStore.range()` (sparse-index bisect, binary
+search, zero-copy slice) for random one-day and one-month windows.
+
+Usage:
+    python benchmarks/bench_wake_store.py [--records 10000000] [--queries 10000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import wake_store # noqa: E402
+
+
+def build_store(path, records, start, span):
+    """
+    Writes `records` evenly spaced events directly in the store's record format.
+    """
+    step = span / records
+    with open(path, "wb") as f:
+        f.write(wake_store.HEADER.pack(wake_store.MAGIC, wake_store.RECORD.size))
+        chunk = 100000
+        for first in range(0, records, chunk):
+            f.write(b"".join(wake_store.RECORD.pack(start + i * step, i, 5.0, i & 1)
+                             for i in range(first, min(first + chunk, records))))
+
+
+def time_queries(store, start, span, window, queries):
+    """
+    Returns per-query latencies (seconds) for random `window`-second ranges.
+    """
+    latencies = []
+    matched = 0
+    for _ in range(queries):
+        low = start + random.random() * (span - window)
+        began = time.perf_counter()
+        view = store.range(low, low + window)
+        matched += len(view) // wake_store.RECORD.size
+        latencies.append(time.perf_counter() - began)
+        view.release()
+    return latencies, matched / queries
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    return {
+        "p50_us": round(ordered[len(ordered) // 2] * 1e6, 2),
+        "p99_us": round(ordered[int(len(ordered) * 0.99)] * 1e6, 2),
+        "max_us": round(ordered[-1] * 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--records", type=int, default=10_000_000)
+    parser.add_argument("--queries", type=int, default=10000)
+    args = parser.parse_args()
+
+    span = 10 * 365 * 86400
+    start = time.time() - span
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "wake_log.bin")
+        began = time.perf_counter()
+        build_store(path, args.records, start, span)
+        build_seconds = time.perf_counter() - began
+
+        began = time.perf_counter()
+        store = wake_store.WakeStore(path)
+        open_seconds = time.perf_counter() - began
+
+        report = {"records": len(store), "file_mb": round(os.path.getsize(path) / 2**20, 1),
+                  "build_s": round(build_seconds, 2), "open_ms": round(open_seconds * 1000, 2)}
+        for name, window in (("day", 86400), ("month", 30 * 86400)):
+            latencies, average = time_queries(store, start, span, window, args.queries)
+            report[f"range_{name}"] = {**summarize(latencies), "avg_records": round(average)}
+        store.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,573 @@
+"""
+Benchmark suite for the click path, the scheduler and the wake log.
+
+Runs the real app module headless (see headless.py: no-op notifier, tray,
+shortcut and shutdown backends) in a temporary directory and measures:
+
+  click_rtt           GET /click round trip under concurrent clients, also with
+                      idle preconnect sockets held open against the listener
+  click_to_observe    from sending /click (or the tray handler) to wait_for_click()
+                      returning in the monitor thread
+  start_jitter        how late scheduler.sleep_until(), the wait behind
+                      wait_until_time(), wakes up after a sub-second deadline
+  interval_jitter     how late sleep_interval() returns after notification_interval
+  log_click           log_click_time() calls per second, queued and written out
+  history             GET /history round trip, the dashboard rendered from the
+                      rollups after the log_click run
+  cold_start          a fresh interpreter importing the app module
+  notifier_worker     per-toast latency and toasts per second through the
+                      persistent notification worker (the stand-in worker of
+                      notifier_worker.py, showing nothing), against starting
+                      a worker process for each toast
+  schedule_next       looking up the next window of a compiled schedule with
+                      two windows per weekday
+  quiet_lookup        whether now is in a quiet period, with 5000 calendar
+                      entries and a weekly rule (stat of the file included)
+  profiles            one scheduler driving 10000 profiles: prompting all of
+                      them at once when their window starts, acknowledging
+                      each prompt, and the memory each profile takes
+  presence_sample     one read of the input-idle time by the presence sampler
+                      (from a file an input hook touches, as on Linux)
+  schedule_advice     the adaptive schedule learning ten years of click history
+                      from scratch and advising (skipped without NumPy)
+
+Results are printed (or written with --output) as JSON. They are compared with
+a stored baseline; any metric worse than the baseline by more than the threshold
+(and, for timings, by more than NOISE_FLOOR_MS) is reported and the exit status
+is 1. --update-baseline stores the current run.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--quick] [--output results.json]
+                                        [--baseline benchmarks/baseline.json]
+                                        [--threshold 0.5] [--update-baseline]
+"""
+import argparse
+import contextlib
+import http.client
+import importlib.util
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import headless # noqa: E402
+import notifier_worker # noqa: E402
+import presence # noqa: E402
+import profiles # noqa: E402
+import quiet_calendar # noqa: E402
+import schedule_advisor # noqa: E402
+import scheduler # noqa: E402
+from wake_store import WakeStore # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD = 0.5 # 50% worse than the baseline counts as a regression
+# Sub-millisecond timings and tail percentiles vary run to run; a "_ms" metric
+# must also be this much worse in absolute terms to count.
+NOISE_FLOOR_MS = 5.0
+
+# Metric name -> which direction is better
+METRICS = {
+    "click_rtt_p50_ms": "lower",
+    "click_rtt_p99_ms": "lower",
+    "click_rtt_idle_sockets_p50_ms": "lower",
+    "click_rtt_idle_sockets_p99_ms": "lower",
+    "click_to_observe_http_p50_ms": "lower",
+    "click_to_observe_http_p99_ms": "lower",
+    "click_to_observe_tray_p50_ms": "lower",
+    "click_to_observe_tray_p99_ms": "lower",
+    "start_jitter_p50_ms": "lower",
+    "start_jitter_p99_ms": "lower",
+    "interval_jitter_p50_ms": "lower",
+    "interval_jitter_p99_ms": "lower",
+    "log_click_calls_per_s": "higher",
+    "log_click_written_per_s": "higher",
+    "history_p50_ms": "lower",
+    "history_p99_ms": "lower",
+    "cold_start_ms": "lower",
+    "notifier_worker_p50_ms": "lower",
+    "notifier_worker_p99_ms": "lower",
+    "notifier_worker_toasts_per_s": "higher",
+    "notifier_process_per_toast_ms": "lower",
+    "schedule_next_p50_ms": "lower",
+    "schedule_next_p99_ms": "lower",
+    "quiet_lookup_p50_ms": "lower",
+    "quiet_lookup_p99_ms": "lower",
+    "profiles_burst_ms": "lower",
+    "profiles_ack_p50_ms": "lower",
+    "profiles_ack_p99_ms": "lower",
+    "profiles_bytes_per_profile": "lower",
+    "presence_sample_p50_ms": "lower",
+    "presence_sample_p99_ms": "lower",
+    "schedule_advice_ms": "lower",
+}
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def add_percentiles(report, name, samples):
+    """
+    Stores the p50 and p99 of `samples` (seconds) in `report` as milliseconds.
+    """
+    report[f"{name}_p50_ms"] = round(percentile(samples, 0.50) * 1000, 3)
+    report[f"{name}_p99_ms"] = round(percentile(samples, 0.99) * 1000, 3)
+
+
+def get_click(port=8888):
+    connection = http.client.HTTPConnection("localhost", port, timeout=10)
+    try:
+        connection.request("GET", "/click")
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+# ------------------- Benchmarks ------------------- #
+def bench_click_rtt(app, clients, requests_per_client, idle_sockets=0):
+    """
+    Each client thread sends `requests_per_client` sequential /click requests,
+    one connection per request like a browser launched from the toast.
+
+    Returns:
+        list: Round-trip times in seconds.
+    """
+    idle = [socket.create_connection(("localhost", 8888)) for _ in range(idle_sockets)]
+    latencies = []
+    lock = threading.Lock()
+    start = threading.Barrier(clients)
+
+    def client():
+        own = []
+        start.wait()
+        for _ in range(requests_per_client):
+            began = time.perf_counter()
+            get_click()
+            own.append(time.perf_counter() - began)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for sock in idle:
+        sock.close()
+    return latencies
+
+
+def bench_click_to_observe(app, rounds, via_http):
+    """
+    Times the handoff from a click to the thread blocked in wait_for_click(),
+    the same call monitor_loop makes while a notification is up.
+
+    Returns:
+        list: Handoff times in seconds.
+    """
+    samples = []
+    for _ in range(rounds):
+        app.CLICK_EVENT.clear()
+        waiting = threading.Event()
+        observed = []
+
+        def monitor():
+            waiting.set()
+            if app.wait_for_click(10):
+                observed.append(time.perf_counter())
+
+        thread = threading.Thread(target=monitor)
+        thread.start()
+        waiting.wait()
+        time.sleep(0.002) # Lets the waiter block on CLICK_EVENT
+        began = time.perf_counter()
+        if via_http:
+            get_click()
+        else:
+            app.on_awake_clicked(None, None)
+        thread.join()
+        samples.append(observed[0] - began)
+    return samples
+
+
+def bench_start_jitter(app, rounds, delay=0.05):
+    """
+    Sleeps until a deadline `delay` seconds away with scheduler.sleep_until(),
+    exactly as wait_until_time() does, and records how late it woke up.
+    (wait_until_time() itself takes an HH:MM target, so one real sample would
+    take up to a minute.)
+    """
+    samples = []
+    for _ in range(rounds):
+        app.WAKE_EVENT.clear()
+        deadline = datetime.now() + timedelta(seconds=delay)
+        reached, _ = app.scheduler.sleep_until(deadline, app.WAKE_EVENT)
+        if reached:
+            samples.append(time.time() - deadline.timestamp())
+    return samples
+
+
+def bench_interval_jitter(app, rounds, interval=0.05):
+    """
+    Runs sleep_interval() with notification_interval set to `interval` seconds.
+    """
+    app.CONFIG.save({"notification_interval": interval})
+    samples = []
+    for _ in range(rounds):
+        began = time.monotonic()
+        app.sleep_interval()
+        samples.append(time.monotonic() - began - interval)
+    app.CONFIG.save({"notification_interval": app.DEFAULT_CONFIG["notification_interval"]})
+    return samples
+
+
+def bench_log_click(app, calls, batch=5000):
+    """
+    Calls log_click_time() in batches small enough for the writer's buffer,
+    flushing after each batch.
+
+    Returns:
+        tuple: (calls per second, lines written to disk per second).
+    """
+    writer = app.get_log_writer()
+    calling = 0.0
+    began = time.perf_counter()
+    for first in range(0, calls, batch):
+        count = min(batch, calls - first)
+        call_began = time.perf_counter()
+        for i in range(count):
+            app.log_click_time(source="notification", cycle_id=first + i, latency=1.5)
+        calling += time.perf_counter() - call_began
+        writer.flush(timeout=60)
+    total = time.perf_counter() - began
+    return calls / calling, calls / total
+
+
+def bench_history(rounds):
+    """
+    Fetches the /history dashboard `rounds` times, one connection per request.
+
+    Returns:
+        list: Round-trip times in seconds.
+    """
+    latencies = []
+    for _ in range(rounds):
+        began = time.perf_counter()
+        connection = http.client.HTTPConnection("localhost", 8888, timeout=10)
+        try:
+            connection.request("GET", "/history")
+            connection.getresponse().read()
+        finally:
+            connection.close()
+        latencies.append(time.perf_counter() - began)
+    return latencies
+
+
+def bench_cold_start(directory, rounds):
+    """
+    Times a fresh interpreter that imports the app module and exits.
+    """
+    code = "import headless; headless.load_app()"
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    samples = []
+    for _ in range(rounds):
+        began = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=directory, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - began)
+    return samples
+
+
+TOAST = ("Are you awake?", "Benchmark toast.", "I'm Awake!", "http://localhost:8888/click")
+
+
+def bench_notifier_worker(toasts):
+    """
+    Sends `toasts` toasts, one after the other, to one running stand-in worker.
+
+    Returns:
+        tuple: (per-toast latencies in seconds, toasts per second).
+    """
+    notifier = notifier_worker.WorkerNotifier(notifier_worker.standin_command(show="none"))
+    notifier.start()
+    try:
+        notifier.show(*TOAST) # Waits for the worker to be up
+        samples = []
+        began = time.perf_counter()
+        for _ in range(toasts):
+            sent = time.perf_counter()
+            notifier.show(*TOAST)
+            samples.append(time.perf_counter() - sent)
+        return samples, toasts / (time.perf_counter() - began)
+    finally:
+        notifier.stop()
+
+
+def bench_notifier_process_per_toast(toasts):
+    """
+    Starts a fresh stand-in worker for each toast, as winotify does with PowerShell.
+    """
+    samples = []
+    for _ in range(toasts):
+        began = time.perf_counter()
+        notifier = notifier_worker.WorkerNotifier(notifier_worker.standin_command(show="none"))
+        notifier.show(*TOAST)
+        notifier.stop()
+        samples.append(time.perf_counter() - began)
+    return samples
+
+
+def bench_schedule_next(lookups):
+    """
+    Times Schedule.next_window() at random times of the week.
+    """
+    schedule = scheduler.compile_schedule("Mon-Thu 23:00-01:00, 03:00-06:00; Fri 01:00-05:30, 23:30; "
+                                          "Sat,Sun 02:30-07:00, 22:00-23:00")
+    first = datetime(2026, 1, 5)
+    times = [first + timedelta(seconds=(i * 7919) % (7 * 86400)) for i in range(lookups)]
+    timings = []
+    for now in times:
+        began = time.perf_counter()
+        schedule.next_window(now)
+        timings.append(time.perf_counter() - began)
+    return timings
+
+
+def bench_quiet_lookup(directory, entries, lookups):
+    """
+    Writes `entries` two-hour quiet periods (one every 5 hours) and a weekly
+    rule to a JSON calendar, then times QuietCalendar.current() at random times
+    within them.
+    """
+    path = os.path.join(directory, "quiet.json")
+    first = datetime.now().replace(microsecond=0)
+    quiet = [{"start": (first + timedelta(hours=5 * i)).isoformat(),
+              "end": (first + timedelta(hours=5 * i + 2)).isoformat()} for i in range(entries)]
+    quiet.append({"start": first.isoformat(), "end": (first + timedelta(hours=10)).isoformat(),
+                  "rrule": "FREQ=WEEKLY;BYDAY=FR,SA"})
+    with open(path, "w") as f:
+        json.dump({"quiet": quiet}, f)
+    calendar = quiet_calendar.QuietCalendar()
+    now = first.timestamp()
+    calendar.refresh([path], now) # Parses and expands once
+    timings = []
+    for i in range(lookups):
+        began = time.perf_counter()
+        calendar.current([path], now + (i * 7919) % (100 * 86400))
+        timings.append(time.perf_counter() - began)
+    return timings
+
+
+def bench_profiles(count):
+    """
+    Configures `count` profiles with the same start time, then times the one
+    scheduler step that prompts them all and each acknowledgement, and measures
+    the memory the profiles take (tracemalloc).
+
+    Returns:
+        tuple: (burst seconds, acknowledgement timings, bytes per profile).
+    """
+    import tracemalloc
+
+    class StoppedClock:
+        def __init__(self, now):
+            self.now = now
+
+        def time(self):
+            return self.now
+
+    start = datetime.now().replace(hour=2, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    clock = StoppedClock(start.timestamp() - 3600)
+    config = {"start_time": "02:00", "schedule": "", "notification_duration": 60, "notification_interval": 600,
+              "catch_up_policy": scheduler.CATCH_UP_FIRE, "catch_up_minutes": 240,
+              "escalation": [{"action": "lock", "delay": 0}], "action_dry_run": True,
+              "channels": {"toast": {}},
+              "profiles": [{"name": f"user{i}", "notification_duration": 60 + i % 60} for i in range(count)]}
+    profile_scheduler = profiles.ProfileScheduler(lambda name, token, config: None, lambda *args: None, clock=clock)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    profile_scheduler.configure(config)
+    bytes_per_profile = (tracemalloc.get_traced_memory()[0] - before) / count
+    tracemalloc.stop()
+
+    clock.now = start.timestamp()
+    began = time.perf_counter()
+    profile_scheduler.advance()
+    burst = time.perf_counter() - began
+    timings = []
+    for token in list(profile_scheduler.table.tokens):
+        began = time.perf_counter()
+        profile_scheduler.acknowledge(token)
+        timings.append(time.perf_counter() - began)
+    profile_scheduler.stop()
+    profile_scheduler.run(threading.Event()) # Returns at once and shuts the workers down
+    return burst, timings, bytes_per_profile
+
+
+def bench_presence_sample(directory, samples):
+    """
+    Times PresenceSampler.sample() on a FileIdleSource.
+    """
+    path = os.path.join(directory, "last_input")
+    open(path, "w").close()
+    source, sampler = presence.FileIdleSource(path), presence.PresenceSampler()
+    timings = []
+    for _ in range(samples):
+        began = time.perf_counter()
+        sampler.sample(source)
+        timings.append(time.perf_counter() - began)
+    return timings
+
+
+def bench_schedule_advice(directory, nights, rounds):
+    """
+    Writes `nights` nights of clicks (every 10 minutes from 22:00 to a bedtime
+    around 00:30) to a wake store, then times building the schedule model from
+    it and advising.
+    """
+    path = os.path.join(directory, "history.bin")
+    store = WakeStore(path)
+    first_evening = datetime(2016, 1, 1, 22, 0).timestamp()
+    store.append_many((first_evening + night * 86400 + minute * 60, "notification", 0, 5.0)
+                      for night in range(nights) for minute in range(0, 120 + 7 * (night % 7), 10))
+    store.close()
+    timings = []
+    for _ in range(rounds):
+        began = time.perf_counter()
+        model = schedule_advisor.ScheduleModel(path, model_path=None)
+        model.update()
+        model.advise()
+        timings.append(time.perf_counter() - began)
+    return timings
+
+
+def run(quick=False):
+    scale = 0.2 if quick else 1.0
+    report = {}
+    previous_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            # The app logs every click to the console (LOG writes to whatever sys.stdout is).
+            with open(os.devnull, "w") as devnull, \
+                    contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+                app = headless.load_app()
+                if not app.start_click_listener():
+                    raise SystemExit("Port 8888 is in use; stop the app before benchmarking.")
+                try:
+                    get_click() # Warms up the listener and the log writer
+                    add_percentiles(report, "click_rtt",
+                                    bench_click_rtt(app, 8, int(100 * scale)))
+                    add_percentiles(report, "click_rtt_idle_sockets",
+                                    bench_click_rtt(app, 8, int(50 * scale), idle_sockets=50))
+                    add_percentiles(report, "click_to_observe_http",
+                                    bench_click_to_observe(app, int(200 * scale), via_http=True))
+                    add_percentiles(report, "click_to_observe_tray",
+                                    bench_click_to_observe(app, int(500 * scale), via_http=False))
+                    add_percentiles(report, "start_jitter", bench_start_jitter(app, int(50 * scale)))
+                    add_percentiles(report, "interval_jitter", bench_interval_jitter(app, int(50 * scale)))
+                    calls_per_s, written_per_s = bench_log_click(app, int(50000 * scale))
+                    report["log_click_calls_per_s"] = round(calls_per_s)
+                    report["log_click_written_per_s"] = round(written_per_s)
+                    add_percentiles(report, "history", bench_history(int(200 * scale)))
+                finally:
+                    app.stop_click_listener()
+                    app.close_log_writer()
+            report["cold_start_ms"] = round(statistics.median(bench_cold_start(directory, 5)) * 1000, 1)
+            latencies, toasts_per_s = bench_notifier_worker(int(1000 * scale))
+            add_percentiles(report, "notifier_worker", latencies)
+            report["notifier_worker_toasts_per_s"] = round(toasts_per_s)
+            report["notifier_process_per_toast_ms"] = round(
+                statistics.median(bench_notifier_process_per_toast(5)) * 1000, 1)
+            add_percentiles(report, "schedule_next", bench_schedule_next(int(10000 * scale)))
+            add_percentiles(report, "quiet_lookup", bench_quiet_lookup(directory, 5000, int(10000 * scale)))
+            burst, timings, bytes_per_profile = bench_profiles(10000)
+            report["profiles_burst_ms"] = round(burst * 1000, 1)
+            add_percentiles(report, "profiles_ack", timings)
+            report["profiles_bytes_per_profile"] = round(bytes_per_profile)
+            add_percentiles(report, "presence_sample", bench_presence_sample(directory, int(10000 * scale)))
+            if importlib.util.find_spec("numpy") is not None:
+                report["schedule_advice_ms"] = round(
+                    statistics.median(bench_schedule_advice(directory, 3650, 3)) * 1000, 1)
+        finally:
+            os.chdir(previous_directory)
+    return report
+
+
+# ------------------- Baseline ------------------- #
+def compare(results, baseline, threshold):
+    """
+    Returns:
+        list: (metric, baseline value, current value, relative change) for every
+            metric that got worse by more than `threshold`.
+    """
+    regressions = []
+    for name, better in METRICS.items():
+        old, new = baseline.get(name), results.get(name)
+        if not old or new is None:
+            continue
+        change = (new - old) / old if better == "lower" else (old - new) / old
+        if name.endswith("_ms") and abs(new - old) < NOISE_FLOOR_MS:
+            continue
+        if change > threshold:
+            regressions.append((name, old, new, round(change, 3)))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quick", action="store_true", help="Fewer samples, for a smoke run.")
+    parser.add_argument("--output", help="Also write the results JSON to this file.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float,
+                        help=f"Allowed relative slowdown (default: from the baseline file, else {DEFAULT_THRESHOLD}).")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline.")
+    args = parser.parse_args()
+
+    results = run(args.quick)
+    document = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "results": results,
+    }
+
+    status = 0
+    if args.update_baseline:
+        threshold = args.threshold if args.threshold is not None else DEFAULT_THRESHOLD
+        with open(args.baseline, "w") as f:
+            json.dump({**document, "threshold": threshold}, f, indent=2)
+            f.write("\n")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        threshold = args.threshold if args.threshold is not None else baseline.get("threshold", DEFAULT_THRESHOLD)
+        regressions = compare(results, baseline["results"], threshold)
+        document["baseline"] = {"path": args.baseline, "threshold": threshold,
+                                "regressions": [dict(zip(("metric", "baseline", "current", "change"), r))
+                                                for r in regressions]}
+        status = 1 if regressions else 0
+
+    output = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Local stand-ins for the webhook and email prompt channels (see channels.py).
+
+The HTTP sink takes the webhook's POSTs, the SMTP sink takes the mail (a
+minimal SMTP server, enough for smtplib). Both print each prompt; with
+--click-after they also open the prompt's link that many seconds later, like a
+user answering on the phone, so a full fan-out can be tried on one machine:
+
+    "channels": {"toast": {},
+                 "webhook": {"url": "http://localhost:8025/notify"},
+                 "email": {"host": "localhost", "port": 8026, "to": "me@localhost"}}
+
+Usage:
+    python channel_sinks.py [--http-port 8025] [--smtp-port 8026]
+                            [--click-after SECONDS] [--fail]
+"""
+import argparse
+import json
+import re
+import socketserver
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LINK = re.compile(r"https?://\S+/click\?\S+")
+
+
+class Sink:
+    """
+    What the sinks received, and the optional auto-click.
+
+    Args:
+        click_after (float, optional): Seconds after a prompt to open its link.
+        fail (bool): Reject every prompt (HTTP 503, SMTP 554).
+    """
+
+    def __init__(self, click_after=None, fail=False):
+        self.click_after = click_after
+        self.fail = fail
+        self.received = [] # (channel, monotonic time, link)
+        self.clicks = []   # (link, HTTP status)
+        self._lock = threading.Lock()
+
+    def record(self, channel, link):
+        with self._lock:
+            self.received.append((channel, time.monotonic(), link))
+        print(f"{channel}: prompt received, link {link}")
+        if link and self.click_after is not None:
+            threading.Timer(self.click_after, self._click, args=(link,)).start()
+
+    def _click(self, link):
+        try:
+            with urllib.request.urlopen(link, timeout=5) as response:
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError as e:
+            status = str(e)
+        with self._lock:
+            self.clicks.append((link, status))
+        print(f"Opened {link}: {status}")
+
+
+# ------------------- HTTP Sink ------------------- #
+class WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        sink = self.server.sink
+        if sink.fail:
+            self.send_response(503)
+            self.end_headers()
+            return
+        try:
+            link = json.loads(body).get("click_url")
+        except ValueError:
+            link = None
+        self.send_response(204)
+        self.end_headers()
+        sink.record("webhook", link)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# ------------------- SMTP Sink ------------------- #
+class SmtpHandler(socketserver.StreamRequestHandler):
+    """
+    Just enough SMTP (RFC 5321) for smtplib: HELO/EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT.
+    """
+    timeout = 30
+
+    def reply(self, line):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        sink = self.server.sink
+        self.reply("220 localhost channel sink")
+        for raw in self.rfile:
+            command = raw.decode("latin-1").strip().split(" ", 1)[0].upper()
+            if command in ("HELO", "EHLO"):
+                self.reply("250 localhost")
+            elif command in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for data in self.rfile:
+                    if data in (b".\r\n", b".\n"):
+                        break
+                    lines.append(data.decode("utf-8", "replace"))
+                if sink.fail:
+                    self.reply("554 Rejected")
+                    continue
+                self.reply("250 OK")
+                match = LINK.search("".join(lines))
+                sink.record("email", match.group(0) if match else None)
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SmtpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_sinks(sink, http_port=8025, smtp_port=8026):
+    """
+    Starts both sinks on daemon threads.
+
+    Returns:
+        tuple: (HTTP server, SMTP server); call shutdown() and server_close() on each to stop.
+    """
+    http_server = ThreadingHTTPServer(("localhost", http_port), WebhookHandler)
+    smtp_server = SmtpServer(("localhost", smtp_port), SmtpHandler)
+    for server in (http_server, smtp_server):
+        server.sink = sink
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return http_server, smtp_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--http-port", type=int, default=8025)
+    parser.add_argument("--smtp-port", type=int, default=8026)
+    parser.add_argument("--click-after", type=float, help="Open each prompt's link after this many seconds.")
+    parser.add_argument("--fail", action="store_true", help="Reject every prompt.")
+    args = parser.parse_args()
+
+    servers = start_sinks(Sink(args.click_after, args.fail), args.http_port, args.smtp_port)
+    print(f"Webhook sink on http://localhost:{args.http_port}/, SMTP sink on localhost:{args.smtp_port}. "
+          "Press Ctrl+C to stop.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""
+Prompt channels for Deadman's switch.
+
+The "Are you awake?" prompt goes out over every channel enabled in config.json
+at once, from a small worker pool, so a suppressed toast (Focus Assist, a
+full-screen game) no longer means a shutdown:
+
+    "channels": {
+        "toast": {},
+        "webhook": {"url": "http://phone-bridge.lan/notify"},
+        "email": {"host": "localhost", "port": 25, "to": "me@example.com"},
+        "alarm": {"seconds": 60}
+    }
+
+toast     the desktop notification (the notifier backend)
+webhook   POSTs the prompt as JSON ({"title", "message", "button_label",
+          "click_url"}) to `url`, e.g. a phone push bridge
+email     mails the prompt through the SMTP relay at `host`:`port`
+alarm     beeps until the prompt is answered, for at most `seconds`
+
+Every channel's link leads to the same acknowledgement path, the click
+listener's /click, tagged with the channel and the prompt's token:
+/click?channel=email&prompt=<token>. The first response to the current prompt
+wins: it cancels the rest (sends not made yet, the alarm), and later responses,
+or responses to an earlier prompt, are ignored. The toast keeps the plain /click
+link, so its cached notification stays valid; it counts as the "toast" channel.
+
+smtplib and urllib.request are only imported when those channels send.
+Webhook and email links default to http://localhost:8888/click; set
+`click_url` for a listener reachable from elsewhere (e.g. through a proxy).
+"""
+import json
+import os
+import secrets
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlencode
+
+import metrics
+
+
+CHANNELS = ("toast", "webhook", "email", "alarm")
+DEFAULT_CHANNELS = {"toast": {}}
+DEFAULT_CLICK_URL = "http://localhost:8888/click"
+SEND_TIMEOUT = 10 # Seconds a webhook or SMTP exchange may take
+
+# Verdicts of FanOut.acknowledge()
+ACCEPTED = "accepted"
+DUPLICATE = "duplicate"
+STALE = "stale"
+
+ALARM_SOUND = "/usr/share/sounds/freedesktop/stereo/alarm-clock-elapsed.oga"
+
+
+def click_source(channel):
+    """
+    Returns the click source recorded in the wake log for a channel.
+    """
+    return "notification" if channel == "toast" else channel
+
+
+def parse_click_query(query):
+    """
+    Reads the channel and prompt token from a /click query string. A plain
+    /click (the toast's link) is the toast channel.
+
+    Returns:
+        tuple: (channel, token or None).
+    """
+    fields = parse_qs(query)
+    channel = fields.get("channel", ["toast"])[0]
+    if channel not in CHANNELS:
+        channel = "toast"
+    return channel, fields.get("prompt", [None])[0]
+
+
+def validate_channels(settings):
+    """
+    Raises:
+        ValueError: If `settings` is not a non-empty {channel: options} mapping
+            with the options each channel needs.
+    """
+    if not isinstance(settings, dict) or not settings:
+        raise ValueError("channels must map at least one channel name to its options")
+    for name, options in settings.items():
+        if name not in CHANNELS:
+            raise ValueError(f"unknown channel '{name}', expected one of {CHANNELS}")
+        if not isinstance(options, dict):
+            raise ValueError(f"options of channel '{name}' must be an object")
+    if not settings.get("webhook", {"url": "-"}).get("url"):
+        raise ValueError("the webhook channel needs a url")
+    if not settings.get("email", {"to": "-"}).get("to"):
+        raise ValueError("the email channel needs a 'to' address")
+
+
+class Prompt:
+    """
+    What to ask: the text and the button, as shown by the toast.
+    """
+
+    def __init__(self, title, message, button_label, click_url):
+        self.title = title
+        self.message = message
+        self.button_label = button_label
+        self.click_url = click_url
+
+
+# ------------------- Channels ------------------- #
+class ToastChannel:
+    name = "toast"
+
+    def __init__(self, notifier):
+        self.notifier = notifier
+
+    def send(self, prompt, link):
+        self.notifier.show(title=prompt.title, message=prompt.message,
+                           button_label=prompt.button_label, button_url=prompt.click_url)
+
+
+class WebhookChannel:
+    name = "webhook"
+
+    def __init__(self, url, click_url=DEFAULT_CLICK_URL, timeout=SEND_TIMEOUT):
+        self.url = url
+        self.click_url = click_url
+        self.timeout = timeout
+
+    def send(self, prompt, link):
+        import urllib.request
+
+        body = json.dumps({"title": prompt.title, "message": prompt.message,
+                           "button_label": prompt.button_label, "click_url": link}).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, method="POST",
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read() # Non-2xx statuses raise HTTPError
+
+
+class EmailChannel:
+    name = "email"
+
+    def __init__(self, to, host="localhost", port=25, sender="deadman-switch@localhost",
+                 click_url=DEFAULT_CLICK_URL, timeout=SEND_TIMEOUT):
+        self.to = to
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.click_url = click_url
+        self.timeout = timeout
+
+    def send(self, prompt, link):
+        import smtplib
+        from email.message import EmailMessage
+
+        message = EmailMessage()
+        message["Subject"] = prompt.title
+        message["From"] = self.sender
+        message["To"] = self.to
+        message.set_content(f"{prompt.message}\n\n{prompt.button_label}: {link}\n")
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(message)
+
+
+class AlarmChannel:
+    """
+    Beeps once when sent, then every few seconds (see sustain()) until the
+    prompt is answered or `seconds` have passed.
+    """
+    name = "alarm"
+    PERIOD = 3
+
+    def __init__(self, seconds=60):
+        self.seconds = seconds
+
+    def send(self, prompt, link):
+        self._beep()
+
+    def sustain(self, cancelled):
+        """
+        Keeps beeping until `cancelled` (a threading.Event) is set or time is up.
+        """
+        end = time.monotonic() + self.seconds
+        while not cancelled.wait(min(self.PERIOD, max(end - time.monotonic(), 0))) and time.monotonic() < end:
+            self._beep()
+
+    @staticmethod
+    def _beep():
+        if sys.platform == "win32":
+            import winsound
+            winsound.Beep(1000, 400)
+        elif shutil.which("paplay") and os.path.exists(ALARM_SOUND):
+            subprocess.run(["paplay", ALARM_SOUND], timeout=10,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elif sys.stdout:
+            sys.stdout.write("\a") # Terminal bell
+            sys.stdout.flush()
+
+
+def build_channels(settings, notifier):
+    """
+    Returns the channel objects for the "channels" setting.
+    """
+    built = []
+    for name, options in settings.items():
+        if name == "toast":
+            built.append(ToastChannel(notifier))
+        elif name == "webhook":
+            built.append(WebhookChannel(options["url"], options.get("click_url", DEFAULT_CLICK_URL),
+                                        options.get("timeout", SEND_TIMEOUT)))
+        elif name == "email":
+            built.append(EmailChannel(options["to"], options.get("host", "localhost"), options.get("port", 25),
+                                      options.get("from", "deadman-switch@localhost"),
+                                      options.get("click_url", DEFAULT_CLICK_URL),
+                                      options.get("timeout", SEND_TIMEOUT)))
+        elif name == "alarm":
+            built.append(AlarmChannel(options.get("seconds", 60)))
+    return built
+
+
+# ------------------- Fan-out ------------------- #
+class Delivery:
+    """
+    One prompt sent over several channels.
+
+    Attributes:
+        token (str): Identifies this prompt in the channels' links.
+        delivered (dict): Channel name -> monotonic time it delivered the prompt.
+        errors (dict): Channel name -> exception it failed with.
+        acknowledged_by (str): Channel of the first response, None until then.
+        cancelled (threading.Event): Set once the prompt was answered (or the
+            fan-out stopped); stops sends not made yet and the alarm.
+    """
+
+    def __init__(self, prompt, channels):
+        self.prompt = prompt
+        self.channels = channels
+        self.token = secrets.token_urlsafe(8)
+        self.started = time.monotonic()
+        self.delivered = {}
+        self.errors = {}
+        self.acknowledged_by = None
+        self.cancelled = threading.Event()
+        self._pending = len(channels)
+        self._settled = threading.Event() # First delivery, every channel failed, or cancelled
+        self._lock = threading.Lock()
+        if not channels:
+            self._settled.set()
+
+    def link(self, channel):
+        """
+        Returns the click link for `channel` (its `click_url`, tagged with the
+        channel and this prompt's token).
+        """
+        click_url = getattr(channel, "click_url", self.prompt.click_url)
+        return f"{click_url}?{urlencode({'channel': channel.name, 'prompt': self.token})}"
+
+    def wait(self, timeout=None):
+        """
+        Waits until a channel delivered the prompt, it was answered (e.g. from
+        the tray before any channel got through), or every channel failed.
+
+        Returns:
+            bool: True if at least one channel delivered it or it was answered.
+        """
+        self._settled.wait(timeout)
+        return bool(self.delivered) or self.acknowledged_by is not None
+
+    def describe_errors(self):
+        return "; ".join(f"{name}: {error}" for name, error in self.errors.items())
+
+    def _finished(self, name, delivered_at=None, error=None):
+        with self._lock:
+            if error is None:
+                self.delivered[name] = delivered_at
+                self._settled.set()
+            else:
+                self.errors[name] = error
+            self._pending -= 1
+            if self._pending == 0:
+                self._settled.set()
+
+
+class FanOut:
+    """
+    Sends prompts over their channels in parallel and decides which response counts.
+
+    Args:
+        max_workers (int): Size of the worker pool (one thread per channel in use
+            is enough; the alarm holds its thread while it sounds).
+    """
+
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self.current = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def send(self, prompt, channels):
+        """
+        Sends `prompt` over every channel at once and returns without waiting;
+        the new Delivery becomes the current prompt, replacing the previous one.
+
+        Returns:
+            Delivery
+        """
+        delivery = Delivery(prompt, channels)
+        with self._lock:
+            if self.current is not None:
+                self.current.cancelled.set()
+            self.current = delivery
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="PromptChannel")
+            for channel in channels:
+                self._pool.submit(self._send, delivery, channel)
+        return delivery
+
+    def _send(self, delivery, channel):
+        if delivery.cancelled.is_set():
+            delivery._finished(channel.name, error=RuntimeError("cancelled before sending"))
+            return
+        began = time.monotonic()
+        try:
+            channel.send(delivery.prompt, delivery.link(channel))
+        except Exception as e:
+            metrics.CHANNEL_ERRORS.inc(channel=channel.name)
+            delivery._finished(channel.name, error=e)
+            return
+        delivered_at = time.monotonic()
+        metrics.CHANNEL_SEND.observe(delivered_at - began, channel=channel.name)
+        delivery._finished(channel.name, delivered_at=delivered_at)
+        if hasattr(channel, "sustain"):
+            channel.sustain(delivery.cancelled)
+
+    def acknowledge(self, channel, token=None):
+        """
+        Decides whether a response through `channel` counts. The first response
+        to the current prompt does, and cancels the other channels. A response
+        without a token (the toast's plain link, the tray) also counts while
+        there is no current prompt; a token must be the current prompt's, and
+        the webhook, email and alarm channels always need one.
+
+        Args:
+            channel (str): Channel the response came through.
+            token (str, optional): Prompt token from the channel's link.
+
+        Returns:
+            str: ACCEPTED, DUPLICATE (the prompt was already answered) or STALE
+                (the link belongs to an earlier prompt, or to none).
+        """
+        if token is None and channel in CHANNELS and channel != "toast":
+            return STALE
+        with self._lock:
+            delivery = self.current
+            if delivery is None:
+                return STALE if token is not None else ACCEPTED
+            if token is not None and token != delivery.token:
+                return STALE
+            if delivery.acknowledged_by is not None:
+                return DUPLICATE
+            delivery.acknowledged_by = channel
+            delivery.cancelled.set()
+            delivery._settled.set()
+        answered_at = time.monotonic()
+        metrics.CHANNEL_RESPONSE.observe(answered_at - delivery.delivered.get(channel, delivery.started),
+                                         channel=channel)
+        return ACCEPTED
+
+    def cancel(self):
+        """
+        Stops the current prompt's remaining sends and its alarm.
+        """
+        with self._lock:
+            if self.current is not None:
+                self.current.cancelled.set()
+                self.current._settled.set()
+
+    def stop(self):
+        """
+        Cancels the current prompt and shuts the worker pool down.
+        """
+        self.cancel()
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
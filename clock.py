@@ -0,0 +1,132 @@
+"""
+Clock and sleep providers for Deadman's switch.
+
+Everything that reads the time or waits in the monitoring cycle goes through a
+clock object: `time()`, `monotonic()`, `now()` and `wait(event, timeout)`.
+The application uses RealClock. VirtualClock is a discrete-event clock for
+simulation (see simulator.py): waiting advances virtual time instantly to the
+next scheduled callback or to the timeout, so months of nights run in seconds.
+"""
+import heapq
+import itertools
+import math
+import time
+from datetime import datetime
+
+
+class RealClock:
+    """
+    The system clocks; waits block on the event.
+    """
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def now(self):
+        return datetime.now()
+
+    def wait(self, event, timeout=None):
+        """
+        Waits until `event` is set or `timeout` seconds elapse.
+
+        Returns:
+            bool: True if the event was set.
+        """
+        return event.wait(timeout)
+
+
+class SimulationStalled(RuntimeError):
+    """
+    Raised when a virtual wait has no timeout and nothing is scheduled to end it.
+    """
+
+
+class VirtualClock:
+    """
+    Single-threaded discrete-event clock.
+
+    Callbacks are scheduled at wall-clock times with `call_at()`. A `wait()` runs
+    the callbacks that fall before its timeout, in time order, each at its own
+    virtual time, and returns as soon as one of them sets the event. The waiting
+    code and the callbacks all run on the caller's thread, so a run is fully
+    deterministic.
+
+    Args:
+        start (float): Initial wall-clock time (Unix seconds).
+    """
+
+    def __init__(self, start):
+        self._wall = float(start)
+        self._mono = 0.0
+        self._queue = []
+        self._sequence = itertools.count() # Keeps callbacks at the same time in FIFO order
+
+    # ---- Clock interface ---- #
+    def time(self):
+        return self._wall
+
+    def monotonic(self):
+        return self._mono
+
+    def now(self):
+        return datetime.fromtimestamp(self._wall)
+
+    def wait(self, event, timeout=None):
+        """
+        Advances virtual time until `event` is set or `timeout` seconds of
+        monotonic time have passed, running due callbacks on the way.
+
+        Returns:
+            bool: True if the event was set.
+
+        Raises:
+            SimulationStalled: If there is no timeout and no pending callback.
+        """
+        end = self._mono + (math.inf if timeout is None else max(timeout, 0.0))
+        while not event.is_set():
+            remaining = end - self._mono
+            if not self._queue or self._queue[0][0] > self._wall + remaining:
+                if remaining == math.inf:
+                    raise SimulationStalled("Virtual wait without timeout and nothing scheduled")
+                self._advance(remaining)
+                return event.is_set()
+            when, _, callback = heapq.heappop(self._queue)
+            self._advance(when - self._wall)
+            callback()
+        return True
+
+    # ---- Scheduling ---- #
+    def call_at(self, when, callback):
+        """
+        Runs `callback()` once the wall clock reaches `when` during a wait().
+        """
+        heapq.heappush(self._queue, (when, next(self._sequence), callback))
+
+    def call_later(self, delay, callback):
+        self.call_at(self._wall + delay, callback)
+
+    def run_until(self, when):
+        """
+        Runs every callback due up to `when` and moves the clock there, as if
+        nothing in the application was waiting (e.g. the machine is off).
+        """
+        while self._queue and self._queue[0][0] <= when:
+            due, _, callback = heapq.heappop(self._queue)
+            self._advance(due - self._wall)
+            callback()
+        self._advance(when - self._wall)
+
+    def suspend(self, seconds):
+        """
+        Jumps the wall clock forward without advancing monotonic time, like a
+        suspend/resume: pending timeouts then end that much later in wall time.
+        """
+        self._wall += seconds
+
+    def _advance(self, seconds):
+        seconds = max(seconds, 0.0)
+        self._wall += seconds
+        self._mono += seconds
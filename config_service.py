@@ -0,0 +1,212 @@
+"""
+Cached configuration with change detection for Deadman's switch.
+
+config.json is parsed and validated once and served from memory. A watcher
+thread notices edits cheaply (inotify on Linux, an mtime/size stat poll
+elsewhere), reloads the file and pushes the new configuration to subscribers,
+so the running monitor can reschedule without a restart. Saving writes a
+temporary file and renames it over config.json, so a reader never sees a
+half-written file.
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import sys
+import tempfile
+import threading
+
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+
+
+class ConfigService:
+    """
+    Serves a cached, validated configuration and notifies subscribers of changes.
+
+    Args:
+        path (str): JSON file to read; created with `defaults` if missing.
+        defaults (dict): Default values, also used for keys missing from the file.
+        validate (callable, optional): Called with a candidate configuration;
+            raises ValueError to reject it.
+        poll_interval (float): Seconds between stat checks when inotify is unavailable.
+        on_error (callable, optional): Called with the exception when the file on
+            disk is unreadable or invalid (the previous configuration is kept).
+    """
+
+    def __init__(self, path, defaults, validate=None, poll_interval=2.0, on_error=None):
+        self.path = path
+        self.defaults = dict(defaults)
+        self.validate = validate
+        self.poll_interval = poll_interval
+        self.on_error = on_error
+
+        self._lock = threading.RLock()
+        self._config = None
+        self._signature = None
+        self._subscribers = []
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._stop_pipe = None
+
+    # ---- Reading ---- #
+    def get(self):
+        """
+        Returns the cached configuration, loading it on first use. Treat the
+        returned dictionary as read-only; it is shared with other callers.
+        """
+        with self._lock:
+            if self._config is None:
+                if not os.path.exists(self.path):
+                    self._write(self.defaults)
+                self._config = dict(self.defaults)
+                self.check()
+            return self._config
+
+    def check(self):
+        """
+        Stats the file and reloads it if its mtime or size changed.
+
+        Returns:
+            bool: True if a new configuration was loaded.
+        """
+        signature = self._stat()
+        with self._lock:
+            if signature == self._signature:
+                return False
+            self._signature = signature
+            try:
+                with open(self.path, "r") as f:
+                    loaded = {**self.defaults, **json.load(f)}
+                if self.validate:
+                    self.validate(loaded)
+            except (OSError, ValueError) as e:
+                if self.on_error:
+                    self.on_error(e)
+                return False
+            return self._replace(loaded)
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    # ---- Writing ---- #
+    def save(self, updates):
+        """
+        Validates `updates` merged over the current configuration and writes the
+        result atomically. Subscribers are notified right away.
+
+        Raises:
+            ValueError: If the new configuration does not validate.
+        """
+        with self._lock:
+            candidate = {**self.get(), **updates}
+            if self.validate:
+                self.validate(candidate)
+            self._write(candidate)
+            self._signature = self._stat()
+            self._replace(candidate)
+
+    def _write(self, config):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        handle, temp_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(handle, "w") as f:
+                json.dump(config, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    # ---- Subscribers ---- #
+    def subscribe(self, callback):
+        """
+        Registers `callback(new_config, old_config)`, called whenever the
+        configuration changes (from the watcher or the saving thread).
+
+        Returns:
+            callable: Removes the subscription.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def _replace(self, new_config):
+        old_config = self._config
+        if new_config == old_config:
+            return False
+        self._config = new_config
+        for callback in list(self._subscribers):
+            callback(new_config, old_config)
+        return True
+
+    # ---- Watcher ---- #
+    def start(self):
+        """
+        Starts the watcher thread (inotify on Linux, stat polling elsewhere).
+        """
+        self.get()
+        self._stop_event.clear()
+        target = self._watch_poll
+        if self._inotify_available():
+            self._stop_pipe = os.pipe() # Wakes the select() in _watch_inotify on stop()
+            target = self._watch_inotify
+        self._thread = threading.Thread(target=target, name="ConfigWatcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the watcher thread.
+        """
+        self._stop_event.set()
+        if self._stop_pipe:
+            os.write(self._stop_pipe[1], b"x")
+        if self._thread:
+            self._thread.join(2)
+
+    @staticmethod
+    def _inotify_available():
+        return sys.platform.startswith("linux") and ctypes.util.find_library("c") is not None
+
+    def _watch_poll(self):
+        while not self._stop_event.wait(self.poll_interval):
+            self.check()
+
+    def _watch_inotify(self):
+        stop_pipe = self._stop_pipe
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if fd < 0 or libc.inotify_add_watch(fd, directory.encode(),
+                                            IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE) < 0:
+            if fd >= 0:
+                os.close(fd)
+            self._watch_poll()
+            return
+
+        # The directory is watched because saving replaces the file (new inode).
+        # Any event there just triggers a stat, which filters out unrelated files.
+        try:
+            while not self._stop_event.is_set():
+                ready, _, _ = select.select([fd, stop_pipe[0]], [], [])
+                if fd in ready:
+                    os.read(fd, 64 * 1024)
+                    self.check()
+        finally:
+            os.close(fd)
+            self._stop_pipe = None
+            for end in stop_pipe:
+                os.close(end)
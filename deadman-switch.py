@@ -1,331 +1,1198 @@
+from startup_profile import PROFILER # First import: times the ones below with --profile-startup
 import os
 import json
+import math
 import time
 import threading
 from datetime import datetime
-from datetime import timedelta
-import tkinter as tk
-from tkinter import messagebox
-from pystray import Icon, MenuItem, Menu
-from winotify import Notification, Notifier, Registry, audio
-from PIL import Image, ImageDraw
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import sys
-import win32com.client
+import socket
+from urllib.parse import urlencode, urlsplit
+# pystray, winotify, PIL and win32com are imported on first use (see backends.py), as are
+# tkinter (ui_thread), asyncio (async_runtime) and urllib.request, which only some setups need
+import actions
+import assets
+import backends
+import channels
+import history_rollups
+import scheduler
+import metrics
+import presence
+import profiles
+import quiet_calendar
+import schedule_advisor
+import tracing
+from clock import RealClock
+from config_service import ConfigService
+from logger import LOG, LEVELS
+from notification_dispatch import NotificationDispatcher
+from tracing import TRACER
+from ui_thread import UiThread
+from wake_log import WakeLogWriter, FSYNC_NEVER, FSYNC_POLICIES
+from wake_store import MISSED, PROFILE, WakeStore, iter_records
 
 
 CONFIG_PATH = "config.json"
 LOG_FILE_PATH = "wake_log.txt"
-CLICKED_FLAG = False
-STOP_FLAG = False
+# Binary, queryable copy of the click history (see wake_store.py)
+WAKE_STORE_PATH = "wake_log.bin"
+# Per-night click and shutdown totals behind the /history dashboard (see history_rollups.py)
+HISTORY_PATH = "wake_log.rollup.json"
+# Set when the application is exiting.
+STOP_EVENT = threading.Event()
+
+# Wakes monitor_loop's timed waits early: set on Exit, and when the configuration
+# changes so the pending deadline is recomputed from the new settings.
+WAKE_EVENT = threading.Event()
+
+# Set whenever the user confirms being awake, either through the notification
+# (HTTP click) or through the tray menu. monitor_loop waits on it directly.
+CLICK_EVENT = threading.Event()
+
+# The persistent click listener, started once in run_tray()
+HTTPD = None
+
+# Current notification cycle: id (epoch second the notification went out) and its
+# CLOCK.time(), or 0/None between cycles. Used to record each click's response latency.
+CYCLE_ID = 0
+NOTIFIED_AT = None
+
+# Background writer for wake_log.txt, created on first use by get_log_writer()
+LOG_WRITER = None
+LOG_WRITER_LOCK = threading.Lock()
+
+# Files settings LOG and TRACER write with (log_file, trace, trace_path and rotation), see configure_logging()
+DIAGNOSTICS_KEY = None
+
+# The asyncio core, when enabled with "runtime": "asyncio" in config.json
+RUNTIME = None
+
+# The profile scheduler, when config.json lists "profiles" (see profiles.py)
+PROFILES = None
+
+# Time source and sleep provider for the monitoring cycle (see clock.py).
+# simulator.py swaps in a VirtualClock to replay many nights quickly.
+CLOCK = RealClock()
+
+# Shows notifications on its own worker thread, so a slow toast never blocks monitor_loop
+DISPATCHER = NotificationDispatcher(CLOCK)
+
+# Sends each prompt over the configured channels (toast, webhook, email, alarm) at once,
+# and lets only the first response to it count
+FANOUT = channels.FanOut()
+
+# Reads the input-idle time as rarely as idle_threshold allows, to hold prompts back while the user is active
+PRESENCE = presence.PresenceSampler()
+
+
+def report_calendar_error(path, e):
+    LOG.warning("Error reading quiet calendar %s: %s. Keeping its previous quiet periods.", path, e)
+
+
+# Quiet periods from the files in quiet_calendars, reloaded when they change
+QUIET = quiet_calendar.QuietCalendar(on_error=report_calendar_error)
+
+# Last awake time of each recorded night, for the adaptive schedule; built on first use (needs NumPy)
+SCHEDULE_MODEL = None
+
+# Owns the single Tk interpreter; tray callbacks post windows to it instead of running Tk themselves
+UI = UiThread()
+SETTINGS_WINDOW = None # Built on the UI thread when Settings is first opened
+
+# Longest wait for a notification to be confirmed on screen. The response window
+# starts at the confirmed display, or after this long if it never is.
+NOTIFICATION_DISPLAY_TIMEOUT = 30
+
+# Seconds a connection may sit idle before its request line/headers arrive.
+# Browsers open speculative preconnect sockets that never send anything.
+CONNECTION_READ_TIMEOUT = 5
 
 # Defines the path to your icon file
 # Ensures 'icon.ico' is in the same directory as your script/executable
 ICON_PATH = "icon.ico"
 
 app_id = "Deadman's switch"
-registry = Registry(app_id=app_id, script_path=__file__)
-notifier = Notifier(registry)
+
+# Notifier, tray, shutdown action and shortcut installer for this platform
+BACKENDS = backends.default_backends(app_id, __file__)
+
+# Runs the escalation commands (see actions.py); simulator.py swaps in its own
+ACTION_RUNNER = actions.run_command
 
 
 # ------------------- Config Functions ------------------- #
+DEFAULT_CONFIG = {
+    "start_time": "02:00",
+    # Windows to prompt in, per weekday, instead of every day from start_time (see scheduler.py),
+    # e.g. "Mon-Fri 01:00-05:30; Sat,Sun 02:30-07:00"; empty to use start_time
+    "schedule": "",
+    "notification_duration": 60,
+    "notification_interval": 600,
+    # What to do if the start time passed while the PC was asleep:
+    # "fire" starts monitoring right away if no more than catch_up_minutes late, "skip" waits for the next day
+    "catch_up_policy": scheduler.CATCH_UP_FIRE,
+    "catch_up_minutes": 240,
+    # "threads" (default) or "asyncio" to run the scheduler, listener and notifier on one event loop
+    "runtime": "threads",
+    # Fleet supervisor to post "awake" heartbeats to (e.g. "http://supervisor:8890"), empty to disable
+    "supervisor_url": "",
+    # Shared token of the fleet supervisor (its config file's "token"), sent with every heartbeat
+    "supervisor_token": "",
+    # wake_log.txt rotation: size limit, age limit (0 = off), segments kept, gzip of old segments
+    "log_max_kb": 1024,
+    "log_rotate_days": 0,
+    "log_backups": 5,
+    "log_compress": True,
+    # When the log is fsynced: "never", "interval" (at most every 30s) or "always"
+    "log_fsync": "interval",
+    # Messages from this level up go to the console and log_file: "debug", "info", "warning", "error" or "off"
+    "log_level": "info",
+    # File the messages are also written to (rotated like wake_log.txt), e.g. for a build without
+    # a console; empty for none
+    "log_file": "",
+    # Spans of each cycle (notify, listen, click, log, sleep, escalate) written to trace_path
+    # (see tracing.py): "off", "jsonl" or "chrome" (for chrome://tracing or Perfetto)
+    "trace": "off",
+    "trace_path": "deadman-trace.json",
+    # What happens to an unanswered notification: stages of "lock", "sleep", "hibernate" or
+    # "shutdown", each after a delay in seconds; a click during a delay cancels the rest
+    "escalation": actions.DEFAULT_LADDER,
+    # Only log the escalation commands instead of running them
+    "action_dry_run": False,
+    # Where the prompt goes, with each channel's options (see channels.py): "toast",
+    # "webhook" ({"url": ...}), "email" ({"to": ..., "host": ..., "port": ...}), "alarm"
+    "channels": channels.DEFAULT_CHANNELS,
+    # Hold the prompt back until the keyboard and mouse have been idle this many seconds
+    # (recent input counts as "awake"); 0 prompts regardless
+    "idle_threshold": 0,
+    # Where the idle time comes from (see presence.py): "" for the platform's default,
+    # "none", "xprintidle", "file:PATH" (touched on input) or "command:COMMAND" (prints milliseconds)
+    "presence_source": "",
+    # Calendar files (.ics or .json, see quiet_calendar.py) whose events are quiet periods: no
+    # notification goes out during them, e.g. on holidays or nights with a long render
+    "quiet_calendars": [],
+    # Learn start_time and notification_interval from the click history (see schedule_advisor.py):
+    # "off", "suggest" (print them) or "apply" (save them to this file). Needs NumPy.
+    "adaptive_schedule": "off",
+    # Acceptable share of nights with a shutdown while the user is awake, and the chance
+    # that an awake user misses a prompt
+    "adaptive_target_rate": 0.01,
+    "adaptive_miss_rate": 0.05,
+    # Nights of history needed before anything is advised
+    "adaptive_min_nights": 14,
+    # Users monitored by this one process, each with their own schedule (see profiles.py), e.g.
+    # [{"name": "alice", "start_time": "01:00", "channels": {"email": {"to": "alice@example.com"}}}];
+    # empty to monitor the machine's one user with the settings above
+    "profiles": [],
+}
+
+def validate_config(config):
+    """
+    Checks a configuration dictionary before it is used or saved.
+
+    Raises:
+        ValueError: If any setting is missing or invalid.
+    """
+    scheduler.parse_time(config["start_time"]) # Checks HH:MM format
+    if not isinstance(config["schedule"], str):
+        raise ValueError("schedule must be a string")
+    scheduler.config_schedule(config) # Compiles (and caches) the schedule expression
+    for key in ("notification_duration", "notification_interval", "catch_up_minutes", "log_max_kb",
+                "log_rotate_days", "log_backups", "idle_threshold", "adaptive_min_nights"):
+        if not isinstance(config[key], (int, float)) or config[key] < 0:
+            raise ValueError(f"{key} must be a non-negative number")
+    if config["catch_up_policy"] not in scheduler.CATCH_UP_POLICIES:
+        raise ValueError(f"catch_up_policy must be one of {scheduler.CATCH_UP_POLICIES}")
+    if config["runtime"] not in ("threads", "asyncio"):
+        raise ValueError("runtime must be 'threads' or 'asyncio'")
+    if config["log_fsync"] not in FSYNC_POLICIES:
+        raise ValueError(f"log_fsync must be one of {FSYNC_POLICIES}")
+    if config["log_level"] not in LEVELS:
+        raise ValueError(f"log_level must be one of {LEVELS}")
+    if not isinstance(config["supervisor_token"], str):
+        raise ValueError("supervisor_token must be a string")
+    if config["supervisor_url"] and not config["supervisor_token"]:
+        raise ValueError("supervisor_url needs the supervisor's supervisor_token")
+    if not isinstance(config["log_file"], str):
+        raise ValueError("log_file must be a file path, or empty")
+    if config["trace"] not in tracing.FORMATS:
+        raise ValueError(f"trace must be one of {tracing.FORMATS}")
+    if not isinstance(config["trace_path"], str) or not config["trace_path"]:
+        raise ValueError("trace_path must be a file path")
+    actions.validate_ladder(config["escalation"])
+    if not isinstance(config["action_dry_run"], bool):
+        raise ValueError("action_dry_run must be true or false")
+    channels.validate_channels(config["channels"])
+    presence.make_source(config["presence_source"]) # Checks the source's format
+    if not isinstance(config["quiet_calendars"], list) or \
+            not all(isinstance(path, str) for path in config["quiet_calendars"]):
+        raise ValueError("quiet_calendars must be a list of file paths")
+    if config["adaptive_schedule"] not in schedule_advisor.MODES:
+        raise ValueError(f"adaptive_schedule must be one of {schedule_advisor.MODES}")
+    for key in ("adaptive_target_rate", "adaptive_miss_rate"):
+        if not isinstance(config[key], (int, float)) or not 0 <= config[key] <= 1:
+            raise ValueError(f"{key} must be between 0 and 1")
+    profiles.validate_profiles(config["profiles"], config)
+    if config["profiles"] and config["runtime"] != "threads":
+        raise ValueError("profiles need the 'threads' runtime")
+
+
+def report_config_error(e):
+    LOG.error("Error reading %s: %s. Keeping the previous settings.", CONFIG_PATH, e)
+
+
+# Parsed, validated config.json, reloaded in the background when the file changes
+CONFIG = ConfigService(CONFIG_PATH, DEFAULT_CONFIG, validate=validate_config, on_error=report_config_error)
+
+
 def load_config():
     """   
-    Loads configuration settings from a JSON file (config.json).
-    If the file does not exist, it creates it with default settings.
+    Returns the configuration settings from config.json.
+    If the file does not exist, it is created with default settings.
     Default settings include a start time, notification duration, and interval.
-    Returns the loaded (or default) configuration as a dictionary.
+    Keys missing from the file (e.g. written by an older version) take their default value.
+    The file is parsed once and cached; CONFIG reloads it when it changes on disk.
     """
 
-    default_config = {"start_time": "02:00", "notification_duration": 60, "notification_interval": 600}
-    if not os.path.exists(CONFIG_PATH):
-        with open(CONFIG_PATH, "w") as f:
-            json.dump(default_config, f)
-        return default_config
-    with open(CONFIG_PATH, "r") as f:
-        return json.load(f)
+    return CONFIG.get()
 
-def save_config(start_time, duration, interval):
+def save_config(start_time, duration, interval, schedule=None):
     """
-    Saves the provided configuration settings (start time, notification duration, and interval)
-    to the config.json file in JSON format.
+    Saves the provided configuration settings (start time, notification duration, and interval,
+    and the schedule expression if given) to the config.json file in JSON format. Other settings
+    already in the file are kept.
+    The file is replaced atomically, and the running monitor picks up the new values right away.
+
+    Raises:
+        ValueError: If the new settings are invalid.
     """
 
-    config = {
+    changes = {
         "start_time": start_time,
         "notification_duration": int(duration),
         "notification_interval": int(interval)
     }
-    with open(CONFIG_PATH, "w") as f:
-        json.dump(config, f)
+    if schedule is not None:
+        changes["schedule"] = schedule.strip()
+    CONFIG.save(changes)
+
+
+def on_config_changed(new_config, old_config):
+    """
+    CONFIG subscriber. Wakes the pending wait so the start time or interval
+    is rescheduled with the new values instead of waiting out the old sleep.
+    """
+    configure_logging(new_config)
+    LOG.info("Configuration changed. Rescheduling.")
+    WAKE_EVENT.set()
+    if RUNTIME:
+        RUNTIME.reschedule()
+    if PROFILES:
+        PROFILES.configure(new_config)
 
 
 # ------------------- Logging Function ------------------- #
-def log_click_time(source="notification"):
+def get_log_writer():
+    """
+    Returns the background log writer, creating and starting it on first use
+    with the rotation and fsync settings from config.json. The history rollups
+    are attached to it; the first time, they are rebuilt from the wake store.
+    """
+    global LOG_WRITER
+    with LOG_WRITER_LOCK:
+        if LOG_WRITER is None:
+            config = load_config()
+
+            def report_error(e):
+                LOG.error("Error writing to log file: %s", e)
+
+            try:
+                store = WakeStore(WAKE_STORE_PATH)
+            except (OSError, ValueError) as e:
+                LOG.warning("Wake store unavailable, only %s is written: %s", LOG_FILE_PATH, e)
+                store = None
+
+            rollups = history_rollups.HistoryRollups(HISTORY_PATH)
+            if not rollups.exists and store is not None and len(store):
+                view = store.range(CLOCK.time() - rollups.retain_nights * 86400, math.inf)
+                rollups.rebuild(iter_records(view))
+                view.release()
+
+            LOG_WRITER = WakeLogWriter(LOG_FILE_PATH,
+                                       max_bytes=config["log_max_kb"] * 1024,
+                                       rotate_seconds=config["log_rotate_days"] * 86400,
+                                       backups=config["log_backups"],
+                                       compress=config["log_compress"],
+                                       fsync=config["log_fsync"],
+                                       on_error=report_error,
+                                       store=store,
+                                       rollups=rollups).start()
+        return LOG_WRITER
+
+
+def close_log_writer():
+    """
+    Writes out any buffered log lines and stops the writer thread.
+    """
+    global LOG_WRITER
+    with LOG_WRITER_LOCK:
+        if LOG_WRITER:
+            LOG_WRITER.close()
+            if LOG_WRITER.store is not None:
+                LOG_WRITER.store.close()
+            LOG_WRITER = None
+
+
+def open_diagnostics_writer(path, config, header=""):
+    """
+    Returns a started writer for the log_file or the trace, rotated by size
+    like wake_log.txt. These files are never fsynced.
+    """
+    return WakeLogWriter(path, max_bytes=config["log_max_kb"] * 1024, backups=config["log_backups"],
+                         compress=config["log_compress"], fsync=FSYNC_NEVER, header=header).start()
+
+
+def configure_logging(config):
+    """
+    Applies log_level, log_file, trace and trace_path to LOG and TRACER. The
+    files' writers are only replaced when their settings changed; the previous
+    ones are closed once LOG and TRACER no longer use them.
+    """
+    global DIAGNOSTICS_KEY
+    key = (config["log_file"], config["trace"], config["trace_path"], config["log_max_kb"],
+           config["log_backups"], config["log_compress"])
+    if key == DIAGNOSTICS_KEY:
+        LOG.configure(config["log_level"], LOG.writer)
+        return
+    previous = (LOG.writer, TRACER.writer)
+    LOG.configure(config["log_level"],
+                  open_diagnostics_writer(config["log_file"], config) if config["log_file"] else None)
+    if config["trace"] == "off":
+        TRACER.configure("off")
+    else:
+        header = tracing.CHROME_HEADER if config["trace"] == "chrome" else ""
+        TRACER.configure(config["trace"], open_diagnostics_writer(config["trace_path"], config, header))
+    DIAGNOSTICS_KEY = key
+    for writer in previous:
+        if writer is not None:
+            writer.close()
+
+
+def close_logging():
+    """
+    Writes out and closes the log_file and trace writers; later messages only
+    go to the console.
+    """
+    global DIAGNOSTICS_KEY
+    previous = (LOG.writer, TRACER.writer)
+    LOG.configure(LOG.level)
+    TRACER.configure("off")
+    DIAGNOSTICS_KEY = None
+    for writer in previous:
+        if writer is not None:
+            writer.close()
+
+
+def log_click_time(source="notification", cycle_id=0, latency=math.nan, profile=None):
     """
     Logs the current timestamp to the log file (wake_log.txt), indicating
     when the user confirmed being "Awake".
     A string indicating how the click was registered (e.g., "notification" 
     for a click on the toast notification, or with tray menu).
+    The cycle id and response latency go into the binary wake store alongside it.
+    A profile's name, if given, goes into the text line only.
+    The line is only queued here; the log writer thread does the disk I/O.
     """
 
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_message = f"[{timestamp}] User clicked 'I'm Awake' via {source}.\n"
-    try:
-        with open(LOG_FILE_PATH, "a") as f:
-            f.write(log_message)
-        print(f"Logged: {log_message.strip()}")
-    except Exception as e:
-        print(f"Error writing to log file: {e}")
+    with TRACER.span("log", source=source, cycle=cycle_id):
+        now = CLOCK.time()
+        timestamp = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+        via = source if profile is None else f"{source} {profile}"
+        log_message = f"[{timestamp}] User clicked 'I'm Awake' via {via}.\n"
+        writer = get_log_writer()
+        writer.rollups.add_click(now, source, latency)
+        writer.write(log_message, (now, source, cycle_id, latency))
+        metrics.CLICKS.inc(source=source)
+        if not math.isnan(latency):
+            metrics.RESPONSE_LATENCY.observe(latency)
+    LOG.info("Logged: %s", log_message.strip(), source=source, cycle=cycle_id)
+
+
+def log_missed_prompt(cycle_id, notified_at):
+    """
+    Logs a notification that went unanswered. The wake store gets a "missed"
+    record at the time it was shown, so the adaptive schedule knows the user
+    was asleep by then (see schedule_advisor.py).
+    """
+    timestamp = datetime.fromtimestamp(CLOCK.time()).strftime("%Y-%m-%d %H:%M:%S")
+    get_log_writer().write(f"[{timestamp}] No response to the notification shown at "
+                           f"{datetime.fromtimestamp(notified_at):%H:%M:%S}.\n",
+                           (notified_at, MISSED, cycle_id, math.nan))
 
 
 # ------------------- Tray Image ------------------- #
 def create_icon_image():
-    try:
-        # Loads the icon from the specified path
-        icon_image = Image.open(ICON_PATH)
-        # Ensures it's in RGBA format for pystray compatibility
-        icon_image = icon_image.convert("RGBA")
-        return icon_image
-    except FileNotFoundError:
-        print(f"Warning: icon.ico not found at {ICON_PATH}. Using default generated icon.")
-        # Fallback to the previous generated icon if icon.ico is not found
-        image = Image.new("RGB", (64, 64), "blue")
-        draw = ImageDraw.Draw(image)
-        draw.ellipse((16, 16, 48, 48), fill="white")
-        return image
-    except Exception as e:
-        print(f"Error loading icon.ico: {e}. Using default generated icon.")
-        image = Image.new("RGB", (64, 64), "blue")
-        draw = ImageDraw.Draw(image)
-        draw.ellipse((16, 16, 48, 48), fill="white")
-        return image
+    """
+    Returns the tray icon as an RGBA image. icon.ico is decoded once into
+    icon_cache.bin (see assets.py) and later starts read the cached bitmap;
+    if icon.ico is missing, a default icon is generated instead.
+    """
+    assets.load_icons(ICON_PATH)
+    return assets.icon_image(assets.TRAY_ICON_SIZE)
 
 
 
 # ------------------- Notification and HTTP Server ------------------- #
 
+# Page returned for '/click': HTML, CSS and JavaScript
+CONFIRMATION_HTML = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Action Confirmed</title>
+    <script type="text/javascript">
+        // Attempt to close the window after a short delay
+        // This may not work in all browsers due to security restrictions.
+        setTimeout(function() {
+            window.close();
+        }, 500); // 500ms delay
+    </script>
+    <style>
+        body { font-family: sans-serif; text-align: center; margin-top: 50px; }
+        h1 { color: #4CAF50; }
+        p { color: #555; }
+    </style>
+</head>
+<body>
+    <h1>Action Confirmed!</h1>
+    <p>Thank you for responding.</p>
+    <p>This tab may close automatically. If not, you can close it manually.</p>
+</body>
+</html>
+"""
+
+# Complete responses (headers and body), encoded once (see assets.py)
+CLICK_RESPONSE = assets.http_response(200, "OK", "text/html; charset=utf-8", CONFIRMATION_HTML)
+NO_CONTENT_RESPONSE = assets.http_response(204, "No Content")
+EXPIRED_RESPONSE = assets.http_response(410, "Gone", "text/html; charset=utf-8",
+                                        "<html><body><p>This prompt has expired.</p></body></html>")
+
+
+def register_click(source, channel=None, token=None):
+    """
+    Records that the user confirmed being awake and wakes up whoever is
+    waiting in wait_for_click(). Used by both the HTTP listener and the tray menu.
+    When the asyncio core is running, the click is forwarded to its event loop instead.
+
+    Args:
+        source (str): How the click was registered (e.g., "notification" or "tray menu").
+        channel (str, optional): Prompt channel the click came through (see channels.py).
+            Only the first response to the current prompt counts; the tray always does.
+        token (str, optional): Prompt token from the channel's link; a link from an
+            earlier prompt is ignored.
+
+    Returns:
+        str: channels.ACCEPTED, or channels.DUPLICATE / channels.STALE if the click was ignored.
+    """
+    with TRACER.span("click", source=source, cycle=CYCLE_ID) as span:
+        if channel is None:
+            FANOUT.acknowledge(source) # Also ends the prompt's other channels (e.g. the alarm)
+        else:
+            verdict = FANOUT.acknowledge(channel, token)
+            if verdict != channels.ACCEPTED:
+                span.set(verdict=verdict)
+                return verdict
+        send_heartbeat()
+        if RUNTIME:
+            RUNTIME.click(source)
+            return channels.ACCEPTED
+        # Snapshots the cycle before waking monitor_loop, which ends the cycle
+        cycle_id, notified_at = CYCLE_ID, NOTIFIED_AT
+        CLICK_EVENT.set() # Wakes the waiter first, logging comes after
+        latency = CLOCK.time() - notified_at if notified_at else math.nan
+        log_click_time(source=source, cycle_id=cycle_id, latency=latency)
+        return channels.ACCEPTED
+
+
+def register_profile_click(token):
+    """
+    Records a response to a profile's prompt (a /click?profile=<token> link, see
+    profiles.py) and logs it with the "profile" source and the profile's name.
+
+    Returns:
+        str: channels.ACCEPTED, or channels.STALE if the token is not that of a
+            prompt awaiting a response.
+    """
+    if PROFILES is None:
+        return channels.STALE
+    with TRACER.span("click", source="profile") as span:
+        verdict, name, latency = PROFILES.acknowledge(token)
+        span.set(verdict=verdict, profile=name)
+        if verdict == channels.ACCEPTED:
+            log_click_time(source=PROFILE, latency=latency, profile=name)
+    return verdict
+
+
+def send_heartbeat(armed=True, wait=False):
+    """
+    Posts an "awake" heartbeat to the fleet supervisor (see fleet_supervisor.py),
+    if `supervisor_url` is configured. The supervisor then owns this machine's
+    deadline, using this machine's notification duration and interval.
+    The request runs on a daemon thread so it never delays the click path.
+
+    Args:
+        armed (bool): False tells the supervisor to stop tracking this machine.
+        wait (bool): Blocks until the request finished (used on exit).
+    """
+    config = load_config()
+    if not config["supervisor_url"]:
+        return
+    query = urlencode({
+        "host": socket.gethostname(),
+        "duration": config["notification_duration"],
+        "interval": config["notification_interval"],
+        "armed": int(armed),
+    })
+    url = f"{config['supervisor_url'].rstrip('/')}/heartbeat?{query}"
+    headers = {"Authorization": f"Bearer {config['supervisor_token']}"}
+
+    def post():
+        import urllib.request
+
+        try:
+            urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=2).close()
+        except OSError as e:
+            LOG.warning("Could not reach fleet supervisor: %s", e)
+
+    heartbeat_thread = threading.Thread(target=post, daemon=True)
+    heartbeat_thread.start()
+    if wait:
+        heartbeat_thread.join()
+
+
+class ClickServer(ThreadingHTTPServer):
+    """
+    ThreadingHTTPServer with a listen backlog large enough for a burst of
+    connections (the default of 5 makes the extra clients retry after a second).
+    """
+    request_queue_size = 64
+
+
+def history_page():
+    """
+    Returns the complete HTTP response for '/history': the click history
+    dashboard, rendered from the rollups (no log file is read).
+    """
+    summary = get_log_writer().rollups.summary(CLOCK.time())
+    return assets.http_response(200, "OK", "text/html; charset=utf-8",
+                                history_rollups.render_html(summary))
+
+
+def history_json():
+    """
+    Returns the complete HTTP response for '/history.json': the dashboard's data.
+    """
+    summary = get_log_writer().rollups.summary(CLOCK.time())
+    return assets.http_response(200, "OK", "application/json", json.dumps(summary))
+
+
+# Extra GET paths served by both the threaded and the asyncio click listener
+HISTORY_ROUTES = {"/history": history_page, "/history.json": history_json}
+
+
 class ClickHandler(BaseHTTPRequestHandler):
     """
     A custom HTTP request handler for the local web server.
     It processes GET requests. When the '/click' path is accessed,
-    it sets the global CLICKED_FLAG to True, sends an HTML response
+    it sets CLICK_EVENT, sends an HTML response
     that attempts to close the browser tab, and logs the event.
+    Each connection is served on its own thread with a read deadline, so an idle
+    or slow socket cannot hold up the real '/click' request.
     """
+    # Applied as the socket timeout for every connection (see StreamRequestHandler.setup)
+    timeout = CONNECTION_READ_TIMEOUT
+
     def do_GET(self):
-        global CLICKED_FLAG
-        if self.path == "/click":
-            CLICKED_FLAG = True
+        url = urlsplit(self.path)
+        if url.path == "/click":
+            # Hands the click to monitor_loop (and logs it) before writing the response
+            channel, token = channels.parse_click_query(url.query)
+            profile_token = profiles.parse_profile_query(url.query)
+            if profile_token is not None:
+                verdict = register_profile_click(profile_token)
+            else:
+                verdict = register_click(channels.click_source(channel), channel, token)
+            if verdict == channels.STALE:
+                self.log_request(410)
+                self.wfile.write(EXPIRED_RESPONSE)
+                return
+            self.log_request(200)
+            self.wfile.write(CLICK_RESPONSE)
+            LOG.debug("HTTP server: CLICK_EVENT set. Sent HTML with close attempt.")
+        elif url.path == "/metrics":
+            body = metrics.REGISTRY.render().encode('utf-8')
             self.send_response(200)
-            self.send_header('Content-type', 'text/html')
+            self.send_header('Content-type', metrics.CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
             self.end_headers()
-            
-            # HTML, CSS and JavaScript
-            response_html = """
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Action Confirmed</title>
-                <script type="text/javascript">
-                    // Attempt to close the window after a short delay
-                    // This may not work in all browsers due to security restrictions.
-                    setTimeout(function() {
-                        window.close();
-                    }, 500); // 500ms delay
-                </script>
-                <style>
-                    body { font-family: sans-serif; text-align: center; margin-top: 50px; }
-                    h1 { color: #4CAF50; }
-                    p { color: #555; }
-                </style>
-            </head>
-            <body>
-                <h1>Action Confirmed!</h1>
-                <p>Thank you for responding.</p>
-                <p>This tab may close automatically. If not, you can close it manually.</p>
-            </body>
-            </html>
-            """
-            self.wfile.write(response_html.encode('utf-8'))
-            print("HTTP server: CLICKED_FLAG set to True. Sent HTML with close attempt.")
-            log_click_time(source="notification") # Logs that the notification was clicked
+            self.wfile.write(body)
+        elif url.path in HISTORY_ROUTES:
+            self.log_request(200)
+            self.wfile.write(HISTORY_ROUTES[url.path]())
         else:
             # For any other path, send a "No Content" response
-            self.send_response(204)
-            self.end_headers()
-            print(f"HTTP server: Unhandled path '{self.path}'")
+            self.log_request(204)
+            self.wfile.write(NO_CONTENT_RESPONSE)
+            LOG.debug("HTTP server: Unhandled path '%s'", self.path)
+
+    def log_message(self, format, *args):
+        # One line per request, through LOG rather than straight to sys.stderr
+        LOG.debug("HTTP server: " + format, *args, client=self.client_address[0])
 
+    def log_error(self, format, *args):
+        # Timeouts and malformed requests end up here
+        metrics.SERVER_ERRORS.inc(kind="request")
+        LOG.warning("HTTP server: " + format, *args, client=self.client_address[0])
 
-def start_and_monitor_http_server(timeout_seconds):
+
+def start_click_listener(port=8888):
     """
-    Starts a temporary local HTTP server to listen for a click from the notification.
-    The server runs for a specified `timeout_seconds` duration or until a click is received,
-    then it shuts itself down.
+    Starts the local HTTP server that listens for clicks from the notification.
+    It is started once and stays up for the whole life of the process, so a click
+    never hits a closed port between cycles. Every connection gets its own daemon
+    thread, so idle preconnect or favicon sockets never block a click.
 
     Args:
-        timeout_seconds (int): The maximum duration (in seconds) to wait for a click.
+        port (int, optional): Port to listen on; 0 picks a free one (see the
+            returned server's server_address).
 
     Returns:
-        bool: True if the user clicked the notification, False if it timed out or was stopped.
+        ClickServer: The running server, or None if the port could not be bound.
     """
-    global CLICKED_FLAG 
-    # Resets CLICKED_FLAG at the beginning of this monitoring phase
-    CLICKED_FLAG = False 
-
-    server_address = ("localhost", 8888)
-    httpd = None # Initializes httpd to None
+    global HTTPD
+    server_address = ("localhost", port)
 
     try:
-        httpd = HTTPServer(server_address, ClickHandler)
-        # Sets a timeout for handle_request() to make the loop non-blocking.
-        # It allows the loop to periodically check STOP_FLAG and the overall timeout.
-        httpd.timeout = 1  
-        print(f"HTTP server temporarily started on http://{server_address[0]}:{server_address[1]} for {timeout_seconds}s.")
-
-        start_time = time.time()
-        while not CLICKED_FLAG and not STOP_FLAG and (time.time() - start_time < timeout_seconds):
-            # handle_request() processes one request or times out (based on httpd.timeout).
-            # If it times out, the loop continues to check flags and remaining time.
-            httpd.handle_request()
-            
-        return CLICKED_FLAG # Returns the final state of CLICKED_FLAG
-            
+        HTTPD = ClickServer(server_address, ClickHandler)
     except OSError as e:
-        print(f"HTTP server error: {e}. Port 8888 might be in use. Cannot listen for click.")
-        return False # Indicates a failure to start/listen
-    except Exception as e:
-        print(f"An unexpected error occurred in HTTP server: {e}")
-        return False # Indicates an unexpected error during server operation
-    finally:
-        # Ensures the server is closed and the port is released when the function exits
-        if httpd:
-            httpd.server_close()
-            print("HTTP server stopped for this cycle.")
+        metrics.SERVER_ERRORS.inc(kind="bind")
+        LOG.error("HTTP server error: %s. Port %s might be in use. Only the tray menu can confirm.", e, port)
+        return None
+
+    listener_thread = threading.Thread(target=HTTPD.serve_forever, daemon=True)
+    listener_thread.start()
+    LOG.info("HTTP server started on http://%s:%s.", *HTTPD.server_address)
+    return HTTPD
+
+
+def stop_click_listener():
+    """
+    Stops the persistent HTTP server and releases the port.
+    """
+    global HTTPD
+    if HTTPD:
+        HTTPD.shutdown()
+        HTTPD.server_close()
+        HTTPD = None
+        LOG.info("HTTP server stopped.")
+
+
+def wait_for_click(timeout_seconds):
+    """
+    Blocks until the user confirms being awake (HTTP or tray click), the application
+    is stopped, or `timeout_seconds` elapse. CLICK_EVENT must be cleared by the caller
+    before the notification goes out, so a click that arrives early is not lost.
+
+    Args:
+        timeout_seconds (int): The maximum duration (in seconds) to wait for a click.
+
+    Returns:
+        bool: True if the user clicked, False if it timed out or was stopped.
+    """
+    clicked = CLOCK.wait(CLICK_EVENT, timeout_seconds)
+    return clicked and not STOP_EVENT.is_set()
 
 
 def send_notification():
     """
-    Creates and displays a Windows toast notification with an "I'm Awake!" button.
-    The button's action is set to launch a local HTTP URL which will be handled
-    by the temporarily running HTTP server.
+    Creates and displays a Windows toast notification with an "I'm Awake!" button
+    (through the platform's notifier backend). The button's action is set to launch a local HTTP URL which will be handled
+    by the persistent HTTP click listener.
+    The same prompt also goes out over the other channels enabled in config.json
+    (webhook, email, alarm), all at once. Returns as soon as one of them delivered it.
+
+    Raises:
+        RuntimeError: If no channel could deliver the prompt.
+    """
+    settings = load_config()["channels"]
+    prompt = channels.Prompt(title="Are you awake?",
+                             message="Click the button or your PC will shut down in 1 minute.",
+                             button_label="I'm Awake!",
+                             click_url="http://localhost:8888/click")
+    delivery = FANOUT.send(prompt, channels.build_channels(settings, BACKENDS.notifier))
+    if not delivery.wait(NOTIFICATION_DISPLAY_TIMEOUT):
+        raise RuntimeError(f"No channel delivered the prompt ({delivery.describe_errors() or 'cancelled'})")
+    metrics.CYCLES.inc()
+    LOG.info("Notification shown. Waiting for user response via HTTP click.")
+
+
+def send_profile_prompt(name, token, config):
+    """
+    Sends a profile's "Are you awake?" prompt over the profile's channels, one
+    after the other, each with the profile's click link. Called by PROFILES on
+    one of its workers.
+
+    Raises:
+        RuntimeError: If no channel could deliver the prompt.
+    """
+    prompt = channels.Prompt(title=f"Are you awake, {name}?",
+                             message="Click the button or the escalation starts in 1 minute.",
+                             button_label="I'm Awake!",
+                             click_url=profiles.profile_link(channels.DEFAULT_CLICK_URL, token))
+    errors = []
+    for channel in channels.build_channels(config["channels"], BACKENDS.notifier):
+        try:
+            channel.send(prompt, profiles.profile_link(getattr(channel, "click_url", channels.DEFAULT_CLICK_URL), token))
+        except Exception as e:
+            metrics.CHANNEL_ERRORS.inc(channel=channel.name)
+            errors.append(f"{channel.name}: {e}")
+    if len(errors) == len(config["channels"]):
+        raise RuntimeError(f"No channel delivered the prompt ({'; '.join(errors)})")
+    metrics.CYCLES.inc()
+    LOG.info("Profile '%s': notification sent.", name)
+
+
+def prompt_not_shown(error, config, cycle_id=0):
+    """
+    Records a cycle whose prompt never showed (no channel delivered it, or the
+    display was not confirmed within NOTIFICATION_DISPLAY_TIMEOUT). Such a cycle
+    does not escalate; the prompt is tried again after the interval.
     """
-    toast = Notification(app_id=app_id,
-                         title="Are you awake?",
-                         msg="Click the button or your PC will shut down in 1 minute.",
-                         duration="long")
-    toast.set_audio(audio.Default, loop=False)
-    toast.add_actions(label="I'm Awake!", launch="http://localhost:8888/click")
-    toast.show()
-    print("Notification shown. Waiting for user response via HTTP click.")
+    metrics.PROMPTS_NOT_SHOWN.inc()
+    LOG.error("The notification did not show (%s). Not escalating; trying again in %s seconds.",
+              error or "not confirmed in time", config["notification_interval"], cycle=cycle_id)
+
+
+def notification_done(dispatch):
+    """
+    DISPATCHER completion callback: records how long the notification took to
+    reach the screen, or why it did not.
+    """
+    if dispatch.cancelled:
+        return
+    if dispatch.error is not None:
+        metrics.NOTIFICATION_ERRORS.inc()
+        LOG.error("Notification failed: %s", dispatch.error)
+        return
+    metrics.NOTIFICATION_DISPATCH.observe(dispatch.latency)
+    LOG.info("Notification displayed %.0f ms after it was queued.", dispatch.latency * 1000)
 
 
 # ------------------- Wait Until Time ------------------- #
-def wait_until_time(target_str):
+def wait_until_time(schedule, catch_up_policy=scheduler.CATCH_UP_FIRE, catch_up_minutes=240):
     """
-    Pauses the execution of the program until a specific target time (HH:MM) is reached.
-    If the target time has already passed for the current day, it waits until that time
-    on the next day. It continuously checks the STOP_FLAG to allow for early termination.
+    Pauses the execution of the program until the next window of the schedule starts
+    (e.g. the next 02:00 for a plain "02:00"). The deadline is looked up once in the
+    compiled schedule and slept on directly; WAKE_EVENT interrupts the wait (on Exit
+    or when the configuration changes). If the machine was suspended across the start
+    time, the catch-up policy decides whether to start right away or wait for the next
+    window; a window that already ended is always skipped.
 
     Args:
-        target_str (str): The target time in "HH:MM" 24-hour format (e.g., "02:00").
+        schedule (scheduler.Schedule or str): The compiled schedule, or a schedule
+            expression such as "02:00" (24-hour format).
+        catch_up_policy (str): scheduler.CATCH_UP_FIRE or scheduler.CATCH_UP_SKIP.
+        catch_up_minutes (int): How late a start may fire under CATCH_UP_FIRE.
+
+    Returns:
+        scheduler.Window: The window that started (its `end` is None if it has
+            none), or None if interrupted by WAKE_EVENT.
     """
-    target_hour, target_minute = map(int, target_str.split(":"))
-    print(f"Waiting until {target_str} to start monitoring...")
+    def clock_jumped(drift):
+        LOG.warning("Clock jump of %+.0fs detected (suspend/resume or time change). Rechecking start time.", drift)
+
+    if isinstance(schedule, str):
+        schedule = scheduler.compile_schedule(schedule)
+    window = schedule.next_window(CLOCK.now())
     while True:
-        now = datetime.now()
-        # Creates a datetime object for the target time on the current day
-        target_time = now.replace(hour=target_hour, minute=target_minute, second=0, microsecond=0)
-        
-        # If the target time has already passed today, set it for tomorrow
-        if now > target_time:
-            target_time += timedelta(days=1)
-            
-        # Check if the exact target minute has been reached
-        if now.hour == target_hour and now.minute == target_minute:
-            break 
-            
-        # Check the global STOP_FLAG to allow the wait to be interrupted
-        if STOP_FLAG:
-            print("Wait until time interrupted by STOP_FLAG.")
-            return
+        until = f" (until {window.end:%H:%M})" if window.end else ""
+        LOG.info("Waiting until %s to start monitoring%s...", f"{window.start:%Y-%m-%d %H:%M}", until)
+        metrics.STATE.set_state("waiting_for_start")
+        metrics.NEXT_DEADLINE.set(window.start.timestamp())
+        reached, wakeups = scheduler.sleep_until(window.start, WAKE_EVENT, on_clock_jump=clock_jumped, clock=CLOCK)
+        if not reached:
+            LOG.info("Wait until time interrupted.")
+            return None
+
+        next_window = scheduler.resolve_late_start(window, schedule, catch_up_policy, catch_up_minutes * 60,
+                                                   now=CLOCK.now())
+        if next_window is None:
+            metrics.WAKEUP_JITTER.observe(CLOCK.time() - window.start.timestamp(), wait="start")
+            LOG.info("Start time reached after %d wake-up(s).", wakeups)
+            return window
+        metrics.MISSED_STARTS.inc()
+        LOG.warning("Start time %s was missed; skipping to the next window.", f"{window.start:%Y-%m-%d %H:%M}")
+        window = next_window
+
+
+# ------------------- Adaptive Schedule ------------------- #
+def adapt_schedule():
+    """
+    With `adaptive_schedule` on, updates the schedule model with the clicks
+    logged since its last update and advises a start time and interval for
+    the target false-shutdown rate. "suggest" prints them; "apply" saves them
+    to config.json, which reschedules the wait for the start time. Called
+    before each wait for the start time.
+    """
+    global SCHEDULE_MODEL
 
-        # Calculates time remaining and sleep in chunks to remain responsive to STOP_FLAG
-        time_to_sleep = (target_time - now).total_seconds()
-        if time_to_sleep > 0:
-            # Sleep for a maximum of 20 seconds, or the remaining time if less
-            sleep_chunk = min(time_to_sleep, 20) 
-            time.sleep(sleep_chunk)
-        else:
-            # If time is exactly now or slightly past due to execution delays, sleep briefly
-            time.sleep(1)
+    config = load_config()
+    mode = config["adaptive_schedule"]
+    if mode == "off":
+        return
+    try:
+        if SCHEDULE_MODEL is None:
+            SCHEDULE_MODEL = schedule_advisor.ScheduleModel(WAKE_STORE_PATH)
+        get_log_writer().flush(timeout=2) # The latest clicks go to the store first
+        if SCHEDULE_MODEL.update():
+            SCHEDULE_MODEL.save()
+        advice = SCHEDULE_MODEL.advise(config["adaptive_target_rate"], config["adaptive_miss_rate"],
+                                       config["notification_duration"], config["adaptive_min_nights"],
+                                       now=CLOCK.time())
+    except (RuntimeError, OSError, ValueError) as e:
+        LOG.warning("Adaptive schedule unavailable: %s", e)
+        return
+    if not advice["enough_history"]:
+        LOG.info("Adaptive schedule: %d of %d nights of history needed.", advice["nights"], config["adaptive_min_nights"])
+        return
+
+    summary = (f"start at {advice['start_time']}, every {advice['notification_interval']} seconds: "
+               f"{advice['false_shutdown_rate']:.1%} of nights with a false shutdown "
+               f"(target {config['adaptive_target_rate']:.1%}), learned from {advice['nights']} nights")
+    if mode == "apply" and config["schedule"]:
+        LOG.info("Adaptive schedule advises: %s (not applied: the schedule expression sets the start times).", summary)
+    elif mode == "apply" and (advice["start_time"], advice["notification_interval"]) != \
+            (config["start_time"], config["notification_interval"]):
+        CONFIG.save({"start_time": advice["start_time"],
+                     "notification_interval": advice["notification_interval"]})
+        LOG.info("Adaptive schedule applied: %s.", summary)
+    else:
+        LOG.info("Adaptive schedule advises: %s.", summary)
 
 
 # ------------------- Monitoring Thread ------------------- #
+def sleep_interval(until=None):
+    """
+    Sleeps for `notification_interval` seconds between checks. Waits on WAKE_EVENT
+    rather than time.sleep() so Exit is not delayed by the interval; if the interval
+    is changed meanwhile, the remaining time is recomputed from the new value.
+
+    Args:
+        until (datetime, optional): End of the schedule window; the sleep stops there.
+    """
+    sleep_started = CLOCK.monotonic()
+    while not STOP_EVENT.is_set():
+        WAKE_EVENT.clear()
+        interval = load_config()["notification_interval"]
+        remaining = sleep_started + interval - CLOCK.monotonic()
+        if until is not None:
+            remaining = min(remaining, until.timestamp() - CLOCK.time())
+        if remaining <= 0:
+            return
+        metrics.STATE.set_state("sleeping")
+        metrics.NEXT_DEADLINE.set(CLOCK.time() + remaining)
+        if not CLOCK.wait(WAKE_EVENT, remaining):
+            metrics.WAKEUP_JITTER.observe(max(CLOCK.monotonic() - sleep_started - interval, 0.0), wait="interval")
+            return
+
+
+def presence_source(config):
+    """
+    Returns the idle source set by `presence_source` in config.json, or the
+    platform backend's when it is empty.
+    """
+    if config["presence_source"]:
+        return presence.make_source(config["presence_source"])
+    return BACKENDS.presence
+
+
+def wait_for_idle(config, cancel_event=WAKE_EVENT):
+    """
+    Holds the next prompt back while the user is active: returns once the
+    keyboard and mouse have been idle for `idle_threshold` seconds. Recent
+    input counts as an implicit "awake" (a heartbeat to the fleet supervisor
+    included), again every `notification_interval` while it goes on.
+
+    Args:
+        config (dict): The configuration ("idle_threshold", "presence_source").
+        cancel_event (threading.Event): Ends the wait early (Exit, or a
+            configuration change).
+
+    Returns:
+        bool: True once the prompt may go out (at once if idle_threshold is 0
+            or the idle time is unknown), False if `cancel_event` was set.
+    """
+    threshold = config["idle_threshold"]
+    if not threshold:
+        return True
+
+    def active(idle):
+        metrics.IMPLICIT_AWAKES.inc()
+        send_heartbeat()
+        LOG.info("Last input %.0f seconds ago. User is active; holding the notification back.", idle)
+
+    metrics.STATE.set_state("awaiting_idle")
+    return PRESENCE.wait_until_idle(presence_source(config), threshold, cancel_event, CLOCK,
+                                    on_active=active, active_every=config["notification_interval"])
+
+
+def quiet_period(config):
+    """
+    Returns the quiet period (a quiet_calendar.QuietPeriod) the current time
+    falls in, or None. The calendar files are reloaded if they changed.
+    """
+    if not config["quiet_calendars"]:
+        return None
+    return QUIET.current(config["quiet_calendars"], CLOCK.time())
+
+
+def log_stage(result):
+    """
+    Records an escalation stage (an actions.StageResult) in wake_log.txt and the metrics.
+    The line is written out before returning, as the stage may be powering the machine off.
+    """
+    line = result.describe()
+    outcome = "dry_run" if result.dry_run else "ok" if result.ok else "failed"
+    metrics.ESCALATION_STAGES.inc(action=result.action, result=outcome)
+    writer = get_log_writer()
+    now = CLOCK.time()
+    if outcome == "ok" and result.action in actions.POWER_OFF_ACTIONS:
+        metrics.SHUTDOWNS.inc()
+        writer.rollups.add_shutdown(now)
+    timestamp = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+    writer.write(f"[{timestamp}] {line}\n")
+    writer.flush(timeout=2)
+    if outcome == "failed":
+        LOG.warning(line, action=result.action)
+    else:
+        LOG.info(line, action=result.action)
+
+
+def escalate(config, cancel_event=CLICK_EVENT):
+    """
+    Runs the escalation ladder from config.json (by default, a shutdown after a
+    15-second grace period). Commands run without a shell; each stage is logged.
+
+    Args:
+        config (dict): The configuration ("escalation" and "action_dry_run").
+        cancel_event (threading.Event): Stops the ladder during a stage delay
+            (a late click, or Exit).
+
+    Returns:
+        actions.Escalation: What ran, and whether a click cancelled the rest.
+    """
+    metrics.STATE.set_state("shutting_down")
+    executor = actions.ActionExecutor(BACKENDS.power, runner=ACTION_RUNNER)
+    escalation = executor.escalate(config["escalation"], cancel_event, CLOCK,
+                                   dry_run=config["action_dry_run"], on_stage=log_stage)
+    FANOUT.cancel() # The prompt is over: stops the alarm, if it is still sounding
+    if escalation.cancelled:
+        metrics.ESCALATIONS_CANCELLED.inc()
+        LOG.info("Escalation cancelled.")
+    return escalation
+
+
+def escalate_profile(name, config, cancel_event):
+    """
+    Runs a profile's escalation ladder. Called by PROFILES on one of its workers.
+
+    Args:
+        name (str): The profile.
+        config (dict): The profile's settings ("escalation" and "action_dry_run").
+        cancel_event (threading.Event): Set by a late response, or Exit.
+
+    Returns:
+        actions.Escalation
+    """
+    LOG.warning("Profile '%s': no response within duration. Escalating.", name)
+    executor = actions.ActionExecutor(BACKENDS.power, runner=ACTION_RUNNER)
+    escalation = executor.escalate(config["escalation"], cancel_event, CLOCK,
+                                   dry_run=config["action_dry_run"], on_stage=log_stage)
+    if escalation.cancelled:
+        metrics.ESCALATIONS_CANCELLED.inc()
+        LOG.info("Profile '%s': escalation cancelled.", name)
+    return escalation
+
+
 def monitor_loop():
     """
     The main monitoring loop of the application.
-    It waits until the configured start time, then repeatedly:
-    1. Sends a notification.
-    2. Starts a temporary HTTP server to listen for a user click for a defined duration.
-    3. If no click is received within the duration, it initiates a system shutdown.
-    4. If a click is received, it waits for a defined interval before repeating the cycle.
-    The loop terminates if the global STOP_FLAG is set.
-    """
-    global CLICKED_FLAG # Declares intent to read this global flag
-    config = load_config()
-    
-    # The line below is for testing purposes
-    # wait_until_time((datetime.now() + timedelta(minutes=1)).strftime("%H:%M"))
-    wait_until_time(config["start_time"])
+    It waits until the next window of the schedule starts (the configured start
+    time, adapted to the click history if enabled; see adapt_schedule()), then
+    runs notification_cycles() until the window ends.
+    Once the window ended, or the escalation suspended the machine, it waits for
+    the next window; it ends once the machine was powered off, or when STOP_EVENT is set.
+    """
+    while not STOP_EVENT.is_set():
+        adapt_schedule() # May move the start time before it is waited for
+        # A configuration change interrupts the wait; the start time is then recomputed.
+        WAKE_EVENT.clear()
+        config = load_config()
+        # To try a schedule without waiting for the real start time, use simulator.py
+        window = wait_until_time(scheduler.config_schedule(config), config["catch_up_policy"],
+                                 config["catch_up_minutes"])
+        if window is None:
+            continue
+        if not notification_cycles(window.end):
+            break # Exits the monitoring loop as shutdown is initiated
 
+    if metrics.STATE.current() != "shutting_down":
+        metrics.STATE.set_state("stopped")
+    LOG.info("Monitoring loop finished.")
 
-    while not STOP_FLAG:
-        send_notification()
-        
-        # Starts the HTTP server to listen for a click for the notification's duration.
+
+def notification_cycles(until=None):
+    """
+    Repeats the notification cycle, until the end of the schedule window if it has one:
+    1. Sends a notification (queued to DISPATCHER, with clicks already armed),
+       once the input has been idle for `idle_threshold` seconds (see wait_for_idle())
+       and outside the quiet periods of the calendar (see quiet_period()).
+    2. Waits for a user click (notification or tray) for a defined duration,
+       counted from when the notification was confirmed on screen.
+    3. If no click is received within the duration, it runs the escalation ladder
+       (see escalate()). A late click cancels it and the cycles go on.
+    4. Otherwise, it waits for a defined interval before repeating the cycle.
+
+    Args:
+        until (datetime, optional): End of the schedule window; no notification goes out after it.
+
+    Returns:
+        bool: False once the machine was powered off; True if the window ended,
+            the escalation suspended the machine, or STOP_EVENT was set.
+    """
+    global CYCLE_ID, NOTIFIED_AT
+
+    quieted_by = None # The quiet period last reported
+    while not STOP_EVENT.is_set():
+        # A configuration change interrupts the idle wait; it then starts over with the new values.
+        WAKE_EVENT.clear()
+        config = load_config()
+        if until is not None and CLOCK.now() >= until:
+            LOG.info("Schedule window ended at %s. Waiting for the next one.", f"{until:%H:%M}")
+            return True
+        if not wait_for_idle(config):
+            continue
+        if until is not None and CLOCK.now() >= until:
+            continue # The input stayed active past the end of the window
+        quiet = quiet_period(config)
+        if quiet is not None:
+            if quiet != quieted_by:
+                quieted_by = quiet
+                metrics.QUIET_PERIODS.inc()
+                LOG.info("Quiet period '%s' until %s; no notification.", quiet.summary, f"{datetime.fromtimestamp(quiet.end):%Y-%m-%d %H:%M}")
+            metrics.STATE.set_state("quiet")
+            resume = quiet.end if until is None else min(quiet.end, until.timestamp())
+            metrics.NEXT_DEADLINE.set(resume)
+            # Checked again at least every MAX_SLEEP_SECONDS, so an edited calendar is noticed
+            CLOCK.wait(WAKE_EVENT, min(max(resume - CLOCK.time(), 0), scheduler.MAX_SLEEP_SECONDS))
+            continue
+        # Arms the click event before the notification goes out
+        CLICK_EVENT.clear()
+        NOTIFIED_AT = CLOCK.time()
+        CYCLE_ID = int(NOTIFIED_AT)
+        metrics.STATE.set_state("awaiting_click")
+        cycle_id = CYCLE_ID
+        with TRACER.span("notify", cycle=cycle_id) as span:
+            dispatch = DISPATCHER.submit(send_notification, on_done=notification_done)
+
+            # The response window starts once the notification is on screen. A click
+            # that arrives before that (e.g. from the tray) is kept by CLICK_EVENT.
+            displayed = CLOCK.wait(dispatch.done, NOTIFICATION_DISPLAY_TIMEOUT) and dispatch.displayed_at is not None
+            span.set(displayed=displayed)
+        if not displayed and not CLICK_EVENT.is_set():
+            # Nobody was asked, so an unanswered window must not escalate
+            CYCLE_ID, NOTIFIED_AT = 0, None
+            if STOP_EVENT.is_set():
+                break
+            prompt_not_shown(dispatch.error, config, cycle_id)
+            with TRACER.span("sleep", cycle=cycle_id):
+                sleep_interval(until)
+            continue
+        NOTIFIED_AT = dispatch.displayed_at or CLOCK.time()
+        deadline = NOTIFIED_AT + config["notification_duration"]
+        metrics.NEXT_DEADLINE.set(deadline)
+
+        # Waits for a click for the notification's duration.
         # The function returns True if the user clicked, False otherwise.
-        user_responded = start_and_monitor_http_server(config["notification_duration"]) 
-
-        # After start_and_monitor_http_server returns, the temporary HTTP server is shut down.
-        # Now, check if the user responded or if the application needs to stop.
-        if not user_responded and not STOP_FLAG:
-            print("No response within duration. Shutting down.")
-            # This line will initiate system shutdown with a 15-second delay.
-            os.system("shutdown /s /t 15") 
-            break # Exits the monitoring loop as shutdown is initiated
+        with TRACER.span("listen", cycle=cycle_id) as span:
+            user_responded = wait_for_click(max(deadline - CLOCK.time(), 0))
+            span.set(clicked=user_responded)
+        notified_at = NOTIFIED_AT
+        CYCLE_ID, NOTIFIED_AT = 0, None
+
+        # Check if the user responded or if the application needs to stop.
+        if not user_responded and not STOP_EVENT.is_set():
+            LOG.warning("No response within duration. Escalating.", cycle=cycle_id)
+            log_missed_prompt(cycle_id, notified_at)
+            with TRACER.span("escalate", cycle=cycle_id):
+                escalation = escalate(config)
+            if escalation.powered_off:
+                return False
+            if escalation.suspended:
+                LOG.info("Resumed after the escalation. Waiting for the next start time.")
+                return True
         
-        # If STOP_FLAG was set during the monitoring/waiting phase, exit the loop
-        if STOP_FLAG:
-            print("Monitoring loop exiting due to STOP_FLAG.")
+        # If STOP_EVENT was set during the monitoring/waiting phase, exit the loop
+        if STOP_EVENT.is_set():
+            LOG.info("Monitoring loop exiting due to STOP_EVENT.")
             break
 
-        print(f"User confirmed. Sleeping for {config['notification_interval']} seconds before next check.")
-        time.sleep(config["notification_interval"])
-    
-    print("Monitoring loop finished.")
+        outcome = "User confirmed" if user_responded else "Escalation ended without a shutdown"
+        LOG.info("%s. Sleeping for %s seconds before next check.", outcome, config["notification_interval"])
+        with TRACER.span("sleep", cycle=cycle_id):
+            sleep_interval(until)
+    return True
+
+
+# ------------------- Profiles ------------------- #
+def profile_loop():
+    """
+    Multi-profile counterpart of monitor_loop(): drives the schedules of all the
+    profiles in config.json from this one thread (see profiles.py), until
+    STOP_EVENT is set or an escalation powered the machine off.
+    """
+    global PROFILES
+    PROFILES = profiles.ProfileScheduler(send_profile_prompt, escalate_profile, clock=CLOCK)
+    PROFILES.configure(load_config())
+    LOG.info("Monitoring %d profiles.", len(PROFILES.table))
+    metrics.STATE.set_state("profiles")
+    PROFILES.run(STOP_EVENT)
+    if PROFILES.powered_off:
+        metrics.STATE.set_state("shutting_down")
+    else:
+        metrics.STATE.set_state("stopped")
+    LOG.info("Profile scheduler finished.")
 
 
 # ------------------- Tray Menu Handlers ------------------- #
 def on_awake_clicked(icon, item):
     """
     Handles the event when the "I'm Awake" item is clicked in the system tray menu.
-    It manually sets the global CLICKED_FLAG to True, mimicking a notification click,
-    and logs the event.
+    It sets CLICK_EVENT, mimicking a notification click, and logs the event.
     
     Args:
         icon: The pystray Icon object.
         item: The MenuItem object that was clicked.
     """
-    global CLICKED_FLAG
-    print("User clicked 'I'm Awake' from tray menu.")
-    CLICKED_FLAG = True # Manually sets the flag
-    log_click_time(source="tray menu") # Logs the manual click
+    LOG.info("User clicked 'I'm Awake' from tray menu.")
+    register_click(source="tray menu") # Wakes monitor_loop and logs the manual click
 
 
 def on_exit(icon, item):
     """
     Handles the event when the "Exit" item is clicked in the system tray menu.
-    It sets the global STOP_FLAG to True to signal all running threads (like monitor_loop
+    It sets STOP_EVENT to signal all running threads (like monitor_loop
     and the HTTP server if active) to terminate gracefully.
     It then stops the system tray icon.
     
@@ -333,170 +1200,280 @@ def on_exit(icon, item):
         icon: The pystray Icon object.
         item: The MenuItem object that was clicked.
     """
-    global STOP_FLAG
-    
-    STOP_FLAG = True # Signals all threads to stop
-    print("Exit command received. Signaling threads to stop...")
-
-    # The start_and_monitor_http_server function manages its own lifecycle.
-    # If it's currently running, it will detect STOP_FLAG and exit gracefully.
+    STOP_EVENT.set() # Signals all threads to stop
+    WAKE_EVENT.set() # Wakes monitor_loop if it is waiting for the start time or interval
+    CLICK_EVENT.set() # Wakes monitor_loop if it is waiting for a click
+    DISPATCHER.stop() # Drops queued notifications and ends any wait for one
+    BACKENDS.notifier.stop() # Ends the notification worker process, if any
+    FANOUT.stop() # Stops the alarm and any prompt still being sent
+    UI.stop() # Closes the Settings window and ends the UI thread, if it was started
+    if RUNTIME:
+        RUNTIME.request_stop() # Cancels the asyncio tasks
+    if PROFILES:
+        PROFILES.stop() # Wakes the profile scheduler and cancels running escalations
+    send_heartbeat(armed=False, wait=True) # The fleet supervisor must not act on a machine that exited
+    LOG.info("Exit command received. Signaling threads to stop...")
+
+    # The click listener is shut down by run_tray() once the tray loop returns.
     
     icon.stop() # Stops the pystray icon's main loop
-    print("Tray icon stopped.")
+    LOG.info("Tray icon stopped.")
 
 
 # ------------------- Startup Shortcut Function ------------------- #
 # !!! UNDER DEVELOPMENT !!!
 def create_startup_shortcut():
     """
-    Creates a shortcut (.lnk file) to the application's executable in the
-    current user's Windows Startup folder.
+    Creates a shortcut to the application's executable that starts it on login:
+    a .lnk file in the current user's Windows Startup folder (or an XDG autostart
+    entry on Linux), through the platform's shortcut backend.
     """
+    from tkinter import messagebox
 
     try:
         exe_path = sys.executable 
-        
-        # Gets the path to the current user's Startup folder
-        startup_folder = os.path.join(os.environ['APPDATA'], 'Microsoft', 'Windows', 'Start Menu', 'Programs', 'Startup')
-        
-        # Defines the path for the shortcut file
-        # Uses a consistent name for the shortcut for easy management
-        shortcut_name = "Deadman's Switch.lnk"
-        shortcut_path = os.path.join(startup_folder, shortcut_name)
-
-        # Creates the shell object to create shortcuts
-        shell = win32com.client.Dispatch("WScript.Shell")
-        shortcut = shell.CreateShortCut(shortcut_path)
-        shortcut.TargetPath = exe_path
-        
-        # Sets description and icon location for the shortcut
-        shortcut.Description = "Runs Deadman's Switch on Windows startup."
-        shortcut.IconLocation = os.path.join(os.path.dirname(exe_path), ICON_PATH)
-        
-        shortcut.Save() # Saves the shortcut file
+        shortcut_path = BACKENDS.shortcut.install(exe_path, os.path.join(os.path.dirname(exe_path), ICON_PATH))
+        if shortcut_path is None:
+            messagebox.showinfo("Startup Shortcut", "Startup shortcuts are not supported on this platform.")
+            LOG.info("No startup shortcut support on this platform.")
+            return
 
         messagebox.showinfo("Startup Shortcut", 
-                            f"Shortcut to '{os.path.basename(exe_path)}' created successfully in your Startup folder:\n{startup_folder}\n\n"
+                            f"Shortcut to '{os.path.basename(exe_path)}' created successfully:\n{shortcut_path}\n\n"
                             "The app will now run automatically when you log in.")
-        print(f"Startup shortcut created at: {shortcut_path}")
+        LOG.info("Startup shortcut created at: %s", shortcut_path)
 
     except Exception as e:
         messagebox.showerror("Startup Shortcut Error", 
                              f"Failed to create startup shortcut.\n\nError: {e}\n\n"
                              "This feature requires the 'pywin32' library and administrator privileges if trying to install for all users (which this version doesn't do). "
                              "Please ensure the app is run as an executable for this feature to point correctly.")
-        print(f"Error creating startup shortcut: {e}")
+        LOG.error("Error creating startup shortcut: %s", e)
 
 
-def open_settings(icon=None, item=None):
+class SettingsWindow:
     """
-    Opens a Tkinter window allowing the user to configure application settings
-    (start time, notification duration, and interval) and manage startup settings.
-    
+    The Settings window (start time, notification duration and interval, and
+    the startup shortcut). Built once on the UI thread, on its Tk root; closing
+    or saving hides it, and show() brings it back with the current settings.
+
     Args:
-        icon: The pystray Icon object (optional, not directly used in this function).
-        item: The MenuItem object that was clicked (optional, not directly used in this function).
+        root: The UI thread's Tk root window.
     """
-    config = load_config() # Loads current settings
 
-    def save():
+    def __init__(self, root):
+        import tkinter as tk
+
+        self.window = tk.Toplevel(root)
+        self.window.title("Wake Check Settings")
+        self.window.protocol("WM_DELETE_WINDOW", self.window.withdraw) # Closing only hides it
+
+        # Sets the icon for the Tkinter settings window
+        try:
+            if os.path.exists(ICON_PATH):
+                self.window.iconbitmap(ICON_PATH)
+            else:
+                LOG.warning("%s not found for settings window icon.", ICON_PATH)
+        except Exception as e:
+            LOG.warning("Error setting Tkinter icon: %s", e)
+
+        # Creates and places labels and entry fields for settings
+        tk.Label(self.window, text="Start Time (HH:MM 24hr):").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        self.start_time_entry = tk.Entry(self.window)
+        self.start_time_entry.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+
+        tk.Label(self.window, text="Notification Duration (seconds):").grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        self.duration_entry = tk.Entry(self.window)
+        self.duration_entry.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
+
+        tk.Label(self.window, text="Interval After Click (seconds):").grid(row=2, column=0, padx=5, pady=5, sticky="w")
+        self.interval_entry = tk.Entry(self.window)
+        self.interval_entry.grid(row=2, column=1, padx=5, pady=5, sticky="ew")
+
+        tk.Label(self.window, text="Schedule (optional, e.g. Mon-Fri 01:00-05:30):").grid(row=3, column=0, padx=5, pady=5, sticky="w")
+        self.schedule_entry = tk.Entry(self.window)
+        self.schedule_entry.grid(row=3, column=1, padx=5, pady=5, sticky="ew")
+
+        # Save button
+        tk.Button(self.window, text="Save", command=self.save).grid(row=4, columnspan=2, pady=10)
+
+        # Button for creating startup shortcut
+        self.startup_button = tk.Button(self.window, text="Add to Windows Startup", command=create_startup_shortcut)
+        self.startup_button.grid(row=5, columnspan=2, pady=5)
+
+        # Configures columns to expand horizontally with the window
+        self.window.grid_columnconfigure(1, weight=1)
+
+    def show(self):
+        """
+        Fills the fields with the current settings and shows the window on top.
         """
-        Internal function called when the "Save" button in the settings window is clicked.
-        It validates input, saves the settings, and closes the settings window.
+        config = load_config() # Loads current settings
+        for entry, value in ((self.start_time_entry, config["start_time"]),
+                             (self.duration_entry, config["notification_duration"]),
+                             (self.interval_entry, config["notification_interval"]),
+                             (self.schedule_entry, config["schedule"])):
+            entry.delete(0, "end")
+            entry.insert(0, str(value))
+
+        # Disable the startup button until the settings are saved
+        self.startup_button.config(state="disabled")
+
+        self.window.deiconify()
+        self.window.lift()
+        self.window.focus_force()
+
+    def save(self):
         """
+        Called when the "Save" button is clicked. It validates input, saves the
+        settings, and hides the window.
+        """
+        from tkinter import messagebox
+
         try:
             # Validates input formats
-            time.strptime(start_time_entry.get(), "%H:%M") # Checks HH:MM format
-            int(duration_entry.get()) # Checks if it's an integer
-            int(interval_entry.get()) # Checks if it's an integer
+            time.strptime(self.start_time_entry.get(), "%H:%M") # Checks HH:MM format
+            int(self.duration_entry.get()) # Checks if it's an integer
+            int(self.interval_entry.get()) # Checks if it's an integer
+        except ValueError:
+            messagebox.showerror("Error", "Invalid input. Please check time format (HH:MM) and ensure duration/interval are numbers.",
+                                 parent=self.window)
+            return
+
+        try:
+            # The schedule expression is compiled by validate_config() before anything is saved
+            save_config(self.start_time_entry.get(), self.duration_entry.get(), self.interval_entry.get(),
+                        self.schedule_entry.get())
+            messagebox.showinfo("Saved", "Settings saved.", parent=self.window)
 
-            save_config(start_time_entry.get(), duration_entry.get(), interval_entry.get())
-            messagebox.showinfo("Saved", "Settings saved.")
-            
             # Re-enable the startup button after a successful save
-            startup_button.config(state='normal')
+            self.startup_button.config(state="normal")
 
-            settings_window.destroy() # Closes the settings window
-        except ValueError:
-            messagebox.showerror("Error", "Invalid input. Please check time format (HH:MM) and ensure duration/interval are numbers.")
+            self.window.withdraw() # Hides the settings window
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid settings: {e}", parent=self.window)
 
-    # Creates the settings Tkinter window
-    settings_window = tk.Tk()
-    settings_window.title("Wake Check Settings")
 
-    # Sets the icon for the Tkinter settings window
-    try:
-        if os.path.exists(ICON_PATH):
-            settings_window.iconbitmap(ICON_PATH)
-        else:
-            print(f"Warning: {ICON_PATH} not found for settings window icon.")
-    except Exception as e:
-        print(f"Error setting Tkinter icon: {e}")
-
-    # Creates and places labels and entry fields for settings
-    tk.Label(settings_window, text="Start Time (HH:MM 24hr):").grid(row=0, column=0, padx=5, pady=5, sticky="w")
-    start_time_entry = tk.Entry(settings_window)
-    start_time_entry.insert(0, config["start_time"]) # Populate with current setting
-    start_time_entry.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
-
-    tk.Label(settings_window, text="Notification Duration (seconds):").grid(row=1, column=0, padx=5, pady=5, sticky="w")
-    duration_entry = tk.Entry(settings_window)
-    duration_entry.insert(0, str(config["notification_duration"]))
-    duration_entry.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
-
-    tk.Label(settings_window, text="Interval After Click (seconds):").grid(row=2, column=0, padx=5, pady=5, sticky="w")
-    interval_entry = tk.Entry(settings_window)
-    interval_entry.insert(0, str(config["notification_interval"]))
-    interval_entry.grid(row=2, column=1, padx=5, pady=5, sticky="ew")
-
-    # Save button
-    tk.Button(settings_window, text="Save", command=save).grid(row=3, columnspan=2, pady=10)
-    
-    # Button for creating startup shortcut
-    # Assign the button to a variable so we can control its state
-    startup_button = tk.Button(settings_window, text="Add to Windows Startup", command=create_startup_shortcut)
-    startup_button.grid(row=4, columnspan=2, pady=5)
-    
-    # Disable the startup button initially
-    startup_button.config(state='disabled')
+def show_settings(root):
+    """
+    Shows the Settings window, building it on first use. Runs on the UI thread.
 
+    Args:
+        root: The UI thread's Tk root window.
+    """
+    global SETTINGS_WINDOW
 
-    # Configures columns to expand horizontally with the window
-    settings_window.grid_columnconfigure(1, weight=1)
+    if SETTINGS_WINDOW is None:
+        SETTINGS_WINDOW = SettingsWindow(root)
+    SETTINGS_WINDOW.show()
 
-    settings_window.mainloop() # Starts the Tkinter event loop for the settings window
+
+def open_settings(icon=None, item=None):
+    """
+    Opens the Settings window allowing the user to configure application settings
+    (start time, notification duration, interval, and schedule expression) and manage
+    startup settings. The window is shown by the UI thread; this returns at once, so the tray
+    stays responsive while it is open.
+    
+    Args:
+        icon: The pystray Icon object (optional, not directly used in this function).
+        item: The MenuItem object that was clicked (optional, not directly used in this function).
+    """
+    UI.post(show_settings)
 
 
 # ------------------- Run Tray App ------------------- #
 def run_tray():
     """
     Initializes and runs the main application.
-    It starts the `monitor_loop` in a separate thread and then
+    It starts the persistent click listener and the `monitor_loop` in separate threads
+    (or the asyncio core, if enabled in config.json), then
     creates and runs the system tray icon, which provides menu options
     like "I'm Awake", "Settings", and "Exit".
+    With --profile-startup, reports the time each import and step took and exits
+    instead of running the tray.
     """
-    # Starts the monitoring loop in a separate daemon thread.
-    # A daemon thread will automatically terminate when the main program exits.
-    monitor_thread = threading.Thread(target=monitor_loop, daemon=True)
-    monitor_thread.start()
-
-    # Initializes and runs the system tray icon
-    icon = Icon("WakeChecker")
-    icon.icon = create_icon_image() # Set the custom icon image
-    icon.menu = Menu(
-        MenuItem("I'm Awake", on_awake_clicked),  # Menu item to manually confirm awake status
-        MenuItem("Settings", open_settings),      # Menu item to open settings window
-        MenuItem("Exit", on_exit)                 # Menu item to exit the application gracefully
-    )
-    print("Tray icon running.")
-    # Runs the pystray icon
-    icon.run() 
+    global RUNTIME
+
+    # Watches config.json so saved or hand-edited settings apply without a restart
+    with PROFILER.step("config"):
+        CONFIG.start()
+        CONFIG.subscribe(on_config_changed)
+        configure_logging(load_config())
+
+    # Starts the notification worker now, hours before the start time, so the
+    # first toast does not pay for starting it
+    with PROFILER.step("notifier"):
+        BACKENDS.notifier.start()
+
+    if load_config()["runtime"] == "asyncio":
+        # Scheduler, click listener, notifier and logger all run as tasks on one event loop.
+        with PROFILER.step("asyncio runtime"):
+            from async_runtime import AsyncRuntime
+            RUNTIME = AsyncRuntime(load_config, send_notification, log_click_time, escalate,
+                                   acknowledge=FANOUT.acknowledge,
+                                   click_response=CLICK_RESPONSE,
+                                   expired_response=EXPIRED_RESPONSE,
+                                   read_timeout=CONNECTION_READ_TIMEOUT,
+                                   display_timeout=NOTIFICATION_DISPLAY_TIMEOUT,
+                                   wait_for_idle=wait_for_idle,
+                                   before_start=adapt_schedule,
+                                   routes=HISTORY_ROUTES,
+                                   quiet_period=quiet_period,
+                                   log_missed=log_missed_prompt,
+                                   clock=CLOCK)
+            RUNTIME.start()
+    else:
+        # Starts the click listener once; it stays up until the application exits.
+        with PROFILER.step("click listener"):
+            start_click_listener()
+
+        # Starts the monitoring loop in a separate daemon thread.
+        # A daemon thread will automatically terminate when the main program exits.
+        # With profiles, one thread drives all of their schedules instead.
+        with PROFILER.step("monitor thread"):
+            loop = profile_loop if load_config()["profiles"] else monitor_loop
+            monitor_thread = threading.Thread(target=loop, daemon=True)
+            monitor_thread.start()
+
+    # Initializes the system tray icon (pystray, or a stand-in where there is no tray)
+    with PROFILER.step("tray icon"):
+        icon = BACKENDS.tray("WakeChecker", create_icon_image, [
+            ("I'm Awake", on_awake_clicked),  # Menu item to manually confirm awake status
+            ("Settings", open_settings),      # Menu item to open settings window
+            ("Exit", on_exit)                 # Menu item to exit the application gracefully
+        ])
+
+    if PROFILER.enabled:
+        PROFILER.report()
+        on_exit(icon, None)
+    else:
+        LOG.info("Tray icon running.")
+        # Runs the tray icon until Exit
+        icon.run()
+        if not STOP_EVENT.is_set():
+            on_exit(icon, None) # Interrupted without the Exit menu (e.g. Ctrl+C with no tray)
+    if RUNTIME:
+        RUNTIME.join(timeout=5)
+    else:
+        stop_click_listener()
+    close_log_writer() # Flushes any clicks still buffered
+    CONFIG.stop()
+    LOG.info("Application finished.")
+    close_logging() # Last, so every message above reaches log_file and the trace is complete
 
 if __name__ == "__main__":
+    # A windowed (--noconsole) build has no console: sys.stdout and sys.stderr are None.
+    # LOG then writes only to log_file, and anything else that writes to them goes to os.devnull.
+    if sys.stdout is None or sys.stderr is None:
+        LOG.console = False
+        sys.stdout = sys.stdout or open(os.devnull, "w")
+        sys.stderr = sys.stderr or open(os.devnull, "w")
+
     # Ensures global flags are in a clean state when the script starts
-    CLICKED_FLAG = False
-    STOP_FLAG = False
+    STOP_EVENT.clear()
+    WAKE_EVENT.clear()
+    CLICK_EVENT.clear()
     
     # Starts the main application by running the system tray icon setup
-    run_tray()
-    print("Application finished.")
\ No newline at end of file
+    run_tray()
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""
+Local load generator for the fleet supervisor.
+
+Simulates a fleet of agents posting heartbeats, without real machines. By
+default it starts `fleet_supervisor.py --dry-run` as a separate process (so the
+supervisor gets a core of its own), drives it over keep-alive HTTP connections
+and reads its counters back from /status.
+
+A number of "dead" hosts send one heartbeat with a short deadline and then go
+silent; the report shows whether all of them expired and how late.
+
+The spawned supervisor gets a temporary config listing the simulated hosts
+(host-00000..., dead-00000...) and a random token. A supervisor given with
+--url must list those hosts and take the --token given here.
+
+Usage:
+    python fleet_loadgen.py --hosts 10000 --rate 5000 --seconds 10
+    python fleet_loadgen.py --url http://supervisor:8890 --token TOKEN --batch 50
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import secrets
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+
+def percentile(samples, fraction):
+    """
+    Returns the `fraction` percentile (0..1) of `samples`, or 0.0 if empty.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def authorization(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def get_status(address):
+    connection = http.client.HTTPConnection(*address, timeout=10)
+    connection.request("GET", "/status")
+    status = json.loads(connection.getresponse().read())
+    connection.close()
+    return status
+
+
+def wait_for_port(address, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            get_status(address)
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Supervisor did not come up on {address[0]}:{address[1]}")
+
+
+def sender(address, token, hosts, rate, batch, stop_at, latencies, sent):
+    """
+    Sends heartbeats for random hosts at `rate` per second over one keep-alive
+    connection, `batch` heartbeats per request.
+    """
+    connection = http.client.HTTPConnection(*address, timeout=10)
+    headers = {"Content-Type": "application/json", **authorization(token)}
+    request_interval = batch / rate
+    next_send = time.monotonic()
+    count = 0
+    while True:
+        now = time.monotonic()
+        if now >= stop_at:
+            break
+        if now < next_send:
+            time.sleep(next_send - now)
+        next_send += request_interval
+
+        start = time.perf_counter()
+        if batch == 1:
+            connection.request("GET", f"/heartbeat?host={random.choice(hosts)}", headers=headers)
+        else:
+            body = json.dumps([{"host": host} for host in random.choices(hosts, k=batch)])
+            connection.request("POST", "/heartbeat", body=body, headers=headers)
+        connection.getresponse().read()
+        latencies.append(time.perf_counter() - start)
+        count += batch
+    connection.close()
+    sent.append(count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for fleet_supervisor.py")
+    parser.add_argument("--url", help="Existing supervisor to target; by default one is spawned locally")
+    parser.add_argument("--token", help="Shared token of the supervisor given with --url")
+    parser.add_argument("--hosts", type=int, default=10000, help="Number of simulated hosts")
+    parser.add_argument("--rate", type=float, default=5000, help="Target heartbeats per second")
+    parser.add_argument("--seconds", type=float, default=10, help="Test duration")
+    parser.add_argument("--connections", type=int, default=4, help="Concurrent keep-alive connections")
+    parser.add_argument("--batch", type=int, default=1, help="Heartbeats per request (1 = GET per heartbeat)")
+    parser.add_argument("--dead", type=int, default=100, help="Hosts that go silent after one heartbeat")
+    parser.add_argument("--dead-timeout", type=float, default=3, help="Deadline of the dead hosts in seconds")
+    args = parser.parse_args()
+    if args.url and not args.token:
+        parser.error("--url needs the supervisor's --token")
+
+    hosts = [f"host-{i:05d}" for i in range(args.hosts)]
+    dead_hosts = [f"dead-{i:05d}" for i in range(args.dead)]
+    supervisor = None
+    fleet_file = None
+    if args.url:
+        url = urlparse(args.url)
+        address = (url.hostname, url.port or 80)
+        token = args.token
+    else:
+        address = ("127.0.0.1", 8890)
+        token = secrets.token_urlsafe(16)
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as fleet_file:
+            json.dump({"token": token, "hosts": {host: {} for host in hosts + dead_hosts}}, fleet_file)
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fleet_supervisor.py")
+        supervisor = subprocess.Popen([sys.executable, script, "--config", fleet_file.name,
+                                       "--host", address[0], "--port", str(address[1]),
+                                       "--dry-run", "--tick", "0.1"], stdout=subprocess.DEVNULL)
+    try:
+        wait_for_port(address)
+        before = get_status(address)
+
+        # Dead hosts: one heartbeat with a short deadline, then silence
+        connection = http.client.HTTPConnection(*address, timeout=10)
+        dead = [{"host": host, "duration": 0, "interval": args.dead_timeout} for host in dead_hosts]
+        if dead:
+            connection.request("POST", "/heartbeat", body=json.dumps(dead),
+                               headers={"Content-Type": "application/json", **authorization(token)})
+            response = connection.getresponse()
+            response.read()
+            if response.status != 204:
+                raise RuntimeError(f"Supervisor refused the heartbeats: {response.status} {response.reason}")
+        connection.close()
+
+        # Live hosts: a generous default deadline so they never expire during the run
+        latencies, sent, threads = [], [], []
+        start = time.monotonic()
+        stop_at = start + args.seconds
+        for _ in range(args.connections):
+            thread = threading.Thread(target=sender, args=(address, token, hosts, args.rate / args.connections,
+                                                           args.batch, stop_at, latencies, sent))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+
+        time.sleep(max(0.0, args.dead_timeout - elapsed) + 0.5) # Lets the dead hosts expire
+        after = get_status(address)
+    finally:
+        if supervisor:
+            supervisor.terminate()
+            supervisor.wait()
+        if fleet_file:
+            os.unlink(fleet_file.name)
+
+    report = {
+        "hosts": args.hosts,
+        "target_rate": args.rate,
+        "achieved_rate": round(sum(sent) / elapsed, 1),
+        "requests": len(latencies),
+        "batch": args.batch,
+        "latency_p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "dead_hosts": args.dead,
+        "expired": after["expirations"] - before["expirations"],
+        "max_expiry_lateness_s": after["max_lateness"],
+        "supervisor_cpu_seconds": round(after["cpu_seconds"] - before["cpu_seconds"], 3),
+        "armed_hosts": after["armed_hosts"],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""
+Fleet heartbeat supervisor for Deadman's switch.
+
+Instead of every machine deciding on its own to shut down, agents post "awake"
+heartbeats to one supervisor (the same idea as the local '/click' endpoint,
+scaled up). The supervisor keeps one deadline per host in a hashed timer wheel,
+so arming, re-arming and expiring a host are all O(1), and runs the host's
+action when a deadline passes without a heartbeat.
+
+A host's deadline is `notification_interval + notification_duration` after its
+last heartbeat: the next prompt goes out after the interval, and the user then
+has the duration to answer it. A host is only armed once it has sent its first
+heartbeat, and is disarmed after its action ran or when it posts `armed=0`.
+
+Only hosts listed in the config file are accepted, and every heartbeat must
+carry the file's shared `token` as `Authorization: Bearer TOKEN`. A missing or
+wrong token gets 401, an unlisted host 403, and malformed input 400; a batch
+is applied only if every heartbeat in it is valid.
+
+Endpoints:
+    GET  /heartbeat?host=NAME[&duration=S][&interval=S][&armed=0]
+    POST /heartbeat   JSON object with the same keys, or a list of them (batch)
+    GET  /status      JSON counters
+
+Usage:
+    python fleet_supervisor.py --config fleet.json --port 8890 [--dry-run]
+"""
+import argparse
+import hmac
+import json
+import math
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+DEFAULT_HOST_CONFIG = {
+    "notification_duration": 60,
+    "notification_interval": 600,
+    # Command run without a shell when a host expires; "{host}" is replaced by the host name
+    "action": ["shutdown", "/s", "/m", "\\\\{host}", "/t", "15"],
+}
+# Largest heartbeat request body read, in bytes
+MAX_BODY_BYTES = 1 << 20
+
+
+class BadHeartbeat(ValueError):
+    """
+    A heartbeat that is malformed (400) or names a host not in the config (403).
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_seconds(value):
+    """
+    Returns `value` as a finite, non-negative number of seconds, or None if it is None.
+
+    Raises:
+        BadHeartbeat: If it is not one.
+    """
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        raise BadHeartbeat(f"Not a number of seconds: {value!r}")
+    if not math.isfinite(seconds) or seconds < 0:
+        raise BadHeartbeat(f"Not a number of seconds: {value!r}")
+    return seconds
+
+
+def parse_heartbeat(beat):
+    """
+    Validates one heartbeat (a query or a JSON object).
+
+    Returns:
+        tuple: (host, duration, interval, armed), duration and interval None if not given.
+
+    Raises:
+        BadHeartbeat: If the heartbeat is malformed.
+    """
+    if not isinstance(beat, dict) or not isinstance(beat.get("host"), str) or not beat["host"]:
+        raise BadHeartbeat("A heartbeat needs a host name")
+    armed = str(beat.get("armed", "1")).lower() not in ("0", "false")
+    return beat["host"], parse_seconds(beat.get("duration")), parse_seconds(beat.get("interval")), armed
+
+
+# ------------------- Timer Wheel ------------------- #
+class TimerWheel:
+    """
+    Hashed timer wheel. Each key lives in exactly one slot, chosen by its expiry
+    tick modulo the number of slots; a side index maps key -> slot so cancelling
+    or re-arming a key is a pair of dict operations. Advancing one tick only looks
+    at one slot. Deadlines further away than one revolution simply stay in their
+    slot until their tick comes round.
+
+    Args:
+        slots (int): Number of slots (one revolution = slots * tick seconds).
+        tick (float): Resolution in seconds.
+        now (float): Current time in seconds, on the same clock as later calls.
+    """
+
+    def __init__(self, slots=4096, tick=1.0, now=0.0):
+        self.tick = tick
+        self._slots = [{} for _ in range(slots)]
+        self._where = {}
+        self._current = int(now // tick)
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def schedule(self, key, when):
+        """
+        Arms (or re-arms) `key` to expire at time `when`.
+        """
+        self.cancel(key)
+        expiry_tick = max(int(-(-when // self.tick)), self._current + 1)
+        index = expiry_tick % len(self._slots)
+        self._slots[index][key] = expiry_tick
+        self._where[key] = index
+
+    def cancel(self, key):
+        """
+        Disarms `key`. Returns True if it was armed.
+        """
+        index = self._where.pop(key, None)
+        if index is None:
+            return False
+        del self._slots[index][key]
+        return True
+
+    def advance(self, now):
+        """
+        Processes every tick up to `now`.
+
+        Returns:
+            list: (key, expiry time) pairs that expired, in tick order.
+        """
+        expired = []
+        target = int(now // self.tick)
+        while self._current < target:
+            self._current += 1
+            slot = self._slots[self._current % len(self._slots)]
+            if not slot:
+                continue
+            due = [key for key, expiry_tick in slot.items() if expiry_tick <= self._current]
+            for key in due:
+                del slot[key]
+                del self._where[key]
+                expired.append((key, self._current * self.tick))
+        return expired
+
+
+# ------------------- Supervisor ------------------- #
+class FleetSupervisor:
+    """
+    Tracks per-host deadlines and runs each host's action when one passes.
+    Only the hosts in `hosts` are tracked; heartbeats from any other are refused.
+
+    Args:
+        hosts (dict): Per-host overrides of DEFAULT_HOST_CONFIG, keyed by host name
+            ({} for a host that uses the defaults).
+        defaults (dict): Overrides of DEFAULT_HOST_CONFIG for every host.
+        token (str): Shared secret every heartbeat must present; with none set,
+            authorized() refuses every request.
+        on_expire (callable): Called with (host, host_config) for every expired host.
+            Defaults to running the host's action command.
+        tick (float): Timer wheel resolution in seconds.
+        slots (int): Timer wheel size.
+        dry_run (bool): Only print the action instead of running it.
+    """
+
+    def __init__(self, hosts=None, defaults=None, on_expire=None, tick=1.0, slots=4096, dry_run=False,
+                 token=""):
+        self._defaults = {**DEFAULT_HOST_CONFIG, **(defaults or {})}
+        self._host_config = {host: dict(overrides or {}) for host, overrides in (hosts or {}).items()}
+        self._reported = {} # Duration and interval the agents sent, per listed host
+        self._timeouts = {} # Cached interval + duration per host
+        self._token = (token or "").encode("utf-8")
+        self._on_expire = on_expire or self._run_action
+        self._dry_run = dry_run
+        self._lock = threading.Lock()
+        self._wheel = TimerWheel(slots=slots, tick=tick, now=time.monotonic())
+        self._actions = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fleet-action")
+
+        self.heartbeats = 0
+        self.expirations = 0
+        self.max_lateness = 0.0
+
+    def config_for(self, host):
+        """
+        Returns the effective configuration for `host`.
+        """
+        return {**self._defaults, **self._host_config.get(host, {}), **self._reported.get(host, {})}
+
+    def authorized(self, token):
+        """
+        True if `token` is the shared token (compared in constant time).
+        """
+        return bool(self._token) and hmac.compare_digest(self._token, (token or "").encode("utf-8"))
+
+    def check(self, host):
+        """
+        Raises BadHeartbeat (403) unless `host` is listed in the config.
+        """
+        if host not in self._host_config:
+            raise BadHeartbeat(f"Unknown host: {host!r}", status=403)
+
+    def heartbeat(self, host, duration=None, interval=None, armed=True):
+        """
+        Records an "awake" heartbeat from `host` and pushes its deadline back.
+
+        Args:
+            host (str): Host name, one listed in the config.
+            duration (float, optional): Overrides the host's notification_duration.
+            interval (float, optional): Overrides the host's notification_interval.
+            armed (bool): False disarms the host (e.g. the agent is exiting).
+
+        Raises:
+            BadHeartbeat: If the host is not listed or a value is not a number of seconds.
+        """
+        self.check(host)
+        duration, interval = parse_seconds(duration), parse_seconds(interval)
+        now = time.monotonic()
+        with self._lock:
+            if duration is not None or interval is not None:
+                reported = self._reported.setdefault(host, {})
+                if duration is not None:
+                    reported["notification_duration"] = duration
+                if interval is not None:
+                    reported["notification_interval"] = interval
+                self._timeouts.pop(host, None)
+
+            timeout = self._timeouts.get(host)
+            if timeout is None:
+                config = self.config_for(host)
+                timeout = self._timeouts[host] = config["notification_interval"] + config["notification_duration"]
+
+            self.heartbeats += 1
+            if armed:
+                self._wheel.schedule(host, now + timeout)
+            else:
+                self._wheel.cancel(host)
+
+    def advance(self, now=None):
+        """
+        Expires every host whose deadline is at or before `now` and triggers its action.
+
+        Returns:
+            list: Names of the hosts that expired.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            expired = self._wheel.advance(now)
+            self.expirations += len(expired)
+            for _, deadline in expired:
+                self.max_lateness = max(self.max_lateness, now - deadline)
+            configs = [(host, self.config_for(host)) for host, _ in expired]
+        for host, config in configs:
+            self._actions.submit(self._on_expire, host, config)
+        return [host for host, _ in expired]
+
+    def run(self, stop_event):
+        """
+        Advances the wheel once per tick until `stop_event` is set.
+        """
+        tick = self._wheel.tick
+        while not stop_event.wait(tick - (time.monotonic() % tick)):
+            self.advance()
+        self._actions.shutdown(wait=False)
+
+    def status(self):
+        """
+        Returns a dictionary of counters for the /status endpoint.
+        """
+        with self._lock:
+            return {
+                "armed_hosts": len(self._wheel),
+                "known_hosts": len(self._host_config),
+                "heartbeats": self.heartbeats,
+                "expirations": self.expirations,
+                "max_lateness": round(self.max_lateness, 3),
+                "cpu_seconds": round(time.process_time(), 3),
+            }
+
+    def _run_action(self, host, config):
+        command = [part.replace("{host}", host) for part in config["action"]]
+        if self._dry_run:
+            print(f"[dry run] {host} expired: {' '.join(command)}")
+            return
+        try:
+            result = subprocess.run(command, capture_output=True, timeout=60)
+            print(f"{host} expired: {' '.join(command)} exited with {result.returncode}")
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"{host} expired: action failed: {e}")
+
+
+# ------------------- HTTP Endpoint ------------------- #
+class HeartbeatHandler(BaseHTTPRequestHandler):
+    """
+    HTTP front end of the supervisor. Uses HTTP/1.1 keep-alive, so agents and the
+    load generator can reuse connections instead of reconnecting per heartbeat.
+    """
+    protocol_version = "HTTP/1.1"
+    timeout = 30
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/heartbeat":
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            self._apply([query])
+        elif url.path == "/status":
+            self._reply(200, json.dumps(self.server.supervisor.status()).encode("utf-8"), "application/json")
+        else:
+            self._reply(404)
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/heartbeat":
+            self._reply(404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_BODY_BYTES:
+            self.close_connection = True # The body, if any, is left unread
+            self._reply(400 if length < 0 else 413)
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b"null")
+        except ValueError:
+            self._reply(400)
+            return
+        self._apply(payload if isinstance(payload, list) else [payload])
+
+    def _apply(self, beats):
+        """
+        Checks the token and validates every heartbeat, then applies them all
+        and replies 204; replies 401, 403 or 400 (applying none) otherwise.
+        """
+        supervisor = self.server.supervisor
+        authorization = self.headers.get("Authorization", "")
+        if not authorization.startswith("Bearer ") or not supervisor.authorized(authorization[7:]):
+            self._reply(401)
+            return
+        try:
+            parsed = [parse_heartbeat(beat) for beat in beats]
+            for host, _, _, _ in parsed:
+                supervisor.check(host)
+        except BadHeartbeat as e:
+            self._reply(e.status, str(e).encode("utf-8"))
+            return
+        for host, duration, interval, armed in parsed:
+            supervisor.heartbeat(host, duration, interval, armed)
+        self._reply(204)
+
+    def _reply(self, code, body=b"", content_type="text/plain"):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # One line per heartbeat would dominate the supervisor's CPU time
+
+
+def serve(supervisor, host="0.0.0.0", port=8890):
+    """
+    Starts the heartbeat endpoint and the wheel ticker on daemon threads.
+
+    Returns:
+        tuple: (server, stop_event). Set the event and call server.shutdown() to stop.
+    """
+    server = ThreadingHTTPServer((host, port), HeartbeatHandler)
+    server.supervisor = supervisor
+    stop_event = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    threading.Thread(target=supervisor.run, args=(stop_event,), daemon=True).start()
+    return server, stop_event
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deadman's switch fleet heartbeat supervisor")
+    parser.add_argument("--config", required=True,
+                        help="JSON file with the shared 'token', the 'hosts' to track and optional 'defaults'")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8890)
+    parser.add_argument("--tick", type=float, default=1.0, help="Timer wheel resolution in seconds")
+    parser.add_argument("--dry-run", action="store_true", help="Print actions instead of running them")
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        fleet_config = json.load(f)
+    if not isinstance(fleet_config.get("token"), str) or not fleet_config["token"]:
+        parser.error(f"{args.config} must set a shared 'token'")
+    if not fleet_config.get("hosts"):
+        parser.error(f"{args.config} lists no 'hosts'")
+
+    supervisor = FleetSupervisor(hosts=fleet_config["hosts"], defaults=fleet_config.get("defaults"),
+                                 tick=args.tick, dry_run=args.dry_run, token=fleet_config["token"])
+    server, stop_event = serve(supervisor, args.host, args.port)
+    print(f"Fleet supervisor listening on http://{args.host}:{args.port}.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    stop_event.set()
+    server.shutdown()
+    print("Fleet supervisor stopped.")
+
+
+if __name__ == "__main__":
+    main()
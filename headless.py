@@ -0,0 +1,35 @@
+"""
+Loads the Deadman's switch app module (deadman-switch.py) without a desktop.
+
+The module is imported as a regular module and its platform backends are
+replaced by the no-op set (see backends.py), so the real monitor loop, click
+listener, logger and scheduler can be driven on a headless machine by the
+benchmarks and tools in this repository. Notifications, the tray, shortcuts
+and the shutdown action do nothing.
+"""
+import importlib.util
+import os
+import sys
+
+import backends
+
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "deadman-switch.py")
+
+
+def load_app(name="deadman_switch"):
+    """
+    Imports deadman-switch.py with no-op backends. Relative paths (config.json,
+    wake_log.txt) resolve against the current working directory, so chdir to a
+    scratch directory first.
+
+    Returns:
+        module: The loaded application module.
+    """
+    sys.path.insert(0, os.path.dirname(APP_PATH))
+    spec = importlib.util.spec_from_file_location(name, APP_PATH)
+    app = importlib.util.module_from_spec(spec)
+    sys.modules[name] = app
+    spec.loader.exec_module(app)
+    app.BACKENDS = backends.noop_backends()
+    return app
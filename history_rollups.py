@@ -0,0 +1,240 @@
+"""
+Rollups of the click history for the /history dashboard.
+
+Every click and shutdown updates one bucket, the one of the night it happened
+in (a night runs from noon to noon, so 01:30 belongs to the previous evening):
+its click count, clicks by source, a histogram of response latencies and the
+number of shutdowns. That is O(1) per event, so the dashboard never re-reads
+wake_log.txt; the day, week and month views add up at most 30 buckets. Buckets
+older than RETAIN_NIGHTS are dropped.
+
+The rollups are kept in wake_log.rollup.json, next to the log, and written by
+the log writer's thread after each batch of lines (see wake_log.py). When the
+file does not exist yet, they are rebuilt once from the wake store.
+"""
+import bisect
+import html
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import wake_store
+from logger import LOG
+
+
+ROLLUP_PATH = "wake_log.rollup.json"
+RETAIN_NIGHTS = 62
+WINDOWS = (("day", 1), ("week", 7), ("month", 30))
+# Upper bounds of the latency histogram, in seconds (the last bucket is open)
+LATENCY_BOUNDS = (1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120, math.inf)
+
+
+def night_key(timestamp):
+    """
+    Returns the night `timestamp` belongs to, as "YYYY-MM-DD" of its evening.
+    """
+    return (datetime.fromtimestamp(timestamp) - timedelta(hours=12)).date().isoformat()
+
+
+def _empty_night():
+    return {"clicks": 0, "sources": {}, "latency": [0] * len(LATENCY_BOUNDS), "shutdowns": 0}
+
+
+def latency_percentile(counts, fraction):
+    """
+    Estimates a percentile from latency histogram counts, interpolating linearly
+    inside the bucket it falls in (as Prometheus' histogram_quantile does).
+
+    Returns:
+        float: Seconds, or None if the histogram is empty.
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    rank = fraction * total
+    cumulative = 0
+    for index, count in enumerate(counts):
+        if count and cumulative + count >= rank:
+            lower = LATENCY_BOUNDS[index - 1] if index else 0
+            upper = LATENCY_BOUNDS[index]
+            if upper == math.inf:
+                return float(lower)
+            return lower + (upper - lower) * (rank - cumulative) / count
+        cumulative += count
+    return float(LATENCY_BOUNDS[-2])
+
+
+class HistoryRollups:
+    """
+    Per-night click and shutdown rollups. Thread-safe: clicks are added from
+    the click path, saves happen on the log writer's thread.
+
+    Args:
+        path (str): Rollup file.
+        retain_nights (int): Nights kept.
+    """
+
+    def __init__(self, path=ROLLUP_PATH, retain_nights=RETAIN_NIGHTS):
+        self.path = path
+        self.retain_nights = retain_nights
+        self.nights = {} # Night key -> bucket, oldest first
+        self.exists = False
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._span = (0.0, 0.0, None) # Start, end and key of the last night looked up
+        self.load()
+
+    # ---- Updates ---- #
+    def add_click(self, timestamp, source, latency=math.nan):
+        with self._lock:
+            night = self._night(timestamp)
+            night["clicks"] += 1
+            night["sources"][source] = night["sources"].get(source, 0) + 1
+            if not math.isnan(latency):
+                night["latency"][bisect.bisect_left(LATENCY_BOUNDS, latency)] += 1
+            self._dirty = True
+
+    def add_shutdown(self, timestamp):
+        with self._lock:
+            self._night(timestamp)["shutdowns"] += 1
+            self._dirty = True
+
+    def rebuild(self, events):
+        """
+        Replaces the rollups with (timestamp, source, cycle_id, latency) events
+        (e.g. from the wake store), for a first start without a rollup file.
+        Missed prompts are skipped.
+        """
+        with self._lock:
+            self.nights = {}
+        for timestamp, source, _, latency in events:
+            if source != wake_store.MISSED:
+                self.add_click(timestamp, source, latency)
+
+    def _night(self, timestamp):
+        start, end, key = self._span
+        if not start <= timestamp < end:
+            # Clicks come in bursts on the same night: its bounds (noon to noon,
+            # DST included) are worked out once and reused
+            key = night_key(timestamp)
+            evening = datetime.fromisoformat(key)
+            start = (evening + timedelta(hours=12)).timestamp()
+            end = (evening + timedelta(days=1, hours=12)).timestamp()
+            self._span = (start, end, key)
+        night = self.nights.get(key)
+        if night is None:
+            night = self.nights[key] = _empty_night()
+            if len(self.nights) > self.retain_nights:
+                # Keys are ISO dates, so the smallest is the oldest; clocks set back can insert out of order
+                del self.nights[min(self.nights)]
+        return night
+
+    # ---- Persistence ---- #
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if data.get("latency_bounds") != [str(bound) for bound in LATENCY_BOUNDS]:
+                raise ValueError("different latency buckets")
+            self.nights = dict(sorted(data["nights"].items()))
+            self.exists = True
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            LOG.warning("Ignoring %s (%s); the history starts over.", self.path, e)
+
+    def save(self):
+        """
+        Writes the rollups (atomically) if they changed since the last save.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps({"latency_bounds": [str(bound) for bound in LATENCY_BOUNDS],
+                               "nights": self.nights})
+            self._dirty = False
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write(data)
+        os.replace(temp_path, self.path)
+        self.exists = True
+
+    # ---- Views ---- #
+    def summary(self, now=None):
+        """
+        Returns the dashboard data: for the day (the current night), the week and
+        the month windows, the clicks, clicks per night, response latency
+        percentiles, share of clicks by source and shutdowns; and the month's
+        nights one by one.
+        """
+        now = time.time() if now is None else now
+        current = datetime.fromisoformat(night_key(now)).date()
+        keys = [(current - timedelta(days=days_back)).isoformat() for days_back in range(WINDOWS[-1][1])]
+        with self._lock:
+            nights = {key: self.nights[key] for key in keys if key in self.nights}
+            nights = json.loads(json.dumps(nights)) # A copy, taken under the lock
+
+        windows = {}
+        for name, length in WINDOWS:
+            clicks, shutdowns, sources = 0, 0, {}
+            latency = [0] * len(LATENCY_BOUNDS)
+            for key in keys[:length]:
+                night = nights.get(key)
+                if night is None:
+                    continue
+                clicks += night["clicks"]
+                shutdowns += night["shutdowns"]
+                for source, count in night["sources"].items():
+                    sources[source] = sources.get(source, 0) + count
+                latency = [total + count for total, count in zip(latency, night["latency"])]
+            percentiles = {f"p{round(fraction * 100)}": latency_percentile(latency, fraction)
+                           for fraction in (0.5, 0.9, 0.99)}
+            windows[name] = {
+                "nights": length,
+                "clicks": clicks,
+                "clicks_per_night": round(clicks / length, 2),
+                "latency_seconds": {key: None if value is None else round(value, 1)
+                                    for key, value in percentiles.items()},
+                "source_share": {source: round(count / clicks, 3) for source, count in sorted(sources.items())},
+                "shutdowns": shutdowns,
+            }
+        return {
+            "generated": datetime.fromtimestamp(now).isoformat(timespec="seconds"),
+            "windows": windows,
+            "nights": [{"night": key, "clicks": nights.get(key, {}).get("clicks", 0),
+                        "shutdowns": nights.get(key, {}).get("shutdowns", 0)} for key in reversed(keys)],
+        }
+
+
+def render_html(summary):
+    """
+    Renders summary() as a small self-contained HTML page.
+    """
+    def cell(value):
+        return "-" if value is None else html.escape(str(value))
+
+    rows = []
+    for name, window in summary["windows"].items():
+        latency = window["latency_seconds"]
+        share = ", ".join(f"{source} {fraction:.0%}" for source, fraction in window["source_share"].items())
+        rows.append(f"<tr><th>{name.capitalize()}</th><td>{window['clicks']}</td>"
+                    f"<td>{window['clicks_per_night']}</td><td>{cell(latency['p50'])}</td>"
+                    f"<td>{cell(latency['p90'])}</td><td>{cell(latency['p99'])}</td>"
+                    f"<td>{cell(share) if share else '-'}</td><td>{window['shutdowns']}</td></tr>")
+    most = max([night["clicks"] for night in summary["nights"]] + [1])
+    bars = "".join(
+        f"<tr><td>{night['night']}</td><td><div class=\"bar\" style=\"width:{200 * night['clicks'] // most}px\">"
+        f"</div> {night['clicks']}</td><td>{'shutdown' * bool(night['shutdowns'])}</td></tr>"
+        for night in summary["nights"])
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Deadman's Switch history</title>
+<style>body{{font-family:sans-serif;margin:2em}}td,th{{padding:2px 10px;text-align:left}}
+.bar{{display:inline-block;height:10px;background:#4a7}}</style></head>
+<body><h1>Wake history</h1><p>As of {summary['generated']}. Also as JSON: <a href="/history.json">/history.json</a></p>
+<table><tr><th></th><th>Clicks</th><th>Per night</th><th>Latency p50 (s)</th><th>p90</th><th>p99</th>
+<th>Sources</th><th>Shutdowns</th></tr>{''.join(rows)}</table>
+<h2>Clicks per night</h2><table>{bars}</table></body></html>
+"""
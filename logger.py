@@ -0,0 +1,104 @@
+"""
+Leveled, structured logging for Deadman's switch.
+
+The app has one code path for console and windowed (--noconsole) builds:
+every message goes through LOG, which writes it to the console when there is
+one and to `log_file` when that is set. Calls take a %-style message and its
+arguments, plus optional key=value fields:
+
+    LOG.info("Logged: %s", line, source=source, cycle=cycle_id)
+
+Arguments are only formatted for an enabled level. A disabled level's method
+is swapped for a function that does nothing, so a debug call in the click path
+costs one empty call while log_level is "info".
+
+Console lines are the message alone, as the app always printed them. File
+lines carry the time, the level and the fields:
+
+    [2026-01-02 02:00:00] INFO Logged: ... source=notification cycle=1767315600
+"""
+import functools
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+LEVELS = ("debug", "info", "warning", "error", "off")
+DEFAULT_LEVEL = "info"
+
+
+def _disabled(message, *args, **fields):
+    pass
+
+
+def format_fields(fields):
+    """
+    Formats fields as " key=value" pairs; values with spaces or quotes are JSON-quoted.
+    """
+    parts = []
+    for key, value in fields.items():
+        text = str(value)
+        if not text or any(character in text for character in ' "='):
+            text = json.dumps(text)
+        parts.append(f" {key}={text}")
+    return "".join(parts)
+
+
+class Logger:
+    """
+    Writes messages of the enabled levels to the console and, optionally, a
+    rotating file (a WakeLogWriter, so the disk I/O happens on its thread).
+
+    Args:
+        level (str): Lowest level written, one of LEVELS ("off" writes nothing).
+        console (bool): Writes to sys.stdout (looked up on each call, so it can be
+            redirected); False for a windowed build, which has none.
+        writer (WakeLogWriter, optional): Receives the file lines.
+    """
+
+    def __init__(self, level=DEFAULT_LEVEL, console=True, writer=None):
+        self.level = level
+        self.console = console
+        self.writer = writer
+        self._lock = threading.Lock()
+        self.configure(level, writer)
+
+    def configure(self, level, writer=None):
+        """
+        Sets the level and the file writer, and rebinds the level methods
+        (debug(), info(), warning() and error()) to match.
+        """
+        if level not in LEVELS:
+            raise ValueError(f"Unknown log level: {level!r}")
+        self.level = level
+        self.writer = writer
+        threshold = LEVELS.index(level)
+        for index, name in enumerate(LEVELS[:-1]):
+            enabled = index >= threshold and (self.console or writer is not None)
+            setattr(self, name, functools.partial(self._emit, name) if enabled else _disabled)
+
+    def enabled(self, level):
+        """
+        True if messages of `level` are written, for callers that would do work
+        just to build one.
+        """
+        return getattr(self, level) is not _disabled
+
+    def _emit(self, level, message, *args, **fields):
+        if args:
+            message = message % args
+        if self.console:
+            stream = sys.stdout
+            if stream is not None:
+                with self._lock:
+                    stream.write(message + "\n")
+        writer = self.writer
+        if writer is not None:
+            timestamp = datetime.fromtimestamp(time.time()).strftime("%Y-%m-%d %H:%M:%S")
+            writer.write(f"[{timestamp}] {level.upper()} {message}{format_fields(fields)}\n")
+
+
+# The application's logger; configured from config.json by the app (log_level, log_file)
+LOG = Logger()
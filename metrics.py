@@ -0,0 +1,233 @@
+"""
+Minimal Prometheus-style metrics for Deadman's switch.
+
+Counters, gauges and histograms are plain objects updated in place; each one
+holds a single uncontended lock for the few nanoseconds an update takes, so
+they are safe to touch on the click path. `REGISTRY.render()` produces the
+text exposition format served at '/metrics'.
+
+The application's own metrics are defined at the bottom of this module, so the
+threaded loop, the asyncio runtime and the HTTP handlers all update the same ones.
+"""
+import bisect
+import math
+import threading
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        if not self.labelnames:
+            self._values[()] = self._initial()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _initial(self):
+        return 0.0
+
+    def _key(self, labels):
+        if tuple(sorted(labels)) != tuple(sorted(self.labelnames)):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count.
+    """
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down.
+    """
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0.0)
+
+
+class StateGauge(Gauge):
+    """
+    Enum-style gauge: one series per state, 1 for the current state and 0 for the others.
+    """
+
+    def __init__(self, name, documentation, states, registry=None):
+        self.states = tuple(states)
+        super().__init__(name, documentation, ("state",), registry)
+        for state in self.states:
+            self._values[(state,)] = 0.0
+
+    def set_state(self, current):
+        if current not in self.states:
+            raise ValueError(f"Unknown state for {self.name}: {current!r}")
+        with self._lock:
+            for state in self.states:
+                self._values[(state,)] = 1.0 if state == current else 0.0
+
+    def current(self):
+        for (state,), value in self._values.items():
+            if value:
+                return state
+        return None
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observations over fixed, cumulative buckets.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets, labelnames=(), registry=None):
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _initial(self):
+        return [[0] * len(self.buckets), 0.0] # Per-bucket counts, sum
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = self._initial()
+            state[0][index] += 1
+            state[1] += value
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return sum(state[0]) if state else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Collection of metrics rendered together.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def render(self):
+        """
+        Returns all metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ------------------- Application Metrics ------------------- #
+CYCLES = Counter("deadman_cycles_total", "Notification cycles started.")
+CLICKS = Counter("deadman_clicks_total", "'I'm Awake' confirmations by source.", ("source",))
+SHUTDOWNS = Counter("deadman_shutdowns_total", "Shutdowns initiated after an unanswered notification.")
+MISSED_STARTS = Counter("deadman_missed_starts_total",
+                        "Start times skipped to the next day because they were reached too late (catch-up policy).")
+ESCALATION_STAGES = Counter("deadman_escalation_stages_total",
+                            "Escalation stages run after an unanswered notification, by action and result "
+                            "(ok, failed or dry_run).", ("action", "result"))
+ESCALATIONS_CANCELLED = Counter("deadman_escalations_cancelled_total",
+                                "Escalations stopped by a late click (or Exit) during a stage delay.")
+SERVER_ERRORS = Counter("deadman_server_errors_total", "Click listener errors (e.g. port 8888 in use).", ("kind",))
+
+NEXT_DEADLINE = Gauge("deadman_next_deadline_timestamp_seconds",
+                      "Unix time of the next scheduled event (start time, click deadline or next notification).")
+STATE = StateGauge("deadman_state", "Current monitor state.",
+                   ("waiting_for_start", "awaiting_idle", "quiet", "awaiting_click", "sleeping", "shutting_down",
+                    "stopped", "profiles"))
+
+NOTIFICATION_ERRORS = Counter("deadman_notification_errors_total", "Notifications that failed to show.")
+PROMPTS_NOT_SHOWN = Counter("deadman_prompts_not_shown_total",
+                            "Cycles whose prompt never showed, so no escalation followed.")
+NOTIFICATION_DISPATCH = Histogram("deadman_notification_dispatch_seconds",
+                                  "Time from queuing a notification to its confirmed display.",
+                                  (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30))
+CHANNEL_SEND = Histogram("deadman_channel_send_seconds", "Time each prompt channel took to deliver the prompt.",
+                         (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30), ("channel",))
+CHANNEL_ERRORS = Counter("deadman_channel_errors_total", "Prompts a channel failed to deliver.", ("channel",))
+CHANNEL_RESPONSE = Histogram("deadman_channel_response_seconds",
+                             "Time from a channel's delivery to the first response, by the channel it came through.",
+                             (0.5, 1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120), ("channel",))
+PRESENCE_SAMPLE = Histogram("deadman_presence_sample_seconds",
+                            "Time each read of the input-idle time took (the count is the number of wake-ups).",
+                            (0.00001, 0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5))
+IMPLICIT_AWAKES = Counter("deadman_implicit_awakes_total",
+                          "Prompts held back because of recent input, counted again every notification_interval.")
+QUIET_PERIODS = Counter("deadman_quiet_periods_total",
+                        "Quiet periods from the calendar files that held notifications back.")
+RESPONSE_LATENCY = Histogram("deadman_response_latency_seconds", "Time from notification to 'I'm Awake' click.",
+                             (0.5, 1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120))
+WAKEUP_JITTER = Histogram("deadman_scheduler_jitter_seconds",
+                          "How late a scheduled wake-up happened compared to its deadline.",
+                          (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30, 60, 300, 900), ("wait",))
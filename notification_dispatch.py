@@ -0,0 +1,140 @@
+"""
+Asynchronous notification delivery for Deadman's switch.
+
+Showing a toast can take a while (on Windows, winotify starts PowerShell), so
+monitor_loop does not show it itself: it queues the job with a
+NotificationDispatcher, whose worker thread shows it and reports back through
+a completion callback. Each Dispatch records when it was queued and when the
+notification was confirmed on screen, so the response window can start at the
+confirmed display, and the dispatch latency can be measured.
+"""
+import queue
+import threading
+import time
+
+
+class Dispatch:
+    """
+    One queued notification.
+
+    Attributes:
+        submitted_at (float): When it was queued.
+        displayed_at (float): When show() returned (None until then, or on failure).
+        error (Exception): Raised by show(), if it failed.
+        cancelled (bool): True if the dispatcher stopped before it was shown.
+        done (threading.Event): Set once it was shown, failed or was cancelled.
+    """
+
+    def __init__(self, show, on_done, submitted_at):
+        self.show = show
+        self.on_done = on_done
+        self.submitted_at = submitted_at
+        self.displayed_at = None
+        self.error = None
+        self.cancelled = False
+        self.done = threading.Event()
+
+    @property
+    def latency(self):
+        """
+        Seconds from queuing to confirmed display, or None if it was not displayed.
+        """
+        if self.displayed_at is None:
+            return None
+        return self.displayed_at - self.submitted_at
+
+
+class NotificationDispatcher:
+    """
+    Shows notifications on a single worker thread, in submission order.
+
+    Args:
+        clock (optional): Time source with a time() method (see clock.py);
+            defaults to the system clock.
+        inline (bool): Runs each job inside submit() instead of on the worker
+            thread (used with a virtual clock, where everything is single-threaded).
+    """
+
+    def __init__(self, clock=None, inline=False):
+        self._time = clock.time if clock else time.time
+        self.inline = inline
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.RLock()
+        self._stopped = False
+        self._current = None
+
+    def submit(self, show, on_done=None):
+        """
+        Queues `show()` and returns at once.
+
+        Args:
+            show (callable): Displays the notification; returns once it is on screen.
+            on_done (callable, optional): Called with the Dispatch when it is done
+                (on the worker thread).
+
+        Returns:
+            Dispatch: Handle to wait on (`dispatch.done`) and inspect.
+        """
+        dispatch = Dispatch(show, on_done, self._time())
+        if self.inline:
+            self._deliver(dispatch)
+            return dispatch
+        with self._lock:
+            if self._stopped:
+                self._finish(dispatch, cancelled=True)
+                return dispatch
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="NotificationDispatcher", daemon=True)
+                self._thread.start()
+            self._queue.put(dispatch)
+        return dispatch
+
+    def stop(self):
+        """
+        Cancels the notifications still queued and stops the worker. One being
+        shown right now is marked cancelled at once (so nobody keeps waiting on
+        it), though its show() call is left to return on its own.
+        """
+        with self._lock:
+            self._stopped = True
+            self._queue.put(None)
+            if self._current is not None:
+                self._finish(self._current, cancelled=True)
+
+    def _run(self):
+        while True:
+            dispatch = self._queue.get()
+            if dispatch is None:
+                break
+            if self._stopped:
+                self._finish(dispatch, cancelled=True)
+            else:
+                self._deliver(dispatch)
+        # Anything queued after the stop marker
+        while not self._queue.empty():
+            dispatch = self._queue.get_nowait()
+            if dispatch is not None:
+                self._finish(dispatch, cancelled=True)
+
+    def _deliver(self, dispatch):
+        self._current = dispatch
+        try:
+            dispatch.show()
+            displayed_at, error = self._time(), None
+        except Exception as e:
+            displayed_at, error = None, e
+        with self._lock:
+            self._current = None
+            if not dispatch.done.is_set():
+                dispatch.displayed_at, dispatch.error = displayed_at, error
+                self._finish(dispatch)
+
+    def _finish(self, dispatch, cancelled=False):
+        with self._lock:
+            if dispatch.done.is_set():
+                return
+            dispatch.cancelled = cancelled
+            dispatch.done.set()
+        if dispatch.on_done:
+            dispatch.on_done(dispatch)
@@ -0,0 +1,255 @@
+"""
+Persistent notification worker for Deadman's switch.
+
+winotify starts a new PowerShell process for every toast, which costs hundreds
+of milliseconds and tens of MB each cycle. Instead, one worker process is
+started with the application (well before the start time) and kept running; it
+loads the toast runtime once and shows each toast it is sent over its stdin.
+
+Protocol: one JSON object per line, in both directions (ASCII, "\\n" ended).
+    worker  -> {"ready": true}                            once, after startup
+    client  -> {"id": 1, "title": "...", "message": "...",
+                "button_label": "...", "button_url": "..."}
+    worker  -> {"id": 1, "ok": true}                      once the toast is shown
+               {"id": 1, "ok": false, "error": "..."}     if it could not be
+The worker exits when its stdin is closed.
+
+On Windows the worker is a PowerShell process (see powershell_command()), so the
+frozen executable needs no Python to run it. This module is also a stand-in
+worker speaking the same protocol, for Linux and for benchmarks and tests:
+    python notifier_worker.py [--show notify-send|print|none] [--delay SECONDS]
+"""
+import argparse
+import base64
+import json
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+
+SHOW_TIMEOUT = 10 # Seconds to wait for the worker to confirm a toast
+
+WINDOWS_WORKER_SCRIPT = r"""
+$ErrorActionPreference = 'Stop'
+$appId = '__APP_ID__'
+[Console]::OutputEncoding = [Text.Encoding]::UTF8
+# Registers the app id so toasts show the application's name
+$key = "HKCU:\Software\Classes\AppUserModelId\$appId"
+if (-not (Test-Path $key)) { New-Item -Path $key -Force | Out-Null }
+Set-ItemProperty -Path $key -Name DisplayName -Value $appId
+[Windows.UI.Notifications.ToastNotificationManager, Windows.UI.Notifications, ContentType = WindowsRuntime] | Out-Null
+[Windows.Data.Xml.Dom.XmlDocument, Windows.Data.Xml.Dom.XmlDocument, ContentType = WindowsRuntime] | Out-Null
+$notifier = [Windows.UI.Notifications.ToastNotificationManager]::CreateToastNotifier($appId)
+$template = '<toast duration="long"><visual><binding template="ToastGeneric"><text>{0}</text><text>{1}</text></binding></visual>' +
+            '<actions><action content="{2}" activationType="protocol" arguments="{3}"/></actions>' +
+            '<audio src="ms-winsoundevent:Notification.Default" loop="false"/></toast>'
+function Escape($text) { [Security.SecurityElement]::Escape([string]$text) }
+[Console]::Out.WriteLine('{"ready": true}')
+[Console]::Out.Flush()
+while ($null -ne ($line = [Console]::In.ReadLine())) {
+    $request = $null
+    try {
+        $request = $line | ConvertFrom-Json
+        $xml = New-Object Windows.Data.Xml.Dom.XmlDocument
+        $xml.LoadXml(($template -f (Escape $request.title), (Escape $request.message),
+                                   (Escape $request.button_label), (Escape $request.button_url)))
+        $notifier.Show([Windows.UI.Notifications.ToastNotification]::new($xml))
+        $reply = @{ id = $request.id; ok = $true }
+    } catch {
+        $reply = @{ id = $request.id; ok = $false; error = $_.Exception.Message }
+    }
+    [Console]::Out.WriteLine(($reply | ConvertTo-Json -Compress))
+    [Console]::Out.Flush()
+}
+"""
+
+
+def powershell_command(app_id):
+    """
+    Returns the command line of the Windows worker (PowerShell, script passed
+    encoded so no quoting is involved), or None if PowerShell is not found.
+    """
+    powershell = shutil.which("powershell") or shutil.which("pwsh")
+    if powershell is None:
+        return None
+    script = WINDOWS_WORKER_SCRIPT.replace("__APP_ID__", app_id.replace("'", "''"))
+    encoded = base64.b64encode(script.encode("utf-16-le")).decode("ascii")
+    return [powershell, "-NoProfile", "-NonInteractive", "-ExecutionPolicy", "Bypass",
+            "-EncodedCommand", encoded]
+
+
+def standin_command(show="notify-send", delay=0.0):
+    """
+    Returns the command line of the stand-in worker (this module), run by the
+    current interpreter.
+    """
+    return [sys.executable, "-u", os.path.abspath(__file__), "--show", show, "--delay", str(delay)]
+
+
+# ------------------- Client ------------------- #
+class WorkerNotifier:
+    """
+    Notifier backend that sends toasts to a long-lived worker process.
+
+    The worker is started by start() (or by the first show()), restarted if it
+    has exited, and stopped by stop(). show() returns once the worker confirmed
+    the toast, and raises if it reported an error or did not answer in time.
+
+    Args:
+        command (list): Command line of the worker.
+        timeout (float): Seconds to wait for each confirmation.
+    """
+
+    def __init__(self, command, timeout=SHOW_TIMEOUT):
+        self.command = command
+        self.timeout = timeout
+        self.starts = 0 # Number of worker processes started
+        self._process = None
+        self._replies = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts the worker if it is not running. Returns without waiting for it
+        to be ready.
+        """
+        with self._lock:
+            self._start()
+
+    def _start(self):
+        if self._process is not None and self._process.poll() is None:
+            return
+        creationflags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+        process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL, text=True, encoding="ascii",
+                                   errors="replace", bufsize=1, creationflags=creationflags)
+        replies = queue.Queue()
+        threading.Thread(target=self._read_replies, args=(process, replies),
+                         name="NotifierWorkerReader", daemon=True).start()
+        self._process, self._replies = process, replies
+        self.starts += 1
+
+    @staticmethod
+    def _read_replies(process, replies):
+        for line in process.stdout:
+            try:
+                replies.put(json.loads(line))
+            except ValueError:
+                pass # Stray output (e.g. a PowerShell warning)
+        replies.put(None) # The worker exited
+
+    def show(self, title, message, button_label, button_url):
+        with self._lock:
+            self._start()
+            self._next_id += 1
+            request_id = self._next_id
+            request = json.dumps({"id": request_id, "title": title, "message": message,
+                                  "button_label": button_label, "button_url": button_url})
+            try:
+                self._process.stdin.write(request + "\n")
+                self._process.stdin.flush()
+            except OSError:
+                # The worker died since the last toast; one restart, then give up
+                self._kill()
+                self._start()
+                self._process.stdin.write(request + "\n")
+                self._process.stdin.flush()
+
+            deadline = time.monotonic() + self.timeout
+            while True:
+                try:
+                    reply = self._replies.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    self._kill() # Hung; the next toast starts a fresh worker
+                    raise TimeoutError(f"Notification worker did not confirm within {self.timeout} seconds")
+                if reply is None:
+                    self._kill()
+                    raise RuntimeError("Notification worker exited")
+                if reply.get("id") != request_id:
+                    continue # The ready line, or a late answer to a request that timed out
+                if not reply.get("ok"):
+                    raise RuntimeError(f"Notification worker failed: {reply.get('error')}")
+                return
+
+    def stop(self):
+        """
+        Closes the worker's stdin so it exits, and kills it if it does not (or
+        at once if it is busy with a toast, which then fails).
+        """
+        process = self._process
+        if process is None:
+            return
+        if self._lock.locked():
+            process.kill()
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+
+    def _kill(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+        self._process = None
+
+
+# ------------------- Stand-in Worker ------------------- #
+def notify_send(title, message, button_label, button_url):
+    subprocess.run(["notify-send", "--urgency=critical", title, f"{message}\n{button_label}: {button_url}"],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def serve(show, infile=sys.stdin, outfile=sys.stdout):
+    """
+    Runs the worker side of the protocol: shows each request with `show` and
+    answers it, until `infile` is closed.
+    """
+    def send(reply):
+        outfile.write(json.dumps(reply) + "\n")
+        outfile.flush()
+
+    send({"ready": True})
+    for line in infile:
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request["id"]
+            show(request["title"], request["message"], request["button_label"], request["button_url"])
+            send({"id": request_id, "ok": True})
+        except Exception as e:
+            send({"id": request_id, "ok": False, "error": str(e)})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stand-in notification worker (see notifier_worker.py).")
+    parser.add_argument("--show", choices=["notify-send", "print", "none"], default="notify-send",
+                        help="How toasts are shown (default: notify-send).")
+    parser.add_argument("--delay", type=float, default=0.0,
+                        help="Seconds each toast takes to show (to model a slow desktop).")
+    args = parser.parse_args(argv)
+    if args.show == "notify-send" and shutil.which("notify-send") is None:
+        args.show = "print"
+
+    display = {
+        "notify-send": notify_send,
+        "print": lambda title, message, button_label, button_url:
+            print(f"{title} {message} {button_label}: {button_url}", file=sys.stderr),
+        "none": lambda *fields: None,
+    }[args.show]
+
+    def show(*fields):
+        if args.delay:
+            time.sleep(args.delay)
+        display(*fields)
+
+    serve(show)
+
+
+if __name__ == "__main__":
+    main()
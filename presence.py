@@ -0,0 +1,196 @@
+"""
+Input-idle presence sampling for Deadman's switch.
+
+If the user typed or moved the mouse a moment ago they are clearly awake, so
+the "Are you awake?" prompt is held back until the input has been idle for
+`idle_threshold` seconds; the recent input counts as an implicit "awake".
+
+The idle time comes from an idle source:
+    WindowsIdleSource   GetLastInputInfo (the default on Windows)
+    CommandIdleSource   a command printing the idle time in milliseconds, such
+                        as xprintidle (the default on Linux when it is installed)
+    FileIdleSource      the age of a file that an input hook touches
+    NoIdleSource        idle time unknown: prompts are never held back
+
+The sampler reads it adaptively: after a sample showing `idle` seconds of
+idle time, the threshold cannot be reached for another `threshold - idle`
+seconds, so it sleeps that long. Recent input means a long sleep, and samples
+come closer together only as the idle time nears the threshold. Each sample's
+cost is recorded in metrics.PRESENCE_SAMPLE (its count is the number of
+wake-ups).
+"""
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import metrics
+
+
+MIN_INTERVAL = 1.0 # Shortest gap between two samples, in seconds
+
+
+# ------------------- Idle Sources ------------------- #
+class WindowsIdleSource:
+    """
+    Time since the last keyboard or mouse input of the session, from
+    GetLastInputInfo. ctypes is set up on the first sample.
+    """
+
+    def __init__(self):
+        self._info = None
+
+    def idle_seconds(self):
+        if self._info is None:
+            import ctypes
+            from ctypes import wintypes
+
+            class LASTINPUTINFO(ctypes.Structure):
+                _fields_ = [("cbSize", wintypes.UINT), ("dwTime", wintypes.DWORD)]
+
+            self._user32 = ctypes.windll.user32
+            self._kernel32 = ctypes.windll.kernel32
+            self._info = LASTINPUTINFO(cbSize=ctypes.sizeof(LASTINPUTINFO))
+        if not self._user32.GetLastInputInfo(self._info):
+            return None
+        # Both are 32-bit millisecond tick counts, which wrap after 49.7 days
+        return ((self._kernel32.GetTickCount() - self._info.dwTime) & 0xFFFFFFFF) / 1000
+
+
+class CommandIdleSource:
+    """
+    Runs `command` (an argument list, no shell), which prints the idle time in
+    milliseconds, as xprintidle does.
+    """
+
+    def __init__(self, command):
+        self.command = command
+
+    def idle_seconds(self):
+        try:
+            result = subprocess.run(self.command, capture_output=True, text=True, timeout=5)
+            return int(result.stdout.strip()) / 1000 if result.returncode == 0 else None
+        except (OSError, subprocess.TimeoutExpired, ValueError):
+            return None
+
+
+class FileIdleSource:
+    """
+    Seconds since `path` was last modified; an input hook touches it on every
+    input. Unknown while the file does not exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def idle_seconds(self):
+        try:
+            return max(time.time() - os.stat(self.path).st_mtime, 0.0)
+        except OSError:
+            return None
+
+
+class NoIdleSource:
+    def idle_seconds(self):
+        return None
+
+
+def default_source():
+    """
+    Picks the idle source for the current platform.
+    """
+    if sys.platform == "win32":
+        return WindowsIdleSource()
+    if shutil.which("xprintidle") and os.environ.get("DISPLAY"):
+        return CommandIdleSource(["xprintidle"])
+    return NoIdleSource()
+
+
+def make_source(spec):
+    """
+    Builds the idle source named by the `presence_source` setting.
+
+    Args:
+        spec (str): "" (the platform's default), "none", "xprintidle",
+            "file:PATH" or "command:COMMAND LINE".
+
+    Raises:
+        ValueError: If `spec` is none of these.
+    """
+    kind, _, argument = spec.partition(":")
+    if spec == "":
+        return default_source()
+    if spec == "none":
+        return NoIdleSource()
+    if spec == "xprintidle":
+        return CommandIdleSource(["xprintidle"])
+    if kind == "file" and argument:
+        return FileIdleSource(argument)
+    if kind == "command" and argument:
+        import shlex
+        return CommandIdleSource(shlex.split(argument))
+    raise ValueError(f"presence_source must be '', 'none', 'xprintidle', 'file:PATH' or 'command:COMMAND', got '{spec}'")
+
+
+# ------------------- Sampler ------------------- #
+class PresenceSampler:
+    """
+    Samples an idle source as rarely as the threshold allows.
+
+    Args:
+        min_interval (float): Shortest gap between two samples.
+    """
+
+    def __init__(self, min_interval=MIN_INTERVAL):
+        self.min_interval = min_interval
+
+    def sample(self, source):
+        """
+        Reads the idle time once and records what the read cost.
+
+        Returns:
+            float: Seconds since the last input, or None if unknown.
+        """
+        began = time.perf_counter()
+        idle = source.idle_seconds()
+        metrics.PRESENCE_SAMPLE.observe(time.perf_counter() - began)
+        return idle
+
+    def next_delay(self, idle, threshold):
+        """
+        Returns the seconds to sleep before the next sample: the soonest the
+        idle time can reach `threshold`, but at least min_interval.
+        """
+        return max(threshold - idle, self.min_interval)
+
+    def wait_until_idle(self, source, threshold, cancel_event, clock, on_active=None, active_every=None):
+        """
+        Blocks until the input has been idle for `threshold` seconds.
+
+        Args:
+            source: Idle source (see above).
+            threshold (float): Idle seconds needed.
+            cancel_event (threading.Event): Ends the wait early when set.
+            clock: Time source whose wait(event, timeout) does the sleeps (see clock.py).
+            on_active (callable, optional): Called with the idle time when a
+                sample finds recent input: on the first such sample, then at
+                most once every `active_every` seconds.
+            active_every (float, optional): See `on_active`; None calls it only once.
+
+        Returns:
+            bool: True once idle long enough (at once if the idle time is
+                unknown), False if `cancel_event` was set.
+        """
+        reported_at = None
+        while True:
+            idle = self.sample(source)
+            if idle is None or idle >= threshold:
+                return True
+            now = clock.monotonic()
+            if on_active and (reported_at is None
+                              or (active_every is not None and now - reported_at >= active_every)):
+                reported_at = now
+                on_active(idle)
+            if clock.wait(cancel_event, self.next_delay(idle, threshold)):
+                return False
@@ -0,0 +1,423 @@
+"""
+Multi-profile mode for Deadman's switch: one process monitoring several users
+of a shared workstation or terminal server, each with their own schedule.
+
+Profiles are listed in config.json; each may override the schedule, timing,
+escalation and channel settings, and takes the rest from the top level:
+
+    "profiles": [
+        {"name": "alice", "start_time": "01:00", "notification_interval": 900,
+         "channels": {"email": {"to": "alice@example.com"}}},
+        {"name": "bob", "schedule": "Mon-Fri 23:30-06:00",
+         "escalation": [{"action": "lock", "delay": 0}]}
+    ]
+
+The profiles live in a ProfileTable, one row per profile with its timing in
+typed arrays. One ProfileScheduler thread drives every profile's deadlines
+(window start, response deadline, next prompt) from a single heap, sleeping
+until the earliest; prompts and escalations run on two fixed pools of workers,
+so escalations waiting out their stage delays never hold a prompt back. A
+prompt's response deadline starts once it has been sent. Each prompt gets a
+fresh token, and its link (/click?profile=<token>) goes to the one click
+listener, which hands it to acknowledge(). The thread count is the same for 2
+or 2000 profiles.
+
+The escalation actions act on the whole machine, so on a shared one give each
+profile a ladder that only affects its user (e.g. "lock").
+"""
+import array
+import base64
+import heapq
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qs, urlencode
+
+import actions
+import channels
+import scheduler
+from clock import RealClock
+from logger import LOG
+
+
+# Settings a profile may override; the others always come from the top level
+PROFILE_KEYS = ("name", "start_time", "schedule", "notification_duration", "notification_interval",
+                "escalation", "action_dry_run", "channels")
+MAX_WORKERS = 4 # Prompts, and escalations, running at once whatever the number of profiles
+TOKEN_BYTES = 8
+
+# Profile states
+OFF = 0        # Removed from config.json, or monitoring ended
+WAITING = 1    # Waiting for the next window of its schedule
+AWAITING = 2   # Prompted, waiting for a response until its deadline (set once the prompt is sent)
+ESCALATING = 3 # The escalation ladder is running (on a worker)
+SLEEPING = 4   # Answered, waiting out notification_interval
+STATE_NAMES = ("off", "waiting", "awaiting_click", "escalating", "sleeping")
+
+
+def parse_profile_query(query):
+    """
+    Reads the profile prompt token from a /click query string.
+
+    Returns:
+        str: The token, or None for a click without one.
+    """
+    return parse_qs(query).get("profile", [None])[0]
+
+
+def profile_link(click_url, token):
+    """
+    Returns the click link of a profile's prompt.
+    """
+    return f"{click_url}?{urlencode({'profile': token})}"
+
+
+def validate_profiles(profiles, defaults):
+    """
+    Checks the "profiles" setting against the top-level settings it falls back on.
+
+    Raises:
+        ValueError: If `profiles` is not a list of objects with unique names and
+            valid overrides.
+    """
+    if not isinstance(profiles, list):
+        raise ValueError("profiles must be a list")
+    names = set()
+    for profile in profiles:
+        if not isinstance(profile, dict) or not isinstance(profile.get("name"), str) or not profile["name"]:
+            raise ValueError("each profile needs a name")
+        if profile["name"] in names:
+            raise ValueError(f"profile '{profile['name']}' is listed twice")
+        names.add(profile["name"])
+        unknown = set(profile) - set(PROFILE_KEYS)
+        if unknown:
+            raise ValueError(f"profile '{profile['name']}' cannot set {', '.join(sorted(unknown))}")
+        config = {**defaults, **profile}
+        try:
+            scheduler.parse_time(config["start_time"])
+            scheduler.config_schedule(config)
+            for key in ("notification_duration", "notification_interval"):
+                if not isinstance(config[key], (int, float)) or config[key] < 0:
+                    raise ValueError(f"{key} must be a non-negative number")
+            actions.validate_ladder(config["escalation"])
+            channels.validate_channels(config["channels"])
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"profile '{profile['name']}': {e}") from None
+
+
+class ProfileTable:
+    """
+    The profiles, one row each. Timing and state are columns of typed arrays
+    (8 bytes a value, no object per profile); a row's schedule is shared with
+    every profile using the same expression. Not thread-safe: ProfileScheduler
+    guards it with its lock.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.rows = {}                       # Name -> row
+        self.overrides = []                  # Row -> the profile's entry in config.json
+        self.schedules = []                  # Row -> compiled scheduler.Schedule
+        self.tokens = []                     # Row -> token of its current prompt, or None
+        self.duration = array.array("d")
+        self.interval = array.array("d")
+        self.state = array.array("B")
+        self.deadline = array.array("d")     # When the row's next step is due (Unix time)
+        self.window_start = array.array("d")
+        self.window_end = array.array("d")   # math.inf for a window without an end
+        self.notified_at = array.array("d")  # When its prompt was sent (queued, until then)
+        self.generation = array.array("L")   # Bumped whenever the deadline changes
+
+    def __len__(self):
+        return len(self.names)
+
+    def upsert(self, profile, defaults):
+        """
+        Adds a profile, or updates the row of one with the same name.
+
+        Returns:
+            int: The row.
+        """
+        config = {**defaults, **profile}
+        row = self.rows.get(profile["name"])
+        if row is None:
+            row = self.rows[profile["name"]] = len(self.names)
+            self.names.append(profile["name"])
+            self.overrides.append(None)
+            self.schedules.append(None)
+            self.tokens.append(None)
+            for column in (self.duration, self.interval, self.deadline, self.window_start,
+                           self.window_end, self.notified_at):
+                column.append(math.nan)
+            self.state.append(OFF)
+            self.generation.append(0)
+        self.overrides[row] = profile
+        self.schedules[row] = scheduler.config_schedule(config)
+        self.duration[row] = config["notification_duration"]
+        self.interval[row] = config["notification_interval"]
+        return row
+
+    def config(self, row, defaults):
+        """
+        Returns the effective settings of a row.
+        """
+        return {**defaults, **self.overrides[row]}
+
+
+class ProfileScheduler:
+    """
+    Drives every profile's schedule from one thread and one heap of
+    (deadline, generation, row) entries. An entry whose generation no longer
+    matches its row's is stale and skipped when it comes up.
+
+    Args:
+        on_prompt (callable): Sends a profile's prompt: on_prompt(name, token, config).
+            Runs on a prompt worker; the response deadline starts when it returns.
+            If it raises, the prompt is tried again after notification_interval.
+        on_expire (callable): Escalates an unanswered prompt: on_expire(name, config,
+            cancel_event) -> actions.Escalation. Runs on an escalation worker;
+            cancel_event is set by a late response.
+        clock (optional): Time source and sleep provider (see clock.py).
+        max_workers (int): Size of each worker pool (prompts, escalations).
+    """
+
+    def __init__(self, on_prompt, on_expire, clock=None, max_workers=MAX_WORKERS):
+        self.table = ProfileTable()
+        self.defaults = {}
+        self.powered_off = False
+        self._on_prompt = on_prompt
+        self._on_expire = on_expire
+        self._clock = clock or RealClock()
+        self._heap = []
+        self._tokens = {}      # Prompt token -> row
+        self._entropy = b""    # Random bytes for the next tokens, read from os.urandom() in bulk
+        self._escalations = {} # Row -> cancel event of its running escalation
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._senders = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="profile-prompt")
+        self._workers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="profile-action")
+
+    # ---- Configuration ---- #
+    def configure(self, config):
+        """
+        Applies the "profiles" setting of `config`: new profiles start waiting
+        for their next window, changed ones are rescheduled unless a prompt is
+        out, and removed ones stop.
+        """
+        now = self._clock.time()
+        with self._lock:
+            self.defaults = {key: value for key, value in config.items() if key != "profiles"}
+            listed = set()
+            for profile in config["profiles"]:
+                row = self.table.upsert(profile, self.defaults)
+                listed.add(row)
+                if self.table.state[row] in (OFF, WAITING):
+                    self._wait_for_window(row, now)
+            for row in range(len(self.table)):
+                if row not in listed and self.table.state[row] != OFF:
+                    self._tokens.pop(self.table.tokens[row], None)
+                    self._set_state(row, OFF)
+                    self._escalations.get(row, threading.Event()).set()
+        self._wake.set()
+
+    # ---- Acknowledgements ---- #
+    def acknowledge(self, token):
+        """
+        Handles a response to a profile's prompt. Only the current prompt's token
+        counts; a response during the escalation cancels the rest of it.
+
+        Returns:
+            tuple: (verdict, profile name, response latency in seconds); the
+                verdict is channels.ACCEPTED or channels.STALE.
+        """
+        now = self._clock.time()
+        with self._lock:
+            row = self._tokens.pop(token, None)
+            if row is None or self.table.state[row] not in (AWAITING, ESCALATING):
+                return channels.STALE, None, math.nan
+            table = self.table
+            table.tokens[row] = None
+            latency = now - table.notified_at[row]
+            if table.state[row] == AWAITING:
+                self._set_state(row, SLEEPING, min(now + table.interval[row], table.window_end[row]))
+            elif table.state[row] == ESCALATING:
+                self._escalations[row].set() # _escalated() then moves on to the interval
+            name = table.names[row]
+        self._wake.set()
+        return channels.ACCEPTED, name, latency
+
+    # ---- Scheduling ---- #
+    def run(self, stop_event):
+        """
+        Processes due deadlines until `stop_event` is set, stop() is called, or
+        an escalation powered the machine off.
+        """
+        while not stop_event.is_set() and not self._stopped.is_set():
+            self._wake.clear()
+            timeout = self.advance()
+            self._clock.wait(self._wake, min(timeout, scheduler.MAX_SLEEP_SECONDS))
+        self._senders.shutdown(wait=False, cancel_futures=True)
+        self._workers.shutdown(wait=False, cancel_futures=True)
+
+    def stop(self):
+        """
+        Ends run() and cancels the escalations in progress.
+        """
+        self._stopped.set()
+        with self._lock:
+            for cancel_event in self._escalations.values():
+                cancel_event.set()
+        self._wake.set()
+
+    def advance(self, now=None):
+        """
+        Takes every row whose deadline has passed one step further.
+
+        Returns:
+            float: Seconds until the next deadline (math.inf if there is none).
+        """
+        now = self._clock.time() if now is None else now
+        table = self.table
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, generation, row = heapq.heappop(self._heap)
+                if generation != table.generation[row]:
+                    continue
+                state = table.state[row]
+                if state == WAITING:
+                    self._start_window(row, now)
+                elif state == SLEEPING:
+                    self._prompt(row, now)
+                elif state == AWAITING:
+                    self._escalate(row)
+            if len(self._heap) > 2 * len(table) + 64:
+                # Reschedules leave stale entries behind; drops them
+                self._heap = [entry for entry in self._heap if entry[1] == table.generation[entry[2]]]
+                heapq.heapify(self._heap)
+            return self._heap[0][0] - now if self._heap else math.inf
+
+    def status(self):
+        """
+        Returns the number of profiles in each state.
+        """
+        with self._lock:
+            counts = dict.fromkeys(STATE_NAMES, 0)
+            for state in self.table.state:
+                counts[STATE_NAMES[state]] += 1
+            return counts
+
+    def _set_state(self, row, state, deadline=math.nan):
+        table = self.table
+        table.state[row] = state
+        table.deadline[row] = deadline
+        table.generation[row] += 1
+        if not math.isnan(deadline):
+            heapq.heappush(self._heap, (deadline, table.generation[row], row))
+
+    def _wait_for_window(self, row, now):
+        self._set_window(row, self.table.schedules[row].next_window(datetime.fromtimestamp(now)))
+
+    def _set_window(self, row, window):
+        self.table.window_start[row] = window.start.timestamp()
+        self.table.window_end[row] = math.inf if window.end is None else window.end.timestamp()
+        self._set_state(row, WAITING, self.table.window_start[row])
+
+    def _start_window(self, row, now):
+        table = self.table
+        end = table.window_end[row]
+        window = scheduler.Window(datetime.fromtimestamp(table.window_start[row]),
+                                  None if end == math.inf else datetime.fromtimestamp(end))
+        later = scheduler.resolve_late_start(window, table.schedules[row], self.defaults["catch_up_policy"],
+                                             self.defaults["catch_up_minutes"] * 60, datetime.fromtimestamp(now))
+        if later is None:
+            self._prompt(row, now)
+        else:
+            self._set_window(row, later)
+
+    def _prompt(self, row, now):
+        table = self.table
+        if now >= table.window_end[row]:
+            self._wait_for_window(row, now + 60)
+            return
+        self._tokens.pop(table.tokens[row], None)
+        token = table.tokens[row] = self._new_token()
+        self._tokens[token] = row
+        table.notified_at[row] = now
+        self._set_state(row, AWAITING) # The deadline is set once the prompt is out (see _sent)
+        self._senders.submit(self._send, row, token, table.config(row, self.defaults))
+
+    def _new_token(self):
+        # One system call per 256 tokens rather than per prompt: a window start
+        # shared by many profiles prompts them all in one step
+        if len(self._entropy) < TOKEN_BYTES:
+            self._entropy = os.urandom(TOKEN_BYTES * 256)
+        token, self._entropy = self._entropy[:TOKEN_BYTES], self._entropy[TOKEN_BYTES:]
+        return base64.urlsafe_b64encode(token).rstrip(b"=").decode("ascii")
+
+    def _send(self, row, token, config):
+        try:
+            self._on_prompt(self.table.names[row], token, config)
+        except Exception as e:
+            LOG.error("Profile '%s': the prompt could not be sent: %s. Trying again after the interval.",
+                      self.table.names[row], e)
+            self._unsent(row, token)
+        else:
+            self._sent(row, token)
+
+    def _sent(self, row, token):
+        # Starts the response deadline, unless the prompt was answered or replaced meanwhile
+        now = self._clock.time()
+        with self._lock:
+            table = self.table
+            if table.state[row] != AWAITING or table.tokens[row] != token:
+                return
+            table.notified_at[row] = now
+            self._set_state(row, AWAITING, now + table.duration[row])
+        self._wake.set()
+
+    def _unsent(self, row, token):
+        # Nobody was asked, so no deadline: the next prompt comes after the interval
+        now = self._clock.time()
+        with self._lock:
+            table = self.table
+            if table.state[row] != AWAITING or table.tokens[row] != token:
+                return
+            self._tokens.pop(token, None)
+            table.tokens[row] = None
+            self._set_state(row, SLEEPING, min(now + table.interval[row], table.window_end[row]))
+        self._wake.set()
+
+    def _escalate(self, row):
+        cancel_event = self._escalations[row] = threading.Event()
+        self._set_state(row, ESCALATING)
+        self._workers.submit(self._expire, row, cancel_event, self.table.config(row, self.defaults))
+
+    def _expire(self, row, cancel_event, config):
+        # Runs on the worker rather than as a done callback, which would run inline
+        # under the lock held by advance() if the escalation had already finished
+        try:
+            escalation = self._on_expire(self.table.names[row], config, cancel_event)
+        except Exception as e:
+            LOG.error("Profile '%s': the escalation failed: %s", self.table.names[row], e)
+            escalation = None
+        self._escalated(row, cancel_event, escalation)
+
+    def _escalated(self, row, cancel_event, escalation):
+        now = self._clock.time()
+        with self._lock:
+            if self._escalations.get(row) is cancel_event:
+                del self._escalations[row]
+            if escalation is not None and escalation.powered_off:
+                self.powered_off = True
+                self._stopped.set()
+            elif self.table.state[row] == ESCALATING:
+                self._tokens.pop(self.table.tokens[row], None)
+                self.table.tokens[row] = None
+                if escalation is not None and escalation.suspended:
+                    self._wait_for_window(row, now + 60)
+                else:
+                    self._set_state(row, SLEEPING, min(now + self.table.interval[row], self.table.window_end[row]))
+        self._wake.set()
@@ -0,0 +1,377 @@
+"""
+Quiet periods for Deadman's switch: times when no prompt goes out.
+
+On nights with a long render, or on holidays, prompts are suppressed instead of
+the app having to be exited by hand. Quiet periods come from local calendar
+files listed in `quiet_calendars`:
+
+    *.ics     iCalendar: every VEVENT (DTSTART, DTEND or DURATION, SUMMARY,
+              RRULE, EXDATE); all-day events cover the whole day
+    *.json    {"quiet": [{"start": "2026-12-24T18:00", "end": "2026-12-26T12:00",
+                          "summary": "Holidays", "rrule": "FREQ=YEARLY"}, ...]}
+
+Recurring rules (FREQ DAILY, WEEKLY, MONTHLY or YEARLY, with INTERVAL, COUNT,
+UNTIL and, for daily and weekly rules, BYDAY) are expanded on load into single
+periods, from a day ago to EXPAND_DAYS ahead, and expanded again as that
+horizon draws near.
+
+The periods of all files are kept in a static interval index: starts sorted,
+and for each position the latest end of any period starting there or before.
+Whether a time is quiet is one bisect (the period starting last before it) and
+one comparison with that running maximum, so it costs O(log n) with thousands
+of entries. Every lookup stats the files; only a file whose mtime or size
+changed is parsed again, and the index is rebuilt from the parsed files.
+"""
+import bisect
+import collections
+import json
+import os
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+
+
+EXPAND_DAYS = 400
+MAX_OCCURRENCES = 100000 # Per rule, a bound for rules without COUNT or UNTIL
+
+QuietPeriod = collections.namedtuple("QuietPeriod", "start end summary") # Unix times
+
+WEEKDAY_CODES = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+DURATION = re.compile(r"^([+-]?)P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$")
+
+
+# ------------------- Parsing ------------------- #
+def _timestamp(moment):
+    # Naive datetimes are local time
+    return moment.timestamp()
+
+
+def _ics_datetime(value, params):
+    """
+    Parses an iCalendar DATE or DATE-TIME value: UTC ("Z"), in a TZID zone
+    (local time if the zone is unknown), or floating local time.
+
+    Returns:
+        tuple: (datetime, is_date).
+    """
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return datetime.strptime(value[:8], "%Y%m%d"), True
+    moment = datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        return moment.replace(tzinfo=timezone.utc), False
+    if "TZID" in params:
+        try:
+            from zoneinfo import ZoneInfo
+            return moment.replace(tzinfo=ZoneInfo(params["TZID"].strip('"'))), False
+        except (ImportError, ValueError, KeyError, OSError):
+            pass # Unknown zone (e.g. a Windows zone name): local time
+    return moment, False
+
+
+def _ics_duration(value):
+    match = DURATION.match(value)
+    if not match:
+        raise ValueError(f"Bad DURATION '{value}'")
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    length = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                       minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -length if sign == "-" else length
+
+
+def _ics_lines(text):
+    """
+    Yields (name, params, value) for each unfolded content line.
+    """
+    unfolded = []
+    for line in text.splitlines():
+        if line[:1] in (" ", "\t") and unfolded:
+            unfolded[-1] += line[1:]
+        elif line:
+            unfolded.append(line)
+    for line in unfolded:
+        head, _, value = line.partition(":")
+        name, *parameters = head.split(";")
+        params = dict(parameter.partition("=")[::2] for parameter in parameters)
+        yield name.upper(), {key.upper(): item for key, item in params.items()}, value
+
+
+def parse_ics(text):
+    """
+    Returns the events of an iCalendar file as dictionaries with "start" and
+    "end" (datetimes), "summary", "rrule" (or None) and "exdates" (datetimes).
+    """
+    events, event = [], None
+    for name, params, value in _ics_lines(text):
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            event = {"summary": "", "rrule": None, "exdates": [], "end": None, "duration": None}
+        elif name == "END" and value.upper() == "VEVENT" and event is not None:
+            if "start" not in event:
+                raise ValueError("VEVENT without DTSTART")
+            if event.pop("cancelled", False):
+                event = None
+                continue
+            start, is_date = event["start"]
+            if event["end"] is not None:
+                event["end"] = event["end"][0]
+            elif event["duration"] is not None:
+                event["end"] = start + event["duration"]
+            else:
+                event["end"] = start + timedelta(days=1) if is_date else start # A point in time: not quiet
+            event["start"] = start
+            del event["duration"]
+            events.append(event)
+            event = None
+        elif event is None:
+            continue
+        elif name == "DTSTART":
+            event["start"] = _ics_datetime(value, params)
+        elif name == "DTEND":
+            event["end"] = _ics_datetime(value, params)
+        elif name == "DURATION":
+            event["duration"] = _ics_duration(value)
+        elif name == "SUMMARY":
+            event["summary"] = value.replace("\\,", ",").replace("\\;", ";").replace("\\n", " ")
+        elif name == "RRULE":
+            event["rrule"] = value
+        elif name == "EXDATE":
+            event["exdates"].extend(_ics_datetime(item, params)[0] for item in value.split(","))
+        elif name == "STATUS" and value.upper() == "CANCELLED":
+            event["cancelled"] = True
+    return events
+
+
+def parse_json(text):
+    """
+    Returns the entries of a JSON quiet-period file in the form parse_ics() uses.
+    """
+    data = json.loads(text)
+    entries = data.get("quiet", []) if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        raise ValueError('Expected a list of quiet periods under "quiet"')
+    events = []
+    for entry in entries:
+        try:
+            events.append({"start": datetime.fromisoformat(entry["start"]),
+                           "end": datetime.fromisoformat(entry["end"]),
+                           "summary": str(entry.get("summary", "")),
+                           "rrule": entry.get("rrule"),
+                           "exdates": [datetime.fromisoformat(item) for item in entry.get("exdates", [])]})
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Bad quiet period {entry!r}: {e}") from None
+    return events
+
+
+# ------------------- Recurrence ------------------- #
+def _add_months(moment, months):
+    """
+    Same day and time `months` later, or None if that month has no such day.
+    """
+    month = moment.month - 1 + months
+    try:
+        return moment.replace(year=moment.year + month // 12, month=month % 12 + 1)
+    except ValueError:
+        return None
+
+
+def _parse_rrule(rrule):
+    parts = dict(part.partition("=")[::2] for part in rrule.upper().split(";") if part)
+    unsupported = set(parts) - {"FREQ", "INTERVAL", "COUNT", "UNTIL", "BYDAY", "WKST"}
+    if unsupported:
+        raise ValueError(f"Unsupported RRULE part(s) {', '.join(sorted(unsupported))} in '{rrule}'")
+    frequency = parts.get("FREQ")
+    if frequency not in ("DAILY", "WEEKLY", "MONTHLY", "YEARLY"):
+        raise ValueError(f"Unsupported RRULE frequency in '{rrule}'")
+    if "BYDAY" in parts and frequency not in ("DAILY", "WEEKLY"):
+        raise ValueError(f"BYDAY is only supported with FREQ=DAILY or WEEKLY in '{rrule}'")
+    try:
+        days = sorted(WEEKDAY_CODES.index(day) for day in parts["BYDAY"].split(",")) if "BYDAY" in parts else None
+    except ValueError:
+        raise ValueError(f"Bad BYDAY in '{rrule}'") from None
+    until = None
+    if "UNTIL" in parts:
+        until = _ics_datetime(parts["UNTIL"], {})[0]
+        if until.tzinfo is None and len(parts["UNTIL"]) == 8:
+            until += timedelta(days=1) - timedelta(microseconds=1) # A date includes the whole day
+    return frequency, max(int(parts.get("INTERVAL", 1)), 1), \
+        int(parts["COUNT"]) if "COUNT" in parts else None, until, days
+
+
+def _occurrences(start, frequency, interval, days):
+    """
+    Yields the starts generated by a rule, in order, from `start` on.
+    """
+    if frequency == "WEEKLY":
+        days = days or [start.weekday()]
+        week = start - timedelta(days=start.weekday())
+        for step in range(MAX_OCCURRENCES):
+            for day in days:
+                occurrence = week + timedelta(days=7 * interval * step + day)
+                if occurrence >= start:
+                    yield occurrence
+    elif frequency == "DAILY":
+        for step in range(MAX_OCCURRENCES):
+            occurrence = start + timedelta(days=interval * step)
+            if days is None or occurrence.weekday() in days:
+                yield occurrence
+    else:
+        months = interval * (12 if frequency == "YEARLY" else 1)
+        for step in range(MAX_OCCURRENCES):
+            occurrence = _add_months(start, months * step)
+            if occurrence is not None:
+                yield occurrence
+
+
+def expand(event, horizon_start, horizon_end):
+    """
+    Expands an event (and its RRULE, if any) into the QuietPeriods that overlap
+    horizon_start..horizon_end (Unix times).
+    """
+    start, end = event["start"], event["end"]
+    if (start.tzinfo is None) != (end.tzinfo is None):
+        # One floating, one zoned: both as local time, so recurrences follow the start
+        start, end = (moment.astimezone().replace(tzinfo=None) if moment.tzinfo else moment
+                      for moment in (start, end))
+    length = end - start
+    if length <= timedelta(0):
+        return []
+    if not event["rrule"]:
+        starts = [start]
+    else:
+        frequency, interval, count, until, days = _parse_rrule(event["rrule"])
+        starts = []
+        until_ts = _timestamp(until) if until is not None else None
+        excluded = {_timestamp(moment) for moment in event["exdates"]}
+        for number, occurrence in enumerate(_occurrences(start, frequency, interval, days)):
+            if count is not None and number >= count:
+                break
+            occurrence_ts = _timestamp(occurrence)
+            if (until_ts is not None and occurrence_ts > until_ts) or occurrence_ts >= horizon_end:
+                break
+            if occurrence_ts not in excluded:
+                starts.append(occurrence)
+
+    periods = []
+    for occurrence in starts:
+        period_start, period_end = _timestamp(occurrence), _timestamp(occurrence + length)
+        if period_end > horizon_start and period_start < horizon_end:
+            periods.append(QuietPeriod(period_start, period_end, event["summary"]))
+    return periods
+
+
+# ------------------- Calendar ------------------- #
+class QuietCalendar:
+    """
+    Quiet periods from a set of calendar files, with incremental reloads.
+    Thread-safe.
+
+    Args:
+        expand_days (float): How far ahead recurring rules are expanded.
+        on_error (callable, optional): Called with (path, exception) when a file
+            cannot be read or parsed; its previous periods are kept.
+    """
+
+    def __init__(self, expand_days=EXPAND_DAYS, on_error=None):
+        self.expand_days = expand_days
+        self.on_error = on_error
+        self._lock = threading.Lock()
+        self._files = {} # Path -> (stat signature, events)
+        self._horizon = (0.0, 0.0)
+        self._starts = []  # Sorted period starts
+        self._periods = [] # Periods in the same order
+        self._reach = []   # Index of the period with the latest end among _periods[:i + 1]
+
+    def __len__(self):
+        return len(self._periods)
+
+    def refresh(self, paths, now):
+        """
+        Parses the files that changed since the last call (and drops the ones no
+        longer listed), then rebuilds the index if anything changed or the
+        expansion horizon draws near.
+
+        Args:
+            paths (list): Calendar files (.ics or .json).
+            now (float): Current Unix time.
+
+        Returns:
+            bool: True if the index was rebuilt.
+        """
+        with self._lock:
+            changed = set(self._files) != set(paths)
+            self._files = {path: self._files[path] for path in paths if path in self._files}
+            for path in paths:
+                signature = self._stat(path)
+                if path in self._files and self._files[path][0] == signature:
+                    continue
+                changed = True
+                try:
+                    events = self._parse(path) if signature is not None else []
+                except (OSError, ValueError, UnicodeDecodeError) as e:
+                    if self.on_error:
+                        self.on_error(path, e)
+                    events = self._files[path][1] if path in self._files else []
+                self._files[path] = (signature, events)
+
+            horizon_start, horizon_end = self._horizon
+            if changed or now < horizon_start or now > horizon_end - self.expand_days * 86400 / 2:
+                self._rebuild(now)
+                return True
+            return False
+
+    def lookup(self, now):
+        """
+        Returns the QuietPeriod that `now` (Unix time) falls in, or None. Where
+        periods overlap, the one lasting longest is returned.
+        """
+        with self._lock:
+            index = bisect.bisect_right(self._starts, now) - 1
+            if index < 0:
+                return None
+            period = self._periods[self._reach[index]]
+            return period if period.end > now else None
+
+    def current(self, paths, now):
+        """
+        refresh() followed by lookup().
+        """
+        self.refresh(paths, now)
+        return self.lookup(now)
+
+    @staticmethod
+    def _stat(path):
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    @staticmethod
+    def _parse(path):
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        events = parse_json(text) if path.lower().endswith(".json") else parse_ics(text)
+        for event in events:
+            if event["rrule"]:
+                _parse_rrule(event["rrule"]) # Rejects the file now rather than on every rebuild
+        return events
+
+    def _rebuild(self, now):
+        horizon_start, horizon_end = now - 86400, now + self.expand_days * 86400
+        periods = []
+        for path, (_, events) in self._files.items():
+            for event in events:
+                try:
+                    periods.extend(expand(event, horizon_start, horizon_end))
+                except (ValueError, TypeError, OverflowError) as e:
+                    if self.on_error: # The event is skipped; the others still count
+                        self.on_error(path, e)
+        periods.sort()
+        reach, latest = [], -1
+        for index, period in enumerate(periods):
+            if latest < 0 or period.end > periods[latest].end:
+                latest = index
+            reach.append(latest)
+        self._horizon = (horizon_start, horizon_end)
+        self._starts = [period.start for period in periods]
+        self._periods = periods
+        self._reach = reach
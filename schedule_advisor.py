@@ -0,0 +1,368 @@
+"""
+Adaptive start time for Deadman's switch, learned from the click history.
+
+The last click of a night (in the wake store, wake_log.bin) is the latest the
+user is known to have been awake. For a start time S and an interval I, a night
+whose last awake time is L gets k = ceil((L - S) / I) prompts while the user is
+still up (none if L <= S). Each of them is missed with probability `miss_rate`,
+which shuts the machine down under an awake user, so that night's false-shutdown
+probability is 1 - (1 - miss_rate) ** k. Of the candidate pairs (start times
+from 18:00 to 06:00 every 15 minutes, intervals from 5 to 60 minutes) whose
+average over the nights stays within the target rate, the advisor picks the one
+that leaves the machine on for the shortest time after the user fell asleep
+(until the first prompt after L, plus the notification duration). The same is
+done per weekday, with the distribution of each weekday's last awake times.
+
+Responses to the profiles' prompts (see profiles.py) are left out: they are
+other users'. A night without any click, on which a prompt went unanswered (a "missed" record
+in the store), is censored: the user fell asleep some time before that first
+missed prompt. Leaving those nights out would only ever move the start time
+later, so bedtimes are fitted as a normal distribution by maximum likelihood
+(clicks exact, censored nights below their first missed prompt), and each
+censored night counts as that distribution cut off at its first missed prompt,
+spread over 5-minute bins.
+
+NumPy is an optional dependency, needed only for this. The store's records are
+read straight from its mapping into a structured array, nights are reduced with
+ufunc.at, and every candidate pair is evaluated over every night at once, so
+years of history take milliseconds.
+
+The last awake time and first missed prompt of each night are cached in schedule_model.npz along with
+the number of store records already read; update() reads only the records
+appended since. A store rewritten by an import (a new file) is read again in full.
+
+Usage:
+    python schedule_advisor.py [wake_log.bin] [--target 0.01] [--miss-rate 0.05]
+                               [--duration 60] [--min-nights 14]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import wake_store
+from logger import LOG
+
+
+MODES = ("off", "suggest", "apply")
+MODEL_PATH = "schedule_model.npz"
+NOON = 12 * 3600
+DAY = 24 * 3600
+# Candidate start times in seconds after noon (18:00 to 06:00, every 15 minutes), and intervals
+START_CANDIDATES = tuple(range(6 * 3600, 18 * 3600 + 1, 15 * 60))
+INTERVAL_CANDIDATES = (300, 600, 900, 1200, 1800, 2700, 3600)
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+# Bedtime distribution fitted with censored nights: candidate means and standard deviations
+MEAN_CANDIDATES = tuple(range(2 * 3600, 22 * 3600 + 1, 15 * 60))
+SPREAD_CANDIDATES = tuple(minutes * 60 for minutes in (10, 20, 30, 45, 60, 90, 120, 180, 240))
+BIN = 5 * 60
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("the adaptive schedule needs NumPy (pip install numpy)") from None
+    return numpy
+
+
+def record_dtype(np):
+    """
+    The wake store's record layout (wake_store.RECORD) as a NumPy structured dtype.
+    """
+    return np.dtype({"names": ["timestamp", "cycle_id", "latency", "source"],
+                     "formats": ["<f8", "<u4", "<f4", "u1"],
+                     "offsets": [0, 8, 12, 16],
+                     "itemsize": wake_store.RECORD.size})
+
+
+def night_times(np, timestamps):
+    """
+    Splits Unix timestamps into the night they belong to (local days since the
+    epoch, counted from noon, so 01:30 belongs to the previous evening) and the
+    seconds since that night's noon.
+
+    Returns:
+        tuple: (night numbers, seconds after noon) arrays.
+    """
+    # One UTC offset per calendar day covers daylight saving time changes
+    days = np.floor(timestamps / DAY).astype(np.int64)
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    offsets = np.array([datetime.fromtimestamp(day * DAY + NOON).astimezone().utcoffset().total_seconds()
+                        for day in unique_days.tolist()])
+    local = timestamps + offsets[inverse] - NOON
+    nights = np.floor(local / DAY).astype(np.int64)
+    return nights, local - nights * DAY
+
+
+def normal_cdf(np, x):
+    """
+    Standard normal CDF, elementwise (Abramowitz and Stegun 7.1.26, error below 1e-7).
+    """
+    z = np.abs(x) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * z)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-z * z)
+    return 0.5 * (1.0 + np.sign(x) * erf)
+
+
+def fit_bedtimes(np, exact, censored):
+    """
+    Fits a normal distribution to bedtimes by maximum likelihood over a grid,
+    from exact ones and ones only known to be earlier than a bound.
+
+    Args:
+        exact (ndarray): Last awake times (seconds after noon).
+        censored (ndarray): Upper bounds (first missed prompts) of the other nights.
+
+    Returns:
+        tuple: (mean, standard deviation) in seconds.
+    """
+    means = np.array(MEAN_CANDIDATES, float)[:, None, None]
+    spreads = np.array(SPREAD_CANDIDATES, float)[None, :, None]
+    log_likelihood = np.zeros((len(MEAN_CANDIDATES), len(SPREAD_CANDIDATES)))
+    for values, is_censored in ((exact, False), (censored, True)):
+        # Whole minutes: repeated values are evaluated once, weighted by their count
+        values, counts = np.unique(np.round(values / 60) * 60, return_counts=True)
+        z = (values[None, None, :] - means) / spreads
+        if is_censored:
+            terms = np.log(np.maximum(normal_cdf(np, z), 1e-300))
+        else:
+            terms = -0.5 * z * z - np.log(spreads)
+        log_likelihood += terms @ counts
+    mean, spread = np.unravel_index(np.argmax(log_likelihood), log_likelihood.shape)
+    return float(MEAN_CANDIDATES[mean]), float(SPREAD_CANDIDATES[spread])
+
+
+def format_time(seconds_after_noon):
+    """
+    Formats seconds after noon as "HH:MM".
+    """
+    minutes = int(round((NOON + seconds_after_noon) / 60)) % (24 * 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class ScheduleModel:
+    """
+    Last awake time (last click) and first missed prompt of every night in the
+    wake store, kept up to date incrementally and cached on disk.
+
+    Args:
+        store_path (str): The wake store (wake_log.bin).
+        model_path (str, optional): Cache file; None keeps the model in memory only.
+
+    Raises:
+        RuntimeError: If NumPy is not installed.
+    """
+
+    def __init__(self, store_path, model_path=MODEL_PATH):
+        self.np = _numpy()
+        self.store_path = store_path
+        self.model_path = model_path
+        self._reset()
+        self._advice_key = None
+        self._advice = None
+        if model_path and os.path.exists(model_path):
+            self._load()
+
+    def _reset(self):
+        self.nights = self.np.empty(0, self.np.int64)       # Night numbers, ascending
+        self.last_awake = self.np.empty(0, self.np.float64) # Seconds after that night's noon; -inf without clicks
+        self.first_missed = self.np.empty(0, self.np.float64) # Likewise; +inf without missed prompts
+        self.records_seen = 0
+        self.store_id = 0 # Inode of the store file the records were read from
+
+    def _load(self):
+        try:
+            with self.np.load(self.model_path) as data:
+                self.nights = data["nights"]
+                self.last_awake = data["last_awake"]
+                self.first_missed = data["first_missed"]
+                self.records_seen = int(data["records_seen"])
+                self.store_id = int(data["store_id"]) if "store_id" in data else 0
+        except (OSError, ValueError, KeyError) as e:
+            LOG.warning("Ignoring %s (%s); rebuilding it from the wake store.", self.model_path, e)
+            self._reset()
+
+    def save(self):
+        """
+        Writes the cache file (atomically).
+        """
+        if not self.model_path:
+            return
+        temp_path = self.model_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            self.np.savez(f, nights=self.nights, last_awake=self.last_awake, first_missed=self.first_missed,
+                          records_seen=self.records_seen, store_id=self.store_id)
+        os.replace(temp_path, self.model_path)
+
+    def update(self):
+        """
+        Reads the records appended to the store since the last update.
+
+        Returns:
+            int: Number of records read.
+        """
+        np = self.np
+        if not os.path.exists(self.store_path):
+            return 0
+        store = wake_store.WakeStore(self.store_path)
+        try:
+            store_id = os.stat(self.store_path).st_ino
+            if len(store) < self.records_seen or store_id != self.store_id:
+                self._reset() # The store was replaced: start over
+                self.store_id = store_id
+            view = store.records(self.records_seen)
+            records = np.frombuffer(view, dtype=record_dtype(np)) # No copy
+            count = len(records)
+            if count:
+                nights, seconds = night_times(np, records["timestamp"])
+                missed = records["source"] == wake_store.source_code(wake_store.MISSED)
+                # Responses to the profiles' prompts are other users' bedtimes
+                other = records["source"] == wake_store.source_code(wake_store.PROFILE)
+            del records
+            view.release()
+        finally:
+            store.close()
+        if not count:
+            return 0
+
+        # Merges with the nights already known: the latest click and the earliest
+        # missed prompt of each night win
+        all_nights, inverse = np.unique(np.concatenate([self.nights, nights]), return_inverse=True)
+        known, added = inverse[:len(self.nights)], inverse[len(self.nights):]
+        last_awake = np.full(len(all_nights), -np.inf)
+        first_missed = np.full(len(all_nights), np.inf)
+        last_awake[known], first_missed[known] = self.last_awake, self.first_missed
+        clicks = ~missed & ~other
+        np.maximum.at(last_awake, added[clicks], seconds[clicks])
+        np.minimum.at(first_missed, added[missed], seconds[missed])
+        self.nights, self.last_awake, self.first_missed = all_nights, last_awake, first_missed
+        self.records_seen += count
+        return count
+
+    def advise(self, target_rate=0.01, miss_rate=0.05, duration=60, min_nights=14, now=None):
+        """
+        Picks the start time and notification interval for the recorded nights
+        (the night in progress excluded).
+
+        Args:
+            target_rate (float): Highest acceptable share of nights with a false shutdown.
+            miss_rate (float): Chance that an awake user misses a prompt.
+            duration (float): notification_duration, in seconds.
+            min_nights (int): Nights of history needed before advising anything.
+            now (float, optional): Current Unix time; defaults to the system clock.
+
+        Returns:
+            dict: "nights", "censored_nights" (nights without a click, with a missed
+                prompt) and "enough_history"; with enough history also the advised
+                "start_time", "notification_interval", their expected
+                "false_shutdown_rate" and "minutes_on_after_bedtime", "target_met",
+                and the same per weekday in "weekdays".
+        """
+        np = self.np
+        current_night, _ = night_times(np, np.array([time.time() if now is None else now]))
+        complete = self.nights < current_night[0]
+        key = (self.records_seen, int(current_night[0]), target_rate, miss_rate, duration, min_nights)
+        if key == self._advice_key:
+            return self._advice
+
+        clicked = complete & np.isfinite(self.last_awake)
+        censored = complete & ~np.isfinite(self.last_awake) & np.isfinite(self.first_missed)
+        last_awake, bounds = self.last_awake[clicked], self.first_missed[censored]
+        # Night 0 is Thursday, 1 January 1970
+        weekdays = (np.concatenate([self.nights[clicked], self.nights[censored]]) + 3) % 7
+        advice = {"nights": len(weekdays), "censored_nights": len(bounds),
+                  "enough_history": len(weekdays) >= max(min_nights, 1)}
+        if advice["enough_history"]:
+            # Groups: all nights, then each weekday; weights average over a group's nights
+            groups = np.concatenate([np.ones((len(weekdays), 1)),
+                                     (weekdays[:, None] == np.arange(7)[None, :]).astype(float)], axis=1)
+            counts = groups.sum(axis=0)
+            weights = groups / np.maximum(counts, 1)
+
+            starts = np.array(START_CANDIDATES, float)[:, None, None]
+            intervals = np.array(INTERVAL_CANDIDATES, float)[None, :, None]
+
+            def outcomes(bedtimes):
+                late = np.maximum(bedtimes[None, None, :] - starts, 0.0)
+                prompts_awake = np.ceil(late / intervals)
+                return (1.0 - (1.0 - miss_rate) ** prompts_awake,
+                        starts + prompts_awake * intervals - bedtimes[None, None, :] + duration)
+
+            false_shutdown, on_after = outcomes(last_awake)
+            if len(bounds):
+                # Each censored night: the fitted bedtimes below its first missed prompt
+                mean, spread = fit_bedtimes(np, last_awake, bounds)
+                bins = np.arange(BIN / 2, DAY, BIN)
+                spread_over = np.exp(-0.5 * ((bins - mean) / spread) ** 2)[None, :] * (bins[None, :] < bounds[:, None])
+                empty = spread_over.sum(axis=1) <= 0 # Bound far below the fit: the bin just under it
+                spread_over[empty, np.maximum(np.searchsorted(bins, bounds[empty]) - 1, 0)] = 1.0
+                spread_over /= spread_over.sum(axis=1, keepdims=True)
+                bin_false_shutdown, bin_on_after = outcomes(bins)
+                false_shutdown = np.concatenate([false_shutdown, bin_false_shutdown @ spread_over.T], axis=2)
+                on_after = np.concatenate([on_after, bin_on_after @ spread_over.T], axis=2)
+            rates = false_shutdown @ weights # (starts, intervals, groups)
+            minutes_on = (on_after @ weights) / 60
+
+            choices = []
+            for group in range(groups.shape[1]):
+                if not counts[group]:
+                    choices.append(None)
+                    continue
+                rate, minutes = rates[:, :, group], minutes_on[:, :, group]
+                met = rate <= target_rate
+                # Shortest time on after bedtime within the target, else the lowest rate
+                score = np.where(met, minutes, np.inf) if met.any() else rate + minutes * 1e-9
+                start, interval = np.unravel_index(np.argmin(score), score.shape)
+                choices.append({"start_time": format_time(START_CANDIDATES[start]),
+                                "notification_interval": INTERVAL_CANDIDATES[interval],
+                                "false_shutdown_rate": round(float(rate[start, interval]), 4),
+                                "minutes_on_after_bedtime": round(float(minutes[start, interval]), 1),
+                                "target_met": bool(met.any())})
+
+            advice.update(choices[0])
+            advice["weekdays"] = {}
+            for day, name in enumerate(WEEKDAYS):
+                if choices[day + 1] is None:
+                    continue
+                advice["weekdays"][name] = day_advice = {"nights": int(counts[day + 1])}
+                day_last_awake = last_awake[weekdays[:len(last_awake)] == day]
+                if len(day_last_awake): # Percentiles of the click nights only
+                    p50, p90, p99 = np.percentile(day_last_awake, [50, 90, 99])
+                    day_advice.update(last_awake_p50=format_time(p50), last_awake_p90=format_time(p90),
+                                      last_awake_p99=format_time(p99))
+                day_advice.update(choices[day + 1])
+        self._advice_key, self._advice = key, advice
+        return advice
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("store", nargs="?", default="wake_log.bin")
+    parser.add_argument("--target", type=float, default=0.01, help="Acceptable share of nights with a false shutdown.")
+    parser.add_argument("--miss-rate", type=float, default=0.05, help="Chance an awake user misses a prompt.")
+    parser.add_argument("--duration", type=float, default=60, help="notification_duration (seconds)")
+    parser.add_argument("--min-nights", type=int, default=14)
+    parser.add_argument("--model", default=MODEL_PATH, help="Cache file (updated incrementally).")
+    args = parser.parse_args(argv)
+
+    try:
+        model = ScheduleModel(args.store, args.model)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return 1
+    began = time.perf_counter()
+    read = model.update()
+    advice = model.advise(args.target, args.miss_rate, args.duration, args.min_nights)
+    advice["records_read"] = read
+    advice["seconds"] = round(time.perf_counter() - began, 4)
+    model.save()
+    print(json.dumps(advice, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
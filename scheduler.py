@@ -0,0 +1,268 @@
+"""
+Deadline scheduling for Deadman's switch.
+
+Instead of waking up every few seconds to compare datetime.now() against the
+target minute, the start time is turned into one absolute deadline and the
+caller sleeps once on an interruptible event. Each wake-up compares the
+wall-clock time that elapsed with the monotonic time that elapsed, which
+reveals a suspend/resume or a clock change (DST, manual adjustment, NTP step).
+
+When to start is given by a schedule expression: rules separated by ";", each
+an optional set of weekdays followed by one or more comma-separated windows:
+
+    02:00                                   every day at 02:00, no end
+    Mon-Fri 01:00-05:30; Sat,Sun 02:30-07:00
+    Mon-Thu 23:00-01:00, 03:00-06:00; Fri-Sun 02:00
+
+A window "HH:MM-HH:MM" stops prompting at its end time (past midnight if the
+end is earlier than the start); a bare "HH:MM" keeps prompting. The days are
+those on which a window starts. compile_schedule() parses an expression once
+into a sorted table of window starts over one week, so the next window after
+any time is a bisect away.
+"""
+import bisect
+import collections
+import functools
+import time
+from datetime import datetime, timedelta
+
+from clock import RealClock
+
+
+# What to do when the deadline is found to be in the past on wake-up
+# (e.g. the machine was suspended across the start time).
+CATCH_UP_FIRE = "fire" # Fires immediately if no later than the catch-up window
+CATCH_UP_SKIP = "skip" # Waits for the next day's occurrence instead
+CATCH_UP_POLICIES = (CATCH_UP_FIRE, CATCH_UP_SKIP)
+
+# Longest single sleep. Timed waits do not advance while the machine is
+# suspended, so this bounds how late a deadline that passed during a suspend
+# can be noticed. A few wake-ups per hour instead of one every 20 seconds.
+MAX_SLEEP_SECONDS = 900
+
+# Wall-clock vs. monotonic drift (seconds) treated as a clock jump
+CLOCK_JUMP_TOLERANCE = 2.0
+
+# Lateness (seconds) that always counts as "on time", whatever the policy
+ON_TIME_TOLERANCE = 60
+
+_SYSTEM_CLOCK = RealClock()
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+DAY = 24 * 3600
+WEEK = 7 * DAY
+
+# A schedule window as naive local datetimes; `end` is None for a window without an end time
+Window = collections.namedtuple("Window", "start end")
+
+
+def parse_time(target_str):
+    """
+    Parses a "HH:MM" 24-hour time string.
+
+    Args:
+        target_str (str): The time, e.g. "02:00".
+
+    Returns:
+        tuple: (hour, minute) as integers.
+
+    Raises:
+        ValueError: If the string is not a valid HH:MM time.
+    """
+    parsed = time.strptime(target_str, "%H:%M")
+    return parsed.tm_hour, parsed.tm_min
+
+
+def _parse_days(text):
+    """
+    Parses "Mon-Fri,Sun" (or "*") into a set of weekday numbers (Monday is 0).
+    A range may wrap around the week ("Sat-Mon"). Spaces around the days are
+    ignored ("Mon, Wed").
+    """
+    if text.strip() == "*":
+        return set(range(7))
+    days = set()
+    for part in text.lower().split(","):
+        first, _, last = (day.strip() for day in part.partition("-"))
+        if first not in WEEKDAYS or (last and last not in WEEKDAYS):
+            raise ValueError(f"Unknown weekday in '{text}' (use Mon, Tue, ... Sun)")
+        first, last = WEEKDAYS.index(first), WEEKDAYS.index(last or first)
+        days.update((first + offset) % 7 for offset in range((last - first) % 7 + 1))
+    return days
+
+
+class Schedule:
+    """
+    A compiled schedule expression: the windows of one week, sorted by start.
+    Built by compile_schedule(); immutable.
+
+    Args:
+        windows (iterable): (start, duration) pairs in seconds from Monday 00:00
+            local time; duration is None for a window without an end.
+    """
+
+    def __init__(self, windows):
+        self.windows = tuple(sorted(windows))
+        self._starts = [start for start, _ in self.windows]
+
+    def next_window(self, now=None):
+        """
+        Returns the next window to start. One starting inside the current
+        minute counts as now, like the old per-minute check did.
+
+        Args:
+            now (datetime, optional): Reference time. Defaults to datetime.now().
+
+        Returns:
+            Window: Its start and end (or None) as naive local datetimes.
+        """
+        now = now or datetime.now()
+        week_start = datetime(now.year, now.month, now.day) - timedelta(days=now.weekday())
+        offset = (now - week_start).total_seconds()
+        index = bisect.bisect_right(self._starts, offset - 60)
+        if index == len(self._starts):
+            index, week_start = 0, week_start + timedelta(days=7)
+        start, duration = self.windows[index]
+        begins = week_start + timedelta(seconds=start)
+        return Window(begins, None if duration is None else begins + timedelta(seconds=duration))
+
+
+@functools.lru_cache(maxsize=16)
+def compile_schedule(expression):
+    """
+    Parses and compiles a schedule expression (see the module docstring).
+    Compiled schedules are cached, so callers may compile on every use.
+
+    Args:
+        expression (str): E.g. "Mon-Fri 01:00-05:30; Sat,Sun 02:30".
+
+    Returns:
+        Schedule: The compiled schedule.
+
+    Raises:
+        ValueError: If the expression is malformed, or two windows overlap.
+    """
+    windows = {}
+    for rule in expression.split(";"):
+        rule = rule.strip()
+        if not rule:
+            continue
+        if rule[0].isalpha() or rule[0] == "*":
+            # The days run up to the first time (which starts with a digit)
+            times_at = next((index for index, char in enumerate(rule) if char.isdigit()), len(rule))
+            day_text, rule = rule[:times_at].strip(), rule[times_at:]
+            days = _parse_days(day_text)
+            if not rule.strip():
+                raise ValueError(f"No time after '{day_text}'")
+        else:
+            days = set(range(7))
+        for window in rule.split(","):
+            start_text, _, end_text = window.strip().partition("-")
+            hour, minute = parse_time(start_text.strip())
+            start = hour * 3600 + minute * 60
+            duration = None
+            if end_text:
+                hour, minute = parse_time(end_text.strip())
+                duration = (hour * 3600 + minute * 60 - start) % DAY
+                if not duration:
+                    raise ValueError(f"Window '{window.strip()}' ends when it starts")
+            for day in days:
+                windows[day * DAY + start] = duration # The same start twice keeps the later rule
+    if not windows:
+        raise ValueError("The schedule has no window")
+
+    schedule = Schedule(windows.items())
+    # A window must end before the next one starts (the last one wraps to the first, a week later)
+    for (start, duration), (next_start, _) in zip(schedule.windows,
+                                                  schedule.windows[1:] + schedule.windows[:1]):
+        if duration is not None and duration > ((next_start - start) % WEEK or WEEK):
+            raise ValueError(f"Schedule windows overlap in '{expression}'")
+    return schedule
+
+
+def config_schedule(config):
+    """
+    Returns the compiled schedule of a configuration: its "schedule"
+    expression, or every day at "start_time" when that is empty.
+    """
+    return compile_schedule(config.get("schedule") or config["start_time"])
+
+
+def next_occurrence(target_str, now=None):
+    """
+    Computes the start of the next window of a schedule expression, e.g. the
+    next local datetime matching an "HH:MM" time. A start time inside the
+    current minute counts as now, like the old per-minute check did.
+
+    Args:
+        target_str (str): A schedule expression, such as "02:00" (24-hour format).
+        now (datetime, optional): Reference time. Defaults to datetime.now().
+
+    Returns:
+        datetime: Naive local datetime of the next occurrence.
+    """
+    return compile_schedule(target_str).next_window(now).start
+
+
+def sleep_until(deadline, wake_event, max_sleep=MAX_SLEEP_SECONDS, on_clock_jump=None, clock=None):
+    """
+    Sleeps until the local datetime `deadline` is reached or `wake_event` is set.
+    The remaining time is recomputed from the wall clock after every wake-up, so
+    a DST change or timezone update moves the deadline along with local time.
+
+    Args:
+        deadline (datetime): Naive local datetime to wait for.
+        wake_event (threading.Event): Interrupts the wait when set.
+        max_sleep (float): Longest single sleep (see MAX_SLEEP_SECONDS).
+        on_clock_jump (callable, optional): Called with the drift in seconds when
+            wall-clock and monotonic time disagree after a sleep.
+        clock (optional): Time source and sleep provider (see clock.py).
+            Defaults to the system clocks.
+
+    Returns:
+        tuple: (reached, wakeups) where `reached` is False if `wake_event` was set
+        first, and `wakeups` is the number of sleeps taken.
+    """
+    clock = clock or _SYSTEM_CLOCK
+    wakeups = 0
+    while True:
+        remaining = deadline.timestamp() - clock.time()
+        if remaining <= 0:
+            return True, wakeups
+
+        wall_start, mono_start = clock.time(), clock.monotonic()
+        interrupted = clock.wait(wake_event, min(remaining, max_sleep))
+        wakeups += 1
+        if interrupted:
+            return False, wakeups
+
+        drift = (clock.time() - wall_start) - (clock.monotonic() - mono_start)
+        if abs(drift) > CLOCK_JUMP_TOLERANCE and on_clock_jump:
+            on_clock_jump(drift)
+
+
+def resolve_late_start(window, schedule, policy, catch_up_window, now=None):
+    """
+    Applies the catch-up policy to a window whose start was reached. A window
+    that has already ended is skipped whatever the policy.
+
+    Args:
+        window (Window): The window whose start `sleep_until` returned for.
+        schedule (Schedule): The compiled schedule it came from.
+        policy (str): CATCH_UP_FIRE or CATCH_UP_SKIP.
+        catch_up_window (float): Maximum lateness in seconds for CATCH_UP_FIRE.
+        now (datetime, optional): Reference time. Defaults to datetime.now().
+
+    Returns:
+        Window: None to fire now, otherwise the next window to wait for.
+    """
+    if policy not in CATCH_UP_POLICIES:
+        raise ValueError(f"Unknown catch-up policy: {policy!r}")
+    now = now or datetime.now()
+    lateness = now.timestamp() - window.start.timestamp()
+    if window.end is None or now < window.end:
+        if lateness <= ON_TIME_TOLERANCE:
+            return None
+        if policy == CATCH_UP_FIRE and lateness <= catch_up_window:
+            return None
+    return schedule.next_window(now + timedelta(minutes=1))
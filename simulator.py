@@ -0,0 +1,448 @@
+"""
+Discrete-event simulator for Deadman's switch.
+
+Runs the real monitor_loop (loaded headless, see headless.py) on a VirtualClock,
+so months of nightly cycles take seconds of CPU. Notifications and escalation
+stages are intercepted: each notification asks a user model whether and when
+the user clicks (a late click can cancel the escalation), a shutdown powers the
+simulated machine off until the next boot, and a sleep or hibernate suspends it
+until then.
+Optional suspends move the wall clock forward under the scheduler, which
+exercises the catch-up policy. With an idle threshold, the user also types
+while awake (at random gaps), and the real presence sampler reads that input
+through a simulated idle source. Quiet-period calendars (--quiet-calendar)
+are read with the virtual clock, like the app reads them.
+
+The user model is either scripted (a bedtime per night, a response delay range
+and a miss rate) or replayed from a recorded wake store (wake_log.bin): each
+recorded night's last click becomes that night's bedtime, and the recorded
+response latencies are sampled.
+
+The report (JSON) gives shutdowns (and how many happened while the user was
+still awake), escalation stages and cancellations, missed start times, and the
+notification load per night, and the prompts held back by recent input.
+
+Usage:
+    python simulator.py [--days 365] [--start-time 02:00] [--schedule EXPR] [--duration 60] [--interval 600]
+                        [--policy fire] [--catch-up-minutes 240] [--boot-time 19:00]
+                        [--bedtime 01:30] [--bedtime-jitter 60] [--delay 3 30]
+                        [--miss-rate 0.0] [--suspend-rate 0.0] [--replay wake_log.bin]
+                        [--escalation shutdown:15] [--idle-threshold 0] [--input-gap 60]
+                        [--quiet-calendar quiet.ics ...]
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import actions
+import headless
+import metrics
+import scheduler
+from clock import VirtualClock
+from notification_dispatch import NotificationDispatcher
+from wake_store import MISSED, PROFILE, WakeStore, iter_records
+
+
+def night_of(timestamp):
+    """
+    Returns the date a night is named after: times before noon belong to the
+    previous evening.
+    """
+    return (datetime.fromtimestamp(timestamp) - timedelta(hours=12)).date()
+
+
+def seconds_into_night(timestamp):
+    """
+    Seconds since noon of the night `timestamp` belongs to.
+    """
+    noon = datetime.combine(night_of(timestamp), datetime.min.time()) + timedelta(hours=12)
+    return timestamp - noon.timestamp()
+
+
+# ------------------- User Models ------------------- #
+class ScriptedUser:
+    """
+    Awake until a per-night bedtime drawn around `bedtime`; while awake, clicks
+    after a uniform delay, except for a fraction `miss_rate` of notifications.
+
+    Args:
+        bedtime (str): Typical "HH:MM" bedtime.
+        bedtime_jitter (float): Standard deviation of the bedtime, in minutes.
+        delay (tuple): (min, max) response delay in seconds.
+        miss_rate (float): Probability of not clicking while awake.
+        rng (random.Random): Source of randomness.
+    """
+
+    def __init__(self, bedtime, bedtime_jitter, delay, miss_rate, rng):
+        hour, minute = scheduler.parse_time(bedtime)
+        # Offset from noon, so 01:30 comes after 23:00
+        self.bedtime_offset = ((hour - 12) % 24) * 3600 + minute * 60
+        self.bedtime_jitter = bedtime_jitter * 60
+        self.delay = delay
+        self.miss_rate = miss_rate
+        self.rng = rng
+        self._bedtimes = {}
+
+    def bedtime(self, timestamp):
+        night = night_of(timestamp)
+        if night not in self._bedtimes:
+            offset = self.rng.gauss(self.bedtime_offset, self.bedtime_jitter) if self.bedtime_jitter else self.bedtime_offset
+            self._bedtimes[night] = timestamp - seconds_into_night(timestamp) + offset
+        return self._bedtimes[night]
+
+    def is_awake(self, timestamp):
+        return timestamp < self.bedtime(timestamp)
+
+    def respond(self, timestamp):
+        """
+        Returns:
+            float: Seconds until the click, or None if the user does not click.
+        """
+        if not self.is_awake(timestamp) or self.rng.random() < self.miss_rate:
+            return None
+        return self.rng.uniform(*self.delay)
+
+
+class RecordedUser(ScriptedUser):
+    """
+    Replays recorded nights in order (wrapping around): the last click of each
+    recorded night is the bedtime, and response delays are drawn from the
+    recorded latencies (or `delay` when none were recorded).
+
+    Args:
+        events (iterable): (timestamp, source, cycle_id, latency) tuples.
+        delay (tuple): Fallback (min, max) response delay in seconds.
+        rng (random.Random): Source of randomness.
+    """
+
+    def __init__(self, events, delay, rng):
+        last_clicks = {}
+        self.latencies = []
+        for timestamp, source, _, latency in events:
+            if source in (MISSED, PROFILE): # Not this user's clicks
+                continue
+            last_clicks[night_of(timestamp)] = seconds_into_night(timestamp)
+            if not math.isnan(latency):
+                self.latencies.append(latency)
+        if not last_clicks:
+            raise ValueError("The recording contains no clicks")
+        self.recorded_bedtimes = [last_clicks[night] for night in sorted(last_clicks)]
+        super().__init__("00:00", 0, delay, 0.0, rng)
+        self._first_night = None
+
+    def bedtime(self, timestamp):
+        night = night_of(timestamp)
+        if self._first_night is None:
+            self._first_night = night
+        index = (night - self._first_night).days % len(self.recorded_bedtimes)
+        return timestamp - seconds_into_night(timestamp) + self.recorded_bedtimes[index]
+
+    def respond(self, timestamp):
+        if not self.is_awake(timestamp):
+            return None
+        if self.latencies:
+            return self.rng.choice(self.latencies)
+        return self.rng.uniform(*self.delay)
+
+
+class SimulatedIdleSource:
+    """
+    Input-idle time of a user who, while awake, gives input at random gaps
+    (exponentially distributed, `input_gap` seconds on average) and none once asleep.
+
+    Args:
+        user (ScriptedUser): Says when the user is awake.
+        clock (VirtualClock): The simulation's clock.
+        input_gap (float): Average seconds between two inputs.
+        rng (random.Random): Source of randomness.
+    """
+
+    def __init__(self, user, clock, input_gap, rng):
+        self.user = user
+        self.clock = clock
+        self.input_gap = input_gap
+        self.rng = rng
+        self.last_input = clock.time()
+        self._generated_until = clock.time()
+
+    def idle_seconds(self):
+        now = self.clock.time()
+        # Draws the inputs made since the previous sample
+        moment = self._generated_until
+        while True:
+            moment += self.rng.expovariate(1 / self.input_gap)
+            if moment > now or not self.user.is_awake(moment):
+                break
+            self.last_input = moment
+        self._generated_until = now
+        return now - self.last_input
+
+
+# ------------------- Simulation ------------------- #
+class SimulatedPower:
+    """
+    Power backend whose commands are only handed to Simulation's runner.
+    """
+    dry_run = False
+
+    def command(self, action):
+        return ["simulated", action]
+
+
+class Simulation:
+    """
+    Drives the application's monitor_loop through `days` days of virtual time.
+
+    Args:
+        app (module): The application module (from headless.load_app()).
+        user (ScriptedUser): Decides whether and when each notification is answered.
+        start (datetime): First boot of the simulated machine.
+        days (int): Length of the simulation.
+        boot_time (str): "HH:MM" the machine is switched on after a shutdown.
+        suspend_rate (float): Probability per day of a suspend in the hours before the start time.
+        suspend_hours (tuple): (min, max) length of a suspend, in hours.
+        input_gap (float): Average seconds between inputs while the user is awake
+            (used when idle_threshold is set).
+        rng (random.Random): Source of randomness.
+    """
+
+    def __init__(self, app, user, start, days, boot_time="19:00", suspend_rate=0.0,
+                 suspend_hours=(1, 8), input_gap=60, rng=None):
+        self.app = app
+        self.user = user
+        self.start = start
+        self.days = days
+        self.boot_time = boot_time
+        self.suspend_rate = suspend_rate
+        self.suspend_hours = suspend_hours
+        self.input_gap = input_gap
+        self.rng = rng or random.Random()
+        self.clock = VirtualClock(start.timestamp())
+
+        self.powered = False
+        self.boots = 0
+        self.notifications = 0
+        self.notifications_per_night = {}
+        self.clicks = 0
+        self.shutdowns = 0
+        self.awake_shutdowns = 0
+        self.suspends = 0
+        self.stages = {}
+        self.minutes_on_after_bedtime = []
+
+    # ---- Hooks installed into the application ---- #
+    def _notify(self):
+        now = self.clock.time()
+        self.notifications += 1
+        night = night_of(now)
+        self.notifications_per_night[night] = self.notifications_per_night.get(night, 0) + 1
+        delay = self.user.respond(now)
+        if delay is not None:
+            self.clock.call_later(delay, self._click)
+
+    def _click(self):
+        if self.powered:
+            self.clicks += 1
+            self.app.register_click(source="notification")
+
+    def _run_stage(self, action, command, timeout):
+        now = self.clock.time()
+        self.stages[action] = self.stages.get(action, 0) + 1
+        if action in actions.POWER_OFF_ACTIONS:
+            self.shutdowns += 1
+            if self.user.is_awake(now):
+                self.awake_shutdowns += 1
+            else:
+                self.minutes_on_after_bedtime.append((now - self.user.bedtime(now)) / 60)
+        elif action in ("sleep", "hibernate"):
+            # Suspended until the user switches the machine on again
+            next_boot = scheduler.next_occurrence(self.boot_time, self.clock.now() + timedelta(minutes=1))
+            self.clock.suspend(next_boot.timestamp() - now)
+        return 0, ""
+
+    def _suspend(self, seconds):
+        if self.powered:
+            self.suspends += 1
+            self.clock.suspend(seconds)
+
+    def _stop(self):
+        self.app.STOP_EVENT.set()
+        self.app.WAKE_EVENT.set()
+        self.app.CLICK_EVENT.set()
+
+    # ---- Run ---- #
+    def run(self):
+        """
+        Runs the simulation and returns the report dictionary.
+        """
+        app = self.app
+        app.CLOCK = self.clock
+        app.DISPATCHER = NotificationDispatcher(self.clock, inline=True)
+        app.send_notification = self._notify
+        app.BACKENDS.power = SimulatedPower()
+        app.ACTION_RUNNER = self._run_stage
+        # Its own generator, so the same seed gives the same nights with or without an idle threshold
+        idle_rng = random.Random(self.rng.getrandbits(32))
+        app.BACKENDS.presence = SimulatedIdleSource(self.user, self.clock, self.input_gap, idle_rng)
+
+        end = self.start.timestamp() + self.days * 86400
+        self.clock.call_at(end, self._stop)
+        config = app.load_config()
+        for day in range(self.days):
+            if self.rng.random() < self.suspend_rate:
+                window = scheduler.config_schedule(config).next_window(self.start + timedelta(days=day))
+                begins = window.start.timestamp() - self.rng.uniform(0, 3 * 3600)
+                seconds = self.rng.uniform(*self.suspend_hours) * 3600
+                self.clock.call_at(begins, lambda seconds=seconds: self._suspend(seconds))
+
+        missed_before = metrics.MISSED_STARTS.value()
+        cancelled_before = metrics.ESCALATIONS_CANCELLED.value()
+        samples_before = metrics.PRESENCE_SAMPLE.count()
+        implicit_before = metrics.IMPLICIT_AWAKES.value()
+        cpu_started = time.process_time()
+        while self.clock.time() < end:
+            self.powered = True
+            self.boots += 1
+            app.STOP_EVENT.clear()
+            app.WAKE_EVENT.clear()
+            app.CLICK_EVENT.clear()
+            app.monitor_loop()
+            if app.STOP_EVENT.is_set():
+                break
+            # Shut down: the machine stays off until the next boot time
+            self.powered = False
+            next_boot = scheduler.next_occurrence(self.boot_time, self.clock.now() + timedelta(minutes=1))
+            self.clock.run_until(min(next_boot.timestamp(), end))
+        cpu_seconds = time.process_time() - cpu_started
+
+        loads = [self.notifications_per_night.get(self.start.date() + timedelta(days=day), 0)
+                 for day in range(self.days)]
+        return {
+            "days": self.days,
+            "config": {key: config[key] for key in ("start_time", "schedule", "notification_duration",
+                                                    "notification_interval",
+                                                    "catch_up_policy", "catch_up_minutes", "escalation",
+                                                    "idle_threshold", "quiet_calendars")},
+            "boots": self.boots,
+            "shutdowns": self.shutdowns,
+            "shutdowns_while_awake": self.awake_shutdowns,
+            "minutes_on_after_bedtime_avg": round(statistics.mean(self.minutes_on_after_bedtime), 1)
+            if self.minutes_on_after_bedtime else None,
+            "escalation_stages": self.stages,
+            "escalations_cancelled": int(metrics.ESCALATIONS_CANCELLED.value() - cancelled_before),
+            "missed_start_times": int(metrics.MISSED_STARTS.value() - missed_before),
+            "suspends": self.suspends,
+            "nights_without_notification": loads.count(0),
+            "notifications": self.notifications,
+            "notifications_per_night_avg": round(statistics.mean(loads), 2),
+            "notifications_per_night_max": max(loads),
+            "clicks": self.clicks,
+            "implicit_awakes": int(metrics.IMPLICIT_AWAKES.value() - implicit_before),
+            "presence_samples": int(metrics.PRESENCE_SAMPLE.count() - samples_before),
+            "cpu_seconds": round(cpu_seconds, 2),
+        }
+
+
+def parse_ladder(text):
+    """
+    Parses "lock:0,shutdown:15" into escalation stages.
+    """
+    ladder = []
+    for stage in text.split(","):
+        action, _, delay = stage.partition(":")
+        ladder.append({"action": action.strip(), "delay": float(delay or 0)})
+    try:
+        actions.validate_ladder(ladder)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return ladder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--from", dest="start", default="2026-01-01",
+                        help="Date of the first boot (YYYY-MM-DD).")
+    parser.add_argument("--start-time", default="02:00")
+    parser.add_argument("--schedule", default="",
+                        help='Schedule expression used instead of --start-time, e.g. "Mon-Fri 01:00-05:30; Sat,Sun 02:30".')
+    parser.add_argument("--duration", type=float, default=60, help="notification_duration (seconds)")
+    parser.add_argument("--interval", type=float, default=600, help="notification_interval (seconds)")
+    parser.add_argument("--policy", default=scheduler.CATCH_UP_FIRE, choices=scheduler.CATCH_UP_POLICIES)
+    parser.add_argument("--catch-up-minutes", type=float, default=240)
+    parser.add_argument("--boot-time", default="19:00", help="When the machine is switched on after a shutdown.")
+    parser.add_argument("--bedtime", default="01:30")
+    parser.add_argument("--bedtime-jitter", type=float, default=60, help="Standard deviation in minutes.")
+    parser.add_argument("--delay", type=float, nargs=2, default=(3, 30), metavar=("MIN", "MAX"),
+                        help="Response delay range in seconds.")
+    parser.add_argument("--miss-rate", type=float, default=0.0, help="Chance of not clicking while awake.")
+    parser.add_argument("--suspend-rate", type=float, default=0.0,
+                        help="Chance per day of a suspend shortly before the start time.")
+    parser.add_argument("--escalation", type=parse_ladder, default=actions.DEFAULT_LADDER,
+                        help="Escalation ladder as ACTION:DELAY stages, e.g. lock:0,shutdown:15.")
+    parser.add_argument("--idle-threshold", type=float, default=0,
+                        help="idle_threshold (seconds): hold prompts back while the user gives input.")
+    parser.add_argument("--input-gap", type=float, default=60,
+                        help="Average seconds between inputs while the user is awake.")
+    parser.add_argument("--quiet-calendar", action="append", default=[],
+                        help="Calendar file (.ics or .json) of quiet periods; may be repeated.")
+    parser.add_argument("--replay", help="Wake store (wake_log.bin) to replay instead of the scripted user.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="Show the application's output.")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.replay:
+        store = WakeStore(args.replay)
+        view = store.range(0, math.inf)
+        events = list(iter_records(view))
+        view.release()
+        store.close()
+        user = RecordedUser(events, args.delay, rng)
+    else:
+        user = ScriptedUser(args.bedtime, args.bedtime_jitter, args.delay, args.miss_rate, rng)
+
+    first_boot = datetime.combine(datetime.strptime(args.start, "%Y-%m-%d").date(),
+                                  datetime.strptime(args.boot_time, "%H:%M").time())
+    quiet_calendars = [os.path.abspath(path) for path in args.quiet_calendar]
+    previous_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        # config.json and the wake log of the simulated run stay in the scratch directory
+        os.chdir(directory)
+        try:
+            with open(os.devnull, "w") as devnull, \
+                    contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+                app = headless.load_app()
+                app.CONFIG.save({
+                    "start_time": args.start_time,
+                    "schedule": args.schedule,
+                    "notification_duration": args.duration,
+                    "notification_interval": args.interval,
+                    "catch_up_policy": args.policy,
+                    "catch_up_minutes": args.catch_up_minutes,
+                    "escalation": args.escalation,
+                    "idle_threshold": args.idle_threshold,
+                    "quiet_calendars": quiet_calendars,
+                })
+                simulation = Simulation(app, user, first_boot, args.days, args.boot_time,
+                                        args.suspend_rate, input_gap=args.input_gap, rng=rng)
+                try:
+                    report = simulation.run()
+                finally:
+                    app.close_log_writer()
+        finally:
+            os.chdir(previous_directory)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
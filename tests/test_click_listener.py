@@ -0,0 +1,88 @@
+"""
+The click listener must acknowledge /click promptly while browsers hold idle
+preconnect sockets (and half-sent requests) open against it.
+
+Runs the real app module headless (see headless.py) in a temporary directory,
+with the listener on a free port.
+
+Usage:
+    python -m unittest discover tests
+"""
+import http.client
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import headless # noqa: E402
+
+
+IDLE_SOCKETS = 200
+PARTIAL_SOCKETS = 20
+CLICKS = 20
+# A click, logging included, takes a few milliseconds; these bounds leave room
+# for a loaded machine while staying far below notification_duration.
+MEDIAN_BOUND_SECONDS = 0.05
+MAX_BOUND_SECONDS = 0.5
+
+
+def get_click(port):
+    connection = http.client.HTTPConnection("localhost", port, timeout=10)
+    try:
+        connection.request("GET", "/click")
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+class ClickListenerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.previous_directory = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        self.app = headless.load_app()
+        self.app.LOG.configure("off")
+        self.sockets = []
+        server = self.app.start_click_listener(port=0)
+        self.assertIsNotNone(server)
+        self.port = server.server_address[1]
+
+    def tearDown(self):
+        for sock in self.sockets:
+            sock.close()
+        self.app.stop_click_listener()
+        self.app.close_log_writer()
+        os.chdir(self.previous_directory)
+        self.directory.cleanup()
+
+    def test_click_with_idle_connections(self):
+        self.assertEqual(get_click(self.port), 200) # Warms up the listener and the log writer
+        for _ in range(IDLE_SOCKETS):
+            self.sockets.append(socket.create_connection(("localhost", self.port)))
+        for _ in range(PARTIAL_SOCKETS):
+            sock = socket.create_connection(("localhost", self.port))
+            sock.sendall(b"GET /favicon.ico HTTP/1.1\r\nHost: localhost\r\n")
+            self.sockets.append(sock)
+
+        latencies = []
+        for _ in range(CLICKS):
+            self.app.CLICK_EVENT.clear()
+            began = time.perf_counter()
+            self.assertEqual(get_click(self.port), 200)
+            latencies.append(time.perf_counter() - began)
+            self.assertTrue(self.app.CLICK_EVENT.is_set())
+
+        self.assertLess(statistics.median(latencies), MEDIAN_BOUND_SECONDS)
+        self.assertLess(max(latencies), MAX_BOUND_SECONDS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+The escalation ladder runs its stages in order, each after its delay, stops at
+a late click, and a dry run never reports the machine as off or asleep.
+
+Runs ActionExecutor with the no-op backends (backends.noop_backends(), whose
+power backend only reports its commands) on a virtual clock.
+
+Usage:
+    python -m unittest discover tests
+"""
+import os
+import sys
+import threading
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import actions # noqa: E402
+import backends # noqa: E402
+from clock import VirtualClock # noqa: E402
+
+
+class LadderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.commands = []
+        power = backends.noop_backends().power
+        self.executor = actions.ActionExecutor(power, runner=lambda *args: self.commands.append(args) or (0, ""))
+        self.clock = VirtualClock(0)
+        self.cancel_event = threading.Event()
+        self.stages = [] # (action, monotonic time it ran)
+
+    def escalate(self, ladder, dry_run=False):
+        return self.executor.escalate(ladder, self.cancel_event, self.clock, dry_run=dry_run,
+                                      on_stage=lambda result: self.stages.append((result.action, self.clock.monotonic())))
+
+    def test_stages_run_in_order_after_their_delays(self):
+        ladder = [{"action": "lock", "delay": 0}, {"action": "lock", "delay": 10},
+                  {"action": "shutdown", "delay": 15}, {"action": "lock", "delay": 5}]
+        escalation = self.escalate(ladder)
+        # The shutdown ends the ladder: the stage after it never runs
+        self.assertEqual(self.stages, [("lock", 0), ("lock", 10), ("shutdown", 25)])
+        self.assertFalse(escalation.cancelled)
+
+    def test_late_click_cancels_during_a_delay(self):
+        self.clock.call_later(20, self.cancel_event.set)
+        escalation = self.escalate([{"action": "lock", "delay": 0}, {"action": "sleep", "delay": 30},
+                                    {"action": "shutdown", "delay": 15}])
+        self.assertTrue(escalation.cancelled)
+        self.assertEqual(self.stages, [("lock", 0)])
+        self.assertEqual(self.clock.monotonic(), 20)
+        self.assertFalse(escalation.suspended)
+        self.assertFalse(escalation.powered_off)
+
+    def test_dry_run_is_neither_powered_off_nor_suspended(self):
+        for ladder in (actions.DEFAULT_LADDER, [{"action": "sleep", "delay": 0}],
+                       [{"action": "hibernate", "delay": 0}]):
+            for dry_run in (False, True): # The power backend makes every run a dry one
+                with self.subTest(ladder=ladder, dry_run=dry_run):
+                    escalation = self.escalate(ladder, dry_run)
+                    result = escalation.results[-1]
+                    self.assertEqual(result.action, ladder[-1]["action"])
+                    self.assertTrue(result.dry_run)
+                    self.assertTrue(result.ok)
+                    self.assertFalse(escalation.powered_off)
+                    self.assertFalse(escalation.suspended)
+        self.assertEqual(self.commands, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+"""
+A cycle whose prompt never showed must not escalate: nobody was asked.
+
+Runs the real notification cycles headless (see headless.py) in a temporary
+directory, on a virtual clock for the threads runtime and on the event loop for
+the asyncio runtime, with a notifier that raises; and a profile scheduler whose
+prompts fail to send.
+
+Usage:
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import actions # noqa: E402
+import headless # noqa: E402
+import metrics # noqa: E402
+import profiles # noqa: E402
+import scheduler # noqa: E402
+from async_runtime import AsyncRuntime # noqa: E402
+from clock import RealClock, VirtualClock # noqa: E402
+from notification_dispatch import NotificationDispatcher # noqa: E402
+
+
+class FailingNotifier:
+    def __init__(self):
+        self.calls = 0
+
+    def show(self, title, message, button_label, button_url):
+        self.calls += 1
+        raise OSError("notification service unavailable")
+
+
+class ThreadsRuntimeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.previous_directory = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        self.app = headless.load_app()
+        self.app.LOG.configure("off")
+        self.clock = VirtualClock(datetime(2026, 1, 5, 2, 0).timestamp())
+        self.app.CLOCK = self.clock
+        self.app.DISPATCHER = NotificationDispatcher(self.clock, inline=True)
+        self.stages = []
+        log_stage = self.app.log_stage
+        self.app.log_stage = lambda result: (self.stages.append(result.action), log_stage(result))
+
+    def tearDown(self):
+        self.app.close_log_writer()
+        os.chdir(self.previous_directory)
+        self.directory.cleanup()
+
+    def run_window(self, hours=1):
+        return self.app.notification_cycles(self.clock.now() + timedelta(hours=hours))
+
+    def test_failing_notifier_does_not_escalate(self):
+        notifier = self.app.BACKENDS.notifier = FailingNotifier()
+        not_shown = metrics.PROMPTS_NOT_SHOWN.value()
+        self.assertTrue(self.run_window())
+        self.assertEqual(self.stages, [])
+        interval = self.app.load_config()["notification_interval"]
+        self.assertEqual(notifier.calls, 3600 // interval)
+        self.assertEqual(metrics.PROMPTS_NOT_SHOWN.value() - not_shown, notifier.calls)
+
+    def test_shown_prompt_still_escalates(self):
+        # The same window with a working notifier and nobody clicking runs the ladder
+        self.run_window()
+        self.assertEqual(self.stages[:len(actions.DEFAULT_LADDER)],
+                         [stage["action"] for stage in actions.DEFAULT_LADDER])
+
+
+class ShiftedClock(RealClock):
+    # The system clocks moved to `start`, so the start time is reached at once
+    def __init__(self, start):
+        self.offset = start.timestamp() - super().time()
+
+    def time(self):
+        return super().time() + self.offset
+
+    def now(self):
+        return datetime.fromtimestamp(self.time())
+
+
+class AsyncRuntimeTest(unittest.TestCase):
+
+    def test_failing_notifier_does_not_escalate(self):
+        config = {"start_time": "02:00", "schedule": "", "catch_up_policy": scheduler.CATCH_UP_FIRE,
+                  "catch_up_minutes": 240, "notification_duration": 0.1, "notification_interval": 0.2}
+        notifier = FailingNotifier()
+        escalations = []
+        not_shown = metrics.PROMPTS_NOT_SHOWN.value()
+        runtime = AsyncRuntime(lambda: config, lambda: notifier.show("", "", "", ""), lambda *args: None,
+                               lambda config, cancel_event: escalations.append(config), port=0,
+                               clock=ShiftedClock(datetime(2026, 1, 5, 2, 0)))
+        runtime.start()
+        try:
+            time.sleep(1)
+        finally:
+            runtime.request_stop()
+            runtime.join(5)
+        self.assertGreater(notifier.calls, 1)
+        self.assertEqual(escalations, [])
+        self.assertGreaterEqual(metrics.PROMPTS_NOT_SHOWN.value() - not_shown, notifier.calls - 1)
+
+
+class StoppedClock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class ProfileSchedulerTest(unittest.TestCase):
+
+    def test_failed_prompt_does_not_escalate(self):
+        start = datetime(2026, 1, 5, 2, 0).timestamp()
+        clock = StoppedClock(start - 60)
+        sent = threading.Event()
+        expired = []
+
+        def on_prompt(name, token, config):
+            sent.set()
+            raise RuntimeError("no channel delivered the prompt")
+
+        config = {"start_time": "02:00", "schedule": "", "notification_duration": 60, "notification_interval": 600,
+                  "catch_up_policy": scheduler.CATCH_UP_FIRE, "catch_up_minutes": 240,
+                  "escalation": [{"action": "lock", "delay": 0}], "action_dry_run": True,
+                  "channels": {"toast": {}}, "profiles": [{"name": "alice"}]}
+        profile_scheduler = profiles.ProfileScheduler(on_prompt, lambda *args: expired.append(args), clock=clock)
+        profile_scheduler.configure(config)
+        try:
+            clock.now = start
+            profile_scheduler.advance()
+            self.assertTrue(sent.wait(5))
+            for _ in range(100): # The failure is handled on the prompt worker
+                if profile_scheduler.status()["sleeping"]:
+                    break
+                time.sleep(0.01)
+            clock.now = start + 120 # Past the response deadline the prompt would have had
+            self.assertEqual(profile_scheduler.advance(), 480) # Next try after the interval
+            self.assertEqual(expired, [])
+            self.assertEqual(profile_scheduler.status()["sleeping"], 1)
+        finally:
+            profile_scheduler.stop()
+            profile_scheduler.run(threading.Event()) # Returns at once and shuts the workers down
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Span tracing for Deadman's switch: where the time goes in a notification cycle.
+
+Each step of a cycle runs inside a span (notify, listen, click, log, sleep,
+escalate), tagged with the cycle id so the steps on the monitor thread and
+those on the click listener's threads can be matched up:
+
+    with TRACER.span("notify", cycle=CYCLE_ID):
+        ...
+
+Finished spans are written by a WakeLogWriter (on its own thread, rotated by
+size like the wake log) in one of two formats, set with `trace`:
+
+jsonl   one JSON object per span: {"name", "start" (Unix time), "ms",
+        "thread", and the span's fields}
+chrome  Trace Event Format, for chrome://tracing or https://ui.perfetto.dev:
+        "X" events in a JSON array. The array is never closed, which both
+        viewers accept, so every segment can be loaded as it is.
+
+With `trace` "off" (the default), span() returns one shared no-op span, so the
+instrumented code pays for a call and nothing else.
+"""
+import json
+import os
+import threading
+import time
+
+
+FORMATS = ("off", "jsonl", "chrome")
+CHROME_HEADER = "[\n"
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+def _null_span(name, **fields):
+    return NULL_SPAN
+
+
+class Span:
+    """
+    A timed step, recorded when its `with` block ends. set() adds fields found
+    out along the way (e.g. whether the user clicked).
+    """
+    __slots__ = ("tracer", "name", "fields", "began")
+
+    def __init__(self, tracer, name, fields):
+        self.tracer = tracer
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.began = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.fields["error"] = exc_type.__name__
+        self.tracer._record(self.name, self.began, time.perf_counter(), self.fields)
+        return False
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+
+class Tracer:
+    """
+    Records spans to a writer in the configured format.
+
+    Args:
+        trace_format (str): One of FORMATS.
+        writer (WakeLogWriter, optional): Receives the exported lines; needed
+            unless the format is "off". For "chrome", create it with
+            header=CHROME_HEADER.
+    """
+
+    def __init__(self, trace_format="off", writer=None):
+        # Wall-clock time of perf_counter() zero, so spans line up with the logs
+        self._epoch = time.time() - time.perf_counter()
+        self._pid = os.getpid()
+        self._named_threads = set()
+        self.configure(trace_format, writer)
+
+    def configure(self, trace_format, writer=None):
+        """
+        Sets the format and the writer, and rebinds span() to match.
+        """
+        if trace_format not in FORMATS:
+            raise ValueError(f"Unknown trace format: {trace_format!r}")
+        self.format = trace_format
+        self.writer = writer
+        self._named_threads = set()
+        if trace_format == "off" or writer is None:
+            self.span = _null_span
+        else:
+            self.span = self._span
+
+    def _span(self, name, **fields):
+        """
+        Returns a span named `name` with `fields`, to use as a context manager.
+        """
+        return Span(self, name, fields)
+
+    def _record(self, name, began, ended, fields):
+        writer = self.writer
+        if writer is None:
+            return
+        thread = threading.current_thread()
+        if self.format == "jsonl":
+            writer.write(json.dumps({"name": name, "start": round(self._epoch + began, 6),
+                                     "ms": round((ended - began) * 1000, 3), "thread": thread.name,
+                                     **fields}) + "\n")
+            return
+        lines = []
+        if thread.ident not in self._named_threads:
+            # Names the thread's track in the viewer
+            self._named_threads.add(thread.ident)
+            lines.append(json.dumps({"name": "thread_name", "ph": "M", "pid": self._pid, "tid": thread.ident,
+                                     "args": {"name": thread.name}}) + ",\n")
+        lines.append(json.dumps({"name": name, "cat": "cycle", "ph": "X",
+                                 "ts": round((self._epoch + began) * 1e6), "dur": round((ended - began) * 1e6),
+                                 "pid": self._pid, "tid": thread.ident, "args": fields}) + ",\n")
+        writer.write("".join(lines))
+
+
+# The application's tracer; configured from config.json by the app (trace, trace_path)
+TRACER = Tracer()
@@ -0,0 +1,128 @@
+"""
+UI thread for Deadman's switch.
+
+Tk is not thread-safe, and a Tk interpreter has to be used from the thread that
+created it. Instead of creating a new tk.Tk() (and running its mainloop on the
+tray's thread) for every window, one UI thread owns a single Tk interpreter:
+it is started on first use, its root window stays hidden, and windows built on
+it are hidden rather than destroyed when closed, so they reopen instantly.
+
+Other threads (the tray's menu callbacks) never build or change windows; they
+post commands to the UI thread's queue, which it runs from its event loop:
+
+    UI = UiThread()
+    UI.post(lambda root: ...) # Runs on the UI thread
+
+With a threaded Tcl (the default build), post() also schedules a drain of the
+queue with after_idle(), which tkinter hands over to the UI thread, so the
+event loop sleeps until something is posted. Only a Tcl built without threads
+falls back to checking the queue every poll_interval.
+"""
+import queue
+import threading
+
+from logger import LOG
+
+
+class UiThread:
+    """
+    Runs posted commands on a single thread that owns the Tk interpreter.
+
+    Args:
+        poll_interval (float): Seconds between checks of the command queue
+            while the event loop is idle, with a Tcl built without threads.
+        create_root (callable, optional): Creates the root window; defaults to
+            tkinter.Tk (imported on first use).
+    """
+
+    def __init__(self, poll_interval=0.05, create_root=None):
+        self.poll_interval = poll_interval
+        self._create_root = create_root
+        self._queue = queue.Queue()
+        self._thread = None
+        self._root = None # Set while the event loop can be woken from other threads
+        self._lock = threading.Lock()
+
+    def post(self, command):
+        """
+        Queues `command` and wakes the UI thread to run it, as command(root).
+        The UI thread is started first if it is not running.
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="UiThread", daemon=True)
+                self._thread.start()
+            self._queue.put(command)
+            root = self._root
+        self._wake(root)
+
+    def stop(self, timeout=2):
+        """
+        Closes every window, ends the event loop and waits for the thread to
+        exit. Does nothing if the UI thread was never started.
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(None)
+            self._thread = None
+            root = self._root
+        self._wake(root)
+        if thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _run(self):
+        create_root = self._create_root
+        if create_root is None:
+            import tkinter as tk
+            create_root = tk.Tk
+        try:
+            root = create_root()
+        except Exception as e:
+            # No display, or Tk missing: drop what was asked; a later post retries
+            LOG.error("Error starting the UI thread: %s", e)
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            return
+        root.withdraw() # Only the windows built on it are shown
+        polling = not int(root.tk.eval("set tcl_platform(threaded)"))
+        # Commands posted before this point are picked up by the first drain
+        root.after(0, self._drain, root, polling)
+        if not polling:
+            with self._lock:
+                self._root = root
+        root.mainloop()
+        with self._lock:
+            self._root = None
+        root.destroy()
+
+    def _wake(self, root):
+        """
+        Schedules a drain on the UI thread's event loop (a no-op while it cannot
+        be woken: not started yet, polling, or stopped).
+        """
+        if root is None:
+            return
+        try:
+            root.after_idle(self._drain, root)
+        except RuntimeError:
+            pass # The event loop is not running yet or any more; its first drain, or stop, covers it
+
+    def _drain(self, root, polling=False):
+        while True:
+            try:
+                command = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if command is None:
+                with self._lock:
+                    self._root = None # Later posts must not wait on a loop that is ending
+                root.quit()
+                return
+            try:
+                command(root)
+            except Exception as e:
+                LOG.error("Error in UI command: %s", e)
+        if polling:
+            root.after(int(self.poll_interval * 1000), self._drain, root, True)
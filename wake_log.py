@@ -0,0 +1,275 @@
+"""
+Buffered, rotating writer for the wake log (wake_log.txt).
+
+Lines are appended to a bounded in-memory buffer and written by a background
+thread, so logging a click never touches the disk on the thread that handles
+the click. The file is rotated by size and/or age into numbered segments
+(wake_log.txt.1, .2, ...), which are optionally gzip-compressed, and only the
+configured number of segments is kept. If a WakeStore is attached, the same
+thread also appends the structured record of each event to it, and if history
+rollups are attached (see history_rollups.py), it saves them after each batch.
+"""
+import collections
+import gzip
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+
+FSYNC_NEVER = "never"       # Leaves it to the OS
+FSYNC_INTERVAL = "interval" # At most once per fsync_interval seconds
+FSYNC_ALWAYS = "always"     # After every write, which also skips the flush delay
+FSYNC_POLICIES = (FSYNC_NEVER, FSYNC_INTERVAL, FSYNC_ALWAYS)
+
+
+class WakeLogWriter:
+    """
+    Appends lines to a log file from a background thread.
+
+    Args:
+        path (str): Log file path.
+        max_bytes (int): Rotates once the file reaches this size (0 disables).
+        rotate_seconds (float): Rotates once the current segment is this old (0 disables).
+        backups (int): Number of rotated segments to keep.
+        compress (bool): Gzips rotated segments.
+        fsync (str): One of FSYNC_POLICIES.
+        flush_interval (float): Longest time a line waits in the buffer.
+        fsync_interval (float): Minimum time between fsyncs with FSYNC_INTERVAL.
+        max_buffered (int): Buffer bound; the oldest lines are dropped beyond it.
+        on_error (callable, optional): Called with the exception when a write fails.
+        store (WakeStore, optional): Binary store that receives the records passed to write().
+        rollups (HistoryRollups, optional): Saved after each batch of lines.
+        header (str): Written at the start of every new segment (e.g. the opening
+            bracket of a Chrome trace).
+    """
+
+    def __init__(self, path, max_bytes=1024 * 1024, rotate_seconds=0, backups=5, compress=True,
+                 fsync=FSYNC_INTERVAL, flush_interval=1.0, fsync_interval=30.0, max_buffered=10000,
+                 on_error=None, store=None, rollups=None, header=""):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync!r}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backups = backups
+        self.compress = compress
+        self.fsync = fsync
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.on_error = on_error
+        self.store = store
+        self.rollups = rollups
+        self.header = header
+
+        self._buffer = collections.deque(maxlen=max_buffered)
+        self._condition = threading.Condition()
+        self._flush_requested = False
+        self._flushed = 0 # Lines written (or dropped) so far, for flush()
+        self._queued = 0  # Lines accepted so far
+        self._closed = False
+        self._thread = None
+        self._file = None
+        self._segment_started = None
+        self._last_fsync = 0.0
+
+        self.dropped = 0 # Lines lost because the buffer was full
+        self.errors = 0
+
+    # ---- Called from any thread ---- #
+    def start(self):
+        """
+        Starts the background writer thread.
+        """
+        self._thread = threading.Thread(target=self._run, name="WakeLogWriter", daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self, line, record=None):
+        """
+        Queues `line` (which should end in a newline) and returns immediately.
+        If the buffer is full, the oldest line is dropped (and counts as
+        written, so flush() does not wait for it).
+
+        Args:
+            line (str): Text appended to the log file.
+            record (tuple, optional): (timestamp, source, cycle_id, latency) for the store.
+
+        Raises:
+            ValueError: If the writer is closed and there is no on_error; with
+                one, the dropped line is reported to it instead.
+        """
+        with self._condition:
+            if self._closed:
+                self.dropped += 1
+                error = ValueError(f"{self.path} is closed; dropped: {line.strip()}")
+            else:
+                error = None
+                if len(self._buffer) == self._buffer.maxlen:
+                    self.dropped += 1
+                    self._flushed += 1
+                self._buffer.append((line, record))
+                self._queued += 1
+                if self.fsync == FSYNC_ALWAYS or len(self._buffer) == 1:
+                    self._condition.notify()
+        if error is None:
+            return
+        if self.on_error is None:
+            raise error
+        self.on_error(error)
+
+    def flush(self, timeout=5.0):
+        """
+        Blocks until every line queued so far is written to the file. A close()
+        meanwhile still writes them out, so it waits for that too.
+
+        Returns:
+            bool: False if the lines were not written: the writer thread is not
+                running or it did not finish within `timeout`.
+        """
+        with self._condition:
+            target = self._queued
+            self._flush_requested = True
+            self._condition.notify()
+            self._condition.wait_for(lambda: self._flushed >= target or not self._running(), timeout)
+            return self._flushed >= target
+
+    def close(self, timeout=5.0):
+        """
+        Writes out the buffer, closes the file and stops the thread.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # ---- Writer thread ---- #
+    def _run(self):
+        while True:
+            with self._condition:
+                # Sleeps without a timeout while idle; once a line arrives it is
+                # given up to flush_interval to collect company.
+                self._condition.wait_for(lambda: self._buffer or self._closed or self._flush_requested)
+                if self._buffer and not (self._closed or self._flush_requested or self.fsync == FSYNC_ALWAYS):
+                    self._condition.wait_for(lambda: self._closed or self._flush_requested, self.flush_interval)
+                entries = list(self._buffer)
+                self._buffer.clear()
+                closing = self._closed
+                self._flush_requested = False
+
+            if entries:
+                self._write_lines([line for line, _ in entries])
+                self._write_records([record for _, record in entries if record])
+                self._save_rollups()
+            with self._condition:
+                self._flushed += len(entries)
+                self._condition.notify_all()
+            if closing:
+                break
+        self._close_file()
+
+    def _write_lines(self, lines):
+        try:
+            if self._file is None:
+                self._open_file()
+            elif self._should_rotate():
+                self._rotate()
+            self._file.write("".join(lines))
+            self._file.flush()
+            now = time.monotonic()
+            if self.fsync == FSYNC_ALWAYS or (self.fsync == FSYNC_INTERVAL and
+                                             now - self._last_fsync >= self.fsync_interval):
+                os.fsync(self._file.fileno())
+                self._last_fsync = now
+        except Exception as e:
+            self.errors += 1
+            self._close_file()
+            if self.on_error:
+                self.on_error(e)
+
+    def _write_records(self, records):
+        if self.store is None or not records:
+            return
+        try:
+            self.store.append_many(records)
+        except Exception as e:
+            self.errors += 1
+            if self.on_error:
+                self.on_error(e)
+
+    def _save_rollups(self):
+        if self.rollups is None:
+            return
+        try:
+            self.rollups.save()
+        except Exception as e:
+            self.errors += 1
+            if self.on_error:
+                self.on_error(e)
+
+    def _open_file(self):
+        self._file = open(self.path, "a")
+        self._segment_started = self._read_segment_start()
+        if self._should_rotate():
+            self._rotate()
+        elif self.header and self._file.tell() == 0:
+            self._file.write(self.header)
+
+    def _close_file(self):
+        if self._file:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _read_segment_start(self):
+        """
+        Age of the current segment comes from its first "[YYYY-mm-dd HH:MM:SS]"
+        line, so time-based rotation survives restarts.
+        """
+        try:
+            with open(self.path, "r") as f:
+                return datetime.strptime(f.read(21)[1:20], "%Y-%m-%d %H:%M:%S").timestamp()
+        except (OSError, ValueError):
+            return time.time()
+
+    def _should_rotate(self):
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.time() - self._segment_started >= self.rotate_seconds
+
+    def _segment_name(self, index):
+        return f"{self.path}.{index}.gz" if self.compress else f"{self.path}.{index}"
+
+    def _rotate(self):
+        self._close_file()
+        # Shifts .1 -> .2 -> ... and drops the oldest; plain and .gz segments alike
+        for index in range(self.backups, 0, -1):
+            for suffix in ("", ".gz"):
+                name = f"{self.path}.{index}{suffix}"
+                if not os.path.exists(name):
+                    continue
+                if index == self.backups:
+                    os.remove(name)
+                else:
+                    os.replace(name, f"{self.path}.{index + 1}{suffix}")
+
+        if self.backups > 0:
+            if self.compress:
+                with open(self.path, "rb") as source, gzip.open(self._segment_name(1), "wb") as target:
+                    shutil.copyfileobj(source, target)
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self._segment_name(1))
+        else:
+            os.remove(self.path)
+
+        self._file = open(self.path, "a")
+        self._file.write(self.header)
+        self._segment_started = time.time()
@@ -0,0 +1,327 @@
+"""
+Append-only binary store for wake events (wake_log.bin).
+
+wake_log.txt is meant for people; this file is meant for queries. Every event is
+one fixed-width little-endian record, so record N lives at a known offset and the
+file can be read through mmap without parsing:
+
+    timestamp   float64  seconds since the epoch
+    cycle_id    uint32   notification cycle the click answered (0 = unknown)
+    latency     float32  seconds from notification to click (NaN = unknown)
+    source      uint8    see SOURCES
+
+Records are kept in timestamp order: live appends are clamped to the last
+record's time, and imports of older events are merged in by rewriting the
+file (see WakeStore.merge). A sparse index holding the timestamp of
+every INDEX_STRIDE-th record is built when the store is opened (a few thousand
+page reads for 10M records) and extended on append, so a time range query is a
+bisect over the sparse index, a binary search inside one stride, and a zero-copy
+memoryview slice of the mapping.
+
+Usage:
+    python wake_store.py import wake_log.bin wake_log.txt [wake_log.txt.1.gz ...]
+    python wake_store.py query wake_log.bin 2026-01-01 2026-02-01
+"""
+import bisect
+import gzip
+import heapq
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+from datetime import datetime
+
+
+MAGIC = b"DMSWAKE1"
+HEADER = struct.Struct("<8sI4x") # Magic, record size
+RECORD = struct.Struct("<dIfB3x")
+INDEX_STRIDE = 4096
+
+# Only append: the position is the code stored in each record. Webhook and email
+# clicks arrive through prompt channels (see channels.py). "missed" is not a
+# click: it records a prompt nobody answered, at the time it was shown.
+# "profile" is a response to one of the profiles' prompts (see profiles.py).
+SOURCES = ("notification", "tray menu", "webhook", "email", "missed", "profile")
+SOURCE_UNKNOWN = 255
+MISSED = "missed"
+PROFILE = "profile"
+
+LOG_LINE = re.compile(r"^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] User clicked 'I'm Awake' via (.+)\.$")
+
+
+def source_code(source):
+    """
+    Maps a click source name to its one-byte code.
+    """
+    try:
+        return SOURCES.index(source)
+    except ValueError:
+        return SOURCE_UNKNOWN
+
+
+def source_name(code):
+    """
+    Maps a one-byte source code back to its name.
+    """
+    return SOURCES[code] if code < len(SOURCES) else "unknown"
+
+
+class WakeStore:
+    """
+    Reader and appender for a wake event file. Not thread-safe: use one instance
+    per thread, or only append from one thread (the log writer does).
+
+    Args:
+        path (str): Store file; created with a header if missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, RECORD.size))
+        with open(path, "rb") as f:
+            magic, record_size = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or record_size != RECORD.size:
+            raise ValueError(f"{path} is not a wake store file")
+        self._open()
+
+    def _open(self):
+        self._file = open(self.path, "ab")
+        self._map = None
+        self._count = 0
+        self._index = [] # Timestamp of record i * INDEX_STRIDE
+        self._last_timestamp = -math.inf
+        self.refresh()
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    # ---- Writing ---- #
+    def append(self, timestamp, source, cycle_id=0, latency=math.nan):
+        """
+        Appends one event. A timestamp earlier than the last record (clock set
+        back) is clamped to it, which keeps the file sorted for binary search.
+
+        Args:
+            timestamp (float): Seconds since the epoch.
+            source (str): Click source name (see SOURCES).
+            cycle_id (int): Notification cycle the click answered.
+            latency (float): Seconds from notification to click.
+        """
+        self.append_many([(timestamp, source, cycle_id, latency)])
+
+    def append_many(self, events):
+        """
+        Appends (timestamp, source, cycle_id, latency) tuples with one write,
+        clamping timestamps like append(). Use merge() for older events.
+        """
+        chunk = bytearray()
+        for timestamp, source, cycle_id, latency in events:
+            timestamp = max(timestamp, self._last_timestamp)
+            self._last_timestamp = timestamp
+            chunk += RECORD.pack(timestamp, cycle_id, latency, source_code(source))
+        self._file.write(chunk)
+        self._file.flush()
+
+    def merge(self, events):
+        """
+        Adds (timestamp, source, cycle_id, latency) events in time order, keeping
+        their timestamps. Events already in the store (same second and source, as
+        text log lines have) are skipped, so importing a log twice adds nothing.
+        If any event is older than the last record, the merged records are
+        written to a new file that replaces this one, so nothing else may append
+        to the store meanwhile (stop the app first).
+
+        Returns:
+            int: Number of events added.
+        """
+        events = sorted(events, key=lambda event: event[0])
+        if not events:
+            return 0
+        seen = set()
+        view = self.range(math.floor(events[0][0]), math.floor(events[-1][0]) + 1)
+        for timestamp, source, _, _ in iter_records(view):
+            seen.add((math.floor(timestamp), source))
+        view.release()
+        added = []
+        for event in events:
+            key = (math.floor(event[0]), event[1])
+            if key not in seen:
+                seen.add(key)
+                added.append(event)
+        if not added:
+            return 0
+        if added[0][0] >= self._last_timestamp:
+            self.append_many(added)
+            self.refresh()
+            return len(added)
+
+        temp_path = self.path + ".tmp"
+        view = self.records(0)
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, RECORD.size))
+                chunk = bytearray()
+                for timestamp, source, cycle_id, latency in heapq.merge(iter_records(view), added,
+                                                                        key=lambda event: event[0]):
+                    chunk += RECORD.pack(timestamp, cycle_id, latency, source_code(source))
+                    if len(chunk) >= 1 << 20:
+                        f.write(chunk)
+                        chunk.clear()
+                f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            view.release()
+        self.close()
+        os.replace(temp_path, self.path)
+        self._open()
+        return len(added)
+
+    # ---- Reading ---- #
+    def refresh(self):
+        """
+        Remaps the file if it grew (appends by this or another instance) and
+        extends the sparse index over the new records.
+        """
+        size = os.path.getsize(self.path)
+        count = (size - HEADER.size) // RECORD.size
+        if count == self._count and self._map is not None:
+            return
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._count = count
+        if count == 0:
+            return
+
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), HEADER.size + count * RECORD.size, access=mmap.ACCESS_READ)
+        for record_no in range(len(self._index) * INDEX_STRIDE, count, INDEX_STRIDE):
+            self._index.append(self._timestamp(record_no))
+        self._last_timestamp = max(self._last_timestamp, self._timestamp(count - 1))
+
+    def _timestamp(self, record_no):
+        return struct.unpack_from("<d", self._map, HEADER.size + record_no * RECORD.size)[0]
+
+    def _lower_bound(self, timestamp):
+        """
+        First record number whose timestamp is >= `timestamp`.
+        """
+        block = bisect.bisect_left(self._index, timestamp)
+        if block == 0:
+            return 0
+        low = (block - 1) * INDEX_STRIDE
+        high = min(block * INDEX_STRIDE, self._count)
+        while low < high:
+            middle = (low + high) // 2
+            if self._timestamp(middle) < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def range(self, start, end):
+        """
+        Returns the raw records with start <= timestamp < end as a memoryview into
+        the mapping (no copy). Decode with `iter_records()`. The view must be
+        released before the store is refreshed or closed.
+
+        Args:
+            start (float): Inclusive lower bound, seconds since the epoch.
+            end (float): Exclusive upper bound, seconds since the epoch.
+        """
+        if not self._count or start >= end:
+            return memoryview(b"")
+        first = self._lower_bound(start)
+        last = self._lower_bound(end)
+        return memoryview(self._map)[HEADER.size + first * RECORD.size:HEADER.size + last * RECORD.size]
+
+    def records(self, first, last=None):
+        """
+        Returns records `first` to `last` (exclusive; default: to the end) as a
+        memoryview into the mapping, like range(). Used to read only the records
+        appended since an earlier read.
+        """
+        last = self._count if last is None else min(last, self._count)
+        if first >= last:
+            return memoryview(b"")
+        return memoryview(self._map)[HEADER.size + first * RECORD.size:HEADER.size + last * RECORD.size]
+
+    def count_between(self, start, end):
+        """
+        Number of events with start <= timestamp < end, without touching the records.
+        """
+        if not self._count or start >= end:
+            return 0
+        return self._lower_bound(end) - self._lower_bound(start)
+
+
+def iter_records(view):
+    """
+    Decodes a `WakeStore.range()` view into (timestamp, source, cycle_id, latency) tuples.
+    """
+    for timestamp, cycle_id, latency, code in RECORD.iter_unpack(view):
+        yield timestamp, source_name(code), cycle_id, latency
+
+
+def parse_log_lines(lines):
+    """
+    Parses wake_log.txt lines into (timestamp, source, cycle_id, latency) tuples.
+    Lines that do not look like a click are skipped.
+    """
+    for line in lines:
+        match = LOG_LINE.match(line.strip())
+        if match:
+            timestamp = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S").timestamp()
+            source = match.group(2)
+            if source.startswith(PROFILE + " "): # "profile <name>"
+                source = PROFILE
+            yield timestamp, source, 0, math.nan
+
+
+def import_text_logs(store, paths):
+    """
+    Imports existing text logs (plain or .gz) into `store`, merged in time order
+    with the records it already has (see WakeStore.merge). Rotated segments can
+    be given in any order, and clicks already in the store are skipped.
+
+    Returns:
+        int: Number of events imported.
+    """
+    events = []
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt") as f:
+            events.extend(parse_log_lines(f))
+    return store.merge(events)
+
+
+def main(argv):
+    if len(argv) >= 3 and argv[0] == "import":
+        store = WakeStore(argv[1])
+        print(f"Imported {import_text_logs(store, argv[2:])} events into {argv[1]}.")
+    elif len(argv) == 4 and argv[0] == "query":
+        store = WakeStore(argv[1])
+        start = datetime.fromisoformat(argv[2]).timestamp()
+        end = datetime.fromisoformat(argv[3]).timestamp()
+        for timestamp, source, cycle_id, latency in iter_records(store.range(start, end)):
+            latency_text = "" if math.isnan(latency) else f" after {latency:.1f}s"
+            print(f"[{datetime.fromtimestamp(timestamp):%Y-%m-%d %H:%M:%S}] {source} (cycle {cycle_id}){latency_text}")
+    else:
+        print(__doc__.split("Usage:")[1].rstrip())
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))